@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""The connection hub: one process hosting the PyEZ sessions of many devices.
+
+With the juniper.device.pyez connection, each host gets its own
+ansible-connection process. In hub mode (the juniper_device_hub task
+variable, or the JUNIPER_DEVICE_HUB environment variable, with
+connection: local) the modules instead send the calls of the
+juniper.device.pyez Connection to a single hub process on the controller.
+The hub keeps one Connection per device, keyed by the connection arguments,
+and serves the calls on a unix socket, one thread per request.
+
+Sessions which are idle for longer than the idle timeout are closed. When
+there are more than max_sessions sessions, the least recently used idle
+session is closed. A session whose connection holds pending state (a
+deferred configuration session, or ephemeral engines) is never closed this
+way, as its pending loads would be lost; it is kept until a task flushes or
+discards that state. The hub exits once it has no session and has been idle
+for the idle timeout.
+
+The other juniper.device.pyez options (pyez_rpc_cache_size,
+pyez_rpc_pipeline, ...) are read by the hub from the ansible configuration
+and the environment.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from ansible import constants as C
+from ansible.errors import AnsibleError
+from ansible.module_utils._text import to_bytes
+from ansible.module_utils.connection import recv_data, send_data
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.utils.jsonrpc import JsonRpcServer
+
+# The task variables and environment variables which enable and tune the
+# connection hub.
+HUB_VAR = 'juniper_device_hub'
+HUB_ENV = 'JUNIPER_DEVICE_HUB'
+HUB_MAX_SESSIONS_VAR = 'juniper_device_hub_max_sessions'
+HUB_MAX_SESSIONS_ENV = 'JUNIPER_DEVICE_HUB_MAX_SESSIONS'
+HUB_IDLE_TIMEOUT_VAR = 'juniper_device_hub_idle_timeout'
+HUB_IDLE_TIMEOUT_ENV = 'JUNIPER_DEVICE_HUB_IDLE_TIMEOUT'
+
+HUB_DEFAULT_MAX_SESSIONS = 256
+HUB_DEFAULT_IDLE_TIMEOUT = 300
+
+# Seconds to wait for a new hub to listen on its socket.
+HUB_START_TIMEOUT = 30
+
+# The juniper.device.pyez options set from the device arguments which are
+# sent by the modules.
+HUB_DEVICE_OPTIONS = {
+    'host': ['host'],
+    'port': ['port'],
+    'user': ['remote_user'],
+    'passwd': ['password'],
+    'ssh_private_key_file': ['private_key_file'],
+    'ssh_config': ['pyez_ssh_config'],
+    'timeout': ['persistent_connect_timeout', 'persistent_command_timeout'],
+}
+
+
+def hub_enabled(task_vars):
+    """Return True if the connection hub is enabled for the task."""
+    return boolean(task_vars.get(HUB_VAR, os.getenv(HUB_ENV, False)),
+                   strict=False)
+
+
+def hub_socket_path():
+    """Return the path of the hub's unix socket."""
+    return os.path.join(os.path.expanduser(C.PERSISTENT_CONTROL_PATH_DIR),
+                        'juniper_device_hub')
+
+
+def ensure_hub(task_vars):
+    """Start the connection hub unless it is running.
+
+    Returns:
+        The path of the hub's unix socket.
+    """
+    socket_path = hub_socket_path()
+    if _hub_listening(socket_path):
+        return socket_path
+
+    max_sessions = int(task_vars.get(HUB_MAX_SESSIONS_VAR,
+                                     os.getenv(HUB_MAX_SESSIONS_ENV,
+                                               HUB_DEFAULT_MAX_SESSIONS)))
+    idle_timeout = int(task_vars.get(HUB_IDLE_TIMEOUT_VAR,
+                                     os.getenv(HUB_IDLE_TIMEOUT_ENV,
+                                               HUB_DEFAULT_IDLE_TIMEOUT)))
+
+    socket_dir = os.path.dirname(socket_path)
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, 0o700)
+
+    # The worker processes of the play race to start the hub. The lock
+    # makes sure only one of them does.
+    with open(socket_path + '.lock', 'w') as lock:
+        fcntl.lockf(lock, fcntl.LOCK_EX)
+        try:
+            if not _hub_listening(socket_path):
+                _start_hub(socket_path, max_sessions, idle_timeout)
+        finally:
+            fcntl.lockf(lock, fcntl.LOCK_UN)
+    return socket_path
+
+
+def _hub_listening(socket_path):
+    """Return True if a hub accepts connections on socket_path."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (OSError, socket.error):
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+def _start_hub(socket_path, max_sessions, idle_timeout):
+    """Start a detached hub process and wait for it to listen."""
+    collections_path = os.path.dirname(os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', '..', '..', '..')))
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                          '--socket-path', socket_path,
+                          '--collections-path', collections_path,
+                          '--max-sessions', str(max_sessions),
+                          '--idle-timeout', str(idle_timeout)],
+                         stdin=devnull, stdout=devnull, stderr=devnull,
+                         close_fds=True, start_new_session=True)
+    deadline = time.time() + HUB_START_TIMEOUT
+    while not _hub_listening(socket_path):
+        if time.time() > deadline:
+            raise AnsibleError("The connection hub did not start listening on %s "
+                          "within %d seconds." %
+                          (socket_path, HUB_START_TIMEOUT))
+        time.sleep(0.1)
+
+
+def open_pyez_connection(device):
+    """Return a connected juniper.device.pyez Connection for device."""
+    from ansible.playbook.play_context import PlayContext
+    from ansible.plugins.loader import connection_loader
+
+    play_context = PlayContext()
+    play_context.connection = 'juniper.device.pyez'
+    connection = connection_loader.get('juniper.device.pyez', play_context,
+                                       '/dev/null')
+    options = {}
+    for (arg, names) in HUB_DEVICE_OPTIONS.items():
+        if device.get(arg) is not None:
+            for name in names:
+                options[name] = device[arg]
+    connection.set_options(direct=options)
+    connection._connect()
+    return connection
+
+
+class _Session(object):
+    """A Connection of the hub.
+
+    The lock serializes the calls of the connection. users is the number of
+    calls using or waiting for the session; it is only changed with the
+    hub's lock held.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.users = 0
+        self.last_used = time.time()
+
+
+class ConnectionHub(object):
+    """The sessions of the hub.
+
+    Only device_call() is served to the modules, through _HubService.
+    """
+
+    def __init__(self, max_sessions, idle_timeout,
+                 connect=open_pyez_connection):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.last_used = time.time()
+        self._connect = connect
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def device_call(self, device, method, args, kwargs):
+        """Call the Connection method of the device's session.
+
+        The session is opened by the first call for the device.
+        """
+        if method.startswith('_'):
+            raise ValueError("Invalid method name %s." % method)
+        (key, session) = self._acquire(device)
+        try:
+            with session.lock:
+                if session.connection is None:
+                    session.connection = self._connect(device)
+                try:
+                    return getattr(session.connection, method)(*args, **kwargs)
+                finally:
+                    # Nobody reads the messages of the hub's connections.
+                    if hasattr(session.connection, 'pop_messages'):
+                        session.connection.pop_messages()
+        finally:
+            self._release(key, session)
+
+    def _acquire(self, device):
+        """Return the key and the _Session of device.
+
+        The session becomes the most recently used one, and the least
+        recently used closable sessions above max_sessions are closed.
+        """
+        key = hashlib.sha256(to_bytes(json.dumps(device, sort_keys=True),
+                                      errors='surrogate_or_strict')).hexdigest()
+        evicted = []
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _Session()
+            self._sessions.move_to_end(key)
+            session.users += 1
+            excess = len(self._sessions) - self.max_sessions
+            for (old_key, old_session) in list(self._sessions.items()):
+                if excess <= 0:
+                    break
+                if self._closable(old_session):
+                    del self._sessions[old_key]
+                    evicted.append(old_session)
+                    excess -= 1
+        for old_session in evicted:
+            self._close(old_session)
+        return (key, session)
+
+    def _release(self, key, session):
+        with self._lock:
+            session.users -= 1
+            session.last_used = self.last_used = time.time()
+            # Forget a session whose connection couldn't be opened.
+            if (session.users == 0 and session.connection is None and
+                    self._sessions.get(key) is session):
+                del self._sessions[key]
+
+    @staticmethod
+    def _closable(session):
+        """Whether the hub may close a session on its own.
+
+        The session must be unused, and its connection must hold no pending
+        state.
+        """
+        if session.users != 0:
+            return False
+        pending = getattr(session.connection, 'has_pending_state', None)
+        return pending is None or not pending()
+
+    def _close(self, session):
+        """Close the connection of an unused session."""
+        if session.connection is not None:
+            try:
+                session.connection.close()
+            except Exception:
+                pass
+            session.connection = None
+
+    def expire(self):
+        """Close the closable sessions idle for longer than idle_timeout.
+
+        Returns:
+            The number of remaining sessions.
+        """
+        now = time.time()
+        expired = []
+        with self._lock:
+            for (key, session) in list(self._sessions.items()):
+                if (self._closable(session) and
+                        now - session.last_used >= self.idle_timeout):
+                    del self._sessions[key]
+                    expired.append(session)
+            remaining = len(self._sessions)
+        for session in expired:
+            self._close(session)
+        return remaining
+
+    def close(self):
+        """Close all sessions."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            with session.lock:
+                self._close(session)
+
+
+class _HubService(object):
+    """The methods of a ConnectionHub served on its socket.
+
+    JsonRpcServer serves every public method of the objects registered with
+    it, so the hub itself isn't registered: a client could then close or
+    expire the sessions of the other clients.
+    """
+
+    def __init__(self, hub):
+        self._hub = hub
+
+    def device_call(self, device, method, args, kwargs):
+        """Call the Connection method of the device's session."""
+        return self._hub.device_call(device, method, args, kwargs)
+
+
+def _handle_client(sock):
+    """Serve the json-rpc requests of one client socket."""
+    try:
+        while True:
+            data = recv_data(sock)
+            if not data:
+                break
+            response = JsonRpcServer().handle_request(data)
+            send_data(sock, to_bytes(response))
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sock.close()
+
+
+def serve(socket_path, hub):
+    """Serve hub on socket_path until it is idle."""
+    JsonRpcServer().register(_HubService(hub))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(128)
+    poll = max(1, min(30, hub.idle_timeout // 4))
+    server.settimeout(poll)
+    try:
+        while True:
+            try:
+                (sock, _) = server.accept()
+            except socket.timeout:
+                if (hub.expire() == 0 and
+                        time.time() - hub.last_used >= hub.idle_timeout):
+                    break
+                continue
+            sock.settimeout(None)
+            thread = threading.Thread(target=_handle_client, args=(sock,))
+            thread.daemon = True
+            thread.start()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        hub.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket-path', required=True)
+    parser.add_argument('--collections-path', required=True)
+    parser.add_argument('--max-sessions', type=int,
+                        default=HUB_DEFAULT_MAX_SESSIONS)
+    parser.add_argument('--idle-timeout', type=int,
+                        default=HUB_DEFAULT_IDLE_TIMEOUT)
+    args = parser.parse_args()
+
+    from ansible.plugins.loader import init_plugin_loader
+    init_plugin_loader([args.collections_path])
+
+    serve(args.socket_path, ConnectionHub(args.max_sessions, args.idle_timeout))
+
+
+if __name__ == '__main__':
+    # The directory of this file must not shadow the modules imported by
+    # the connection plugin.
+    sys.path = [path for path in sys.path
+                if os.path.abspath(path or '.') != os.path.dirname(os.path.abspath(__file__))]
+    main()
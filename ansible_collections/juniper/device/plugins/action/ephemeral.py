@@ -0,0 +1 @@
+juniper_junos_common_action.py
\ No newline at end of file
@@ -34,6 +34,8 @@
 from __future__ import absolute_import, division, print_function
 import os
 
+from ansible_collections.juniper.device.plugins.action import connection_hub
+
 connection_spec_fallbacks = {
     'host': ['host', 'hostname', 'ip', 'ansible_host', 'inventory_hostname'],
     'user': ['user', 'username', 'ansible_connection_user', 'ansible_ssh_user', 'ansible_user'],
@@ -122,3 +124,7 @@ class ExtractData:
         self._task.args['_module_name'] = self._task.action
         # Pass the hidden _inventory_hostname option
         self._task.args['_inventory_hostname'] = task_vars['inventory_hostname']
+        # Pass the hidden _hub_socket option when the connection hub is used
+        if (getattr(self._connection, 'transport', None) == 'local' and
+                connection_hub.hub_enabled(task_vars)):
+            self._task.args['_hub_socket'] = connection_hub.ensure_hub(task_vars)
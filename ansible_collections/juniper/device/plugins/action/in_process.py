@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import traceback
+
+import ansible.module_utils.basic
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.vars.clean import remove_internal_keys
+
+try:
+    # ansible-core >= 2.19 serializes module arguments with a profile.
+    from ansible.module_utils.common.json import Direction, get_module_encoder
+    MODULE_ARGS_PROFILE = 'legacy'
+except ImportError:
+    from ansible.module_utils.common.json import AnsibleJSONEncoder
+    MODULE_ARGS_PROFILE = None
+
+# The task variable and environment variable which enable the in-process
+# execution of the modules.
+IN_PROCESS_VAR = 'juniper_device_in_process'
+IN_PROCESS_ENV = 'JUNIPER_DEVICE_IN_PROCESS'
+
+# The transports of the connections whose modules may be executed
+# in-process. Both run the module on the controller.
+IN_PROCESS_TRANSPORTS = ['local', 'juniper.device.pyez']
+
+# When enabled from the environment, import the libraries used by every
+# module now. The strategy loads the action plugins in the main process, so
+# the imports are inherited by each forked worker process.
+if boolean(os.getenv(IN_PROCESS_ENV, False), strict=False):
+    try:
+        from ansible_collections.juniper.device.plugins.module_utils import juniper_junos_common
+    except ImportError:
+        pass
+
+
+class InProcess:
+    """Execute the module's main() in the worker process.
+
+    This replaces ActionBase._execute_module() for the juniper.device modules
+    when IN_PROCESS_VAR or IN_PROCESS_ENV is true. The module is imported
+    and run in the worker process instead of being packaged by AnsiballZ and
+    run by a new interpreter. The module arguments and the returned data go
+    through the same encoding and parsing as an AnsiballZ module, so the
+    results and failures are the same.
+
+    Tasks using async, become or environment, and connections other than
+    IN_PROCESS_TRANSPORTS, always use the normal execution.
+    """
+
+    def _execute_module(self, module_name=None, module_args=None, tmp=None,
+                        task_vars=None, persist_files=False,
+                        delete_remote_tmp=None, wrap_async=False, **kwargs):
+        task_vars = task_vars or {}
+        module = None
+        if not wrap_async and self._in_process_enabled(task_vars):
+            module = self._in_process_module(module_name or self._task.action)
+        if module is None:
+            return super(InProcess, self)._execute_module(
+                module_name=module_name, module_args=module_args, tmp=tmp,
+                task_vars=task_vars, persist_files=persist_files,
+                delete_remote_tmp=delete_remote_tmp, wrap_async=wrap_async,
+                **kwargs)
+
+        module_name = module_name or self._task.action
+        module_args = dict(self._task.args if module_args is None else module_args)
+        self._update_module_args(module_name, module_args, task_vars)
+
+        res = self._run_in_process(module, module_args)
+        if MODULE_ARGS_PROFILE is None:
+            data = self._parse_returned_data(res)
+        else:
+            data = self._parse_returned_data(res, MODULE_ARGS_PROFILE)
+        remove_internal_keys(data)
+        return data
+
+    def _in_process_enabled(self, task_vars):
+        enabled = task_vars.get(IN_PROCESS_VAR, os.getenv(IN_PROCESS_ENV, False))
+        if not boolean(enabled, strict=False):
+            return False
+        if getattr(self._connection, 'transport', None) not in IN_PROCESS_TRANSPORTS:
+            return False
+        if self._task.become or any(self._task.environment or []):
+            return False
+        return True
+
+    def _in_process_module(self, module_name):
+        """Import and return the juniper.device module named module_name.
+
+        Returns None if module_name doesn't resolve to a juniper.device module.
+        """
+        context = self._shared_loader_obj.module_loader.find_plugin_with_context(
+            module_name, collection_list=self._task.collections)
+        if not context.resolved or not context.resolved_fqcn:
+            return None
+        (namespace, collection, name) = context.resolved_fqcn.split('.', 2)
+        if (namespace, collection) != ('juniper', 'device'):
+            return None
+        return importlib.import_module(
+            'ansible_collections.juniper.device.plugins.modules.%s' % name)
+
+    def _run_in_process(self, module, module_args):
+        """Run module.main() with module_args.
+
+        Returns:
+            A dict with the rc, stdout and stderr of the module, as returned
+            by ActionBase._low_level_execute_command().
+        """
+        args = {'ANSIBLE_MODULE_ARGS': module_args}
+        if MODULE_ARGS_PROFILE is None:
+            args = json.dumps(args, cls=AnsibleJSONEncoder)
+        else:
+            encoder = get_module_encoder(MODULE_ARGS_PROFILE,
+                                         Direction.CONTROLLER_TO_MODULE)
+            args = json.dumps(args, cls=encoder)
+
+        basic = ansible.module_utils.basic
+        saved = (basic._ANSIBLE_ARGS, getattr(basic, '_ANSIBLE_PROFILE', None))
+        basic._ANSIBLE_ARGS = args.encode('utf-8')
+        if MODULE_ARGS_PROFILE is not None:
+            basic._ANSIBLE_PROFILE = MODULE_ARGS_PROFILE
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        rc = 0
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    module.main()
+                except SystemExit as ex:
+                    rc = ex.code if isinstance(ex.code, int) else 1
+                except Exception:
+                    # Reported like an uncaught exception in an AnsiballZ
+                    # module: a traceback on stderr and rc 1.
+                    traceback.print_exc()
+                    rc = 1
+        finally:
+            basic._ANSIBLE_ARGS = saved[0]
+            if MODULE_ARGS_PROFILE is not None:
+                basic._ANSIBLE_PROFILE = saved[1]
+        return {'rc': rc, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
@@ -33,10 +33,11 @@
 
 from ansible.plugins.action.normal import ActionModule as ActionNormal
 from ansible_collections.juniper.device.plugins.action.extract_data import ExtractData
+from ansible_collections.juniper.device.plugins.action.in_process import InProcess
 import os
 
 # The Ansible core engine will call ActionModule.run()
-class ActionModule(ExtractData, ActionNormal):
+class ActionModule(ExtractData, InProcess, ActionNormal):
     """A subclass of ansible.plugins.action.network.ActionModule used by all modules.
 
     All modules share common behavior which is implemented in
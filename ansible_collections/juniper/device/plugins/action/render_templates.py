@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2024, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.json import AnsibleJSONEncoder
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+from ansible_collections.juniper.device.plugins.module_utils import template_render
+
+
+# The Ansible core engine will call ActionModule.run()
+class ActionModule(ActionBase):
+    """Render a configuration template for many hosts on the controller.
+
+    This action doesn't execute a module. The template is rendered with the
+    variables of each host by template_render.render_all(), into the cache
+    directory from which the config module reads the rendered configuration.
+    """
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(('template', 'vars_from', 'template_cache_dir',
+                             'hosts', 'workers', 'fail_on_error'))
+
+    def run(self, tmp=None, task_vars=None):
+        task_vars = task_vars or {}
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        args = self._task.args
+        for option in ('template', 'vars_from', 'template_cache_dir'):
+            if not args.get(option):
+                raise AnsibleError("The %s option is required." % (option))
+        if not template_render.HAS_JINJA2:
+            raise AnsibleError("The jinja2 library is required to render "
+                               "templates.")
+        template = self._expand_path(args['template'])
+        cache_dir = self._expand_path(args['template_cache_dir'])
+        vars_from = args['vars_from']
+        hosts = args.get('hosts') or task_vars.get('ansible_play_hosts', [])
+        if not isinstance(hosts, list):
+            raise AnsibleError("The hosts option must be a list of hosts.")
+        try:
+            workers = int(args['workers']) if args.get('workers') else None
+        except (TypeError, ValueError):
+            raise AnsibleError("The workers option must be an integer.")
+        fail_on_error = boolean(args.get('fail_on_error', True), strict=False)
+
+        hostvars = task_vars.get('hostvars', {})
+        vars_by_host = {}
+        skipped = []
+        for host in hosts:
+            if host not in hostvars or vars_from not in hostvars[host]:
+                skipped.append(host)
+                continue
+            template_vars = self._templar.template(hostvars[host][vars_from])
+            if not isinstance(template_vars, dict):
+                raise AnsibleError("The %s variable of %s is not a "
+                                   "dictionary." % (vars_from, host))
+            # The variables as the config module receives them.
+            vars_by_host[host] = json.loads(json.dumps(
+                template_vars, cls=AnsibleJSONEncoder))
+
+        statuses = {}
+        if vars_by_host:
+            statuses = template_render.render_all(cache_dir, template,
+                                                  vars_by_host, workers)
+        errors = dict((host, error)
+                      for (host, (status, error)) in statuses.items()
+                      if status == 'failed')
+
+        result['changed'] = False
+        result['template_cache_dir'] = cache_dir
+        result['rendered'] = sorted(host for (host, (status, _)) in
+                                    statuses.items() if status == 'rendered')
+        result['cached'] = sorted(host for (host, (status, _)) in
+                                  statuses.items() if status == 'cached')
+        result['skipped'] = sorted(skipped)
+        result['errors'] = errors
+        if errors and fail_on_error:
+            result['failed'] = True
+            result['msg'] = ("Unable to render the %s template for: %s" %
+                             (template, ', '.join(sorted(errors))))
+        else:
+            result['msg'] = ("Rendered the %s template for %d hosts, %d "
+                             "already cached." %
+                             (template, len(result['rendered']),
+                              len(result['cached'])))
+        return result
+
+    @staticmethod
+    def _expand_path(path):
+        # As the config module's options of type path.
+        return os.path.expanduser(os.path.expandvars(path))
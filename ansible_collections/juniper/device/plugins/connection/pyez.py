@@ -32,7 +32,6 @@
 #
 
 from __future__ import absolute_import, division, print_function
-import xmltodict
 
 __metaclass__ = type
 
@@ -188,6 +187,111 @@ options:
     - name: ANSIBLE_PERSISTENT_LOG_MESSAGES
     vars:
     - name: ansible_persistent_log_messages
+  pyez_rpc_cache_size:
+    type: int
+    description:
+    - The maximum number of RPC responses kept in the response cache of the
+      persistent connection. The cache is disabled when this is 0, the default.
+    - Only the RPCs listed in I(pyez_rpc_cache_ttl) are cached. Responses are
+      keyed on the normalized RPC XML, the format, and the normalize and
+      ignore_warning flags, and the least recently used response is evicted
+      when the cache is full.
+    - The cache is cleared by every commit, rollback, system and software
+      operation performed through the connection.
+    default: 0
+    ini:
+    - section: pyez_connection
+      key: rpc_cache_size
+    env:
+    - name: ANSIBLE_PYEZ_RPC_CACHE_SIZE
+    vars:
+    - name: ansible_pyez_rpc_cache_size
+  pyez_rpc_cache_ttl:
+    type: dict
+    description:
+    - The RPCs whose responses may be cached, as a dictionary of RPC names and
+      the number of seconds a cached response remains valid.
+    default:
+      get-software-information: 300
+      get-chassis-inventory: 300
+      get-interface-information: 30
+    ini:
+    - section: pyez_connection
+      key: rpc_cache_ttl
+    env:
+    - name: ANSIBLE_PYEZ_RPC_CACHE_TTL
+    vars:
+    - name: ansible_pyez_rpc_cache_ttl
+  pyez_deferred_commit_on_close:
+    type: boolean
+    description:
+    - What happens to the loads of a deferred configuration session, opened by
+      config tasks with I(deferred_commit=defer), which is still pending when
+      the persistent connection is closed, usually at the end of the playbook.
+    - If set to True, the pending loads are committed. Otherwise, the default,
+      they are rolled back and a warning is logged.
+    default: false
+    ini:
+    - section: pyez_connection
+      key: deferred_commit_on_close
+    env:
+    - name: ANSIBLE_PYEZ_DEFERRED_COMMIT_ON_CLOSE
+    vars:
+    - name: ansible_pyez_deferred_commit_on_close
+  pyez_reply_file_threshold:
+    type: int
+    description:
+    - The size, in bytes, above which an RPC or configuration reply is handed to
+      the module through a private temporary file rather than inside the
+      JSON-RPC response. Only the path, size and SHA-256 digest of the file are
+      sent over the socket, and the module memory-maps the file and removes it
+      once parsed.
+    - Replies are always sent inside the JSON-RPC response when this is 0, the
+      default.
+    default: 0
+    ini:
+    - section: pyez_connection
+      key: reply_file_threshold
+    env:
+    - name: ANSIBLE_PYEZ_REPLY_FILE_THRESHOLD
+    vars:
+    - name: ansible_pyez_reply_file_threshold
+  pyez_rpc_pipeline:
+    type: boolean
+    description:
+    - If set to True, the rpcs of a single C(command) or C(rpc) task are sent
+      on the NETCONF session without waiting for the reply to the previous
+      rpc. The replies are matched to their rpcs by message-id and returned in
+      the order the rpcs were given, so a task with many commands costs about
+      one round trip to the device rather than one per command.
+    - The device processes pipelined rpcs in the order they were received.
+    default: false
+    ini:
+    - section: pyez_connection
+      key: rpc_pipeline
+    env:
+    - name: ANSIBLE_PYEZ_RPC_PIPELINE
+    vars:
+    - name: ansible_pyez_rpc_pipeline
+  pyez_session_pool_size:
+    type: int
+    description:
+    - The number of NETCONF sessions the persistent connection may open to the
+      device. The first session is used for every operation, and the
+      additional sessions are only opened when a C(command) or C(rpc) task
+      has several read-only rpcs to execute, which are then spread over the
+      sessions and executed in parallel.
+    - Only rpcs named get-* and C(show) commands are considered read-only. A
+      task with any other rpc runs all of its rpcs on the first session, in
+      order, as do all configuration, software and system operations.
+    default: 1
+    ini:
+    - section: pyez_connection
+      key: session_pool_size
+    env:
+    - name: ANSIBLE_PYEZ_SESSION_POOL_SIZE
+    vars:
+    - name: ansible_pyez_session_pool_size
   pyez_ssh_config:
     description:
     - This variable is used to enable bastion/jump host with netconf connection. If
@@ -210,8 +314,15 @@ from ansible.errors import AnsibleConnectionFailure, AnsibleError
 from ansible.module_utils._text import to_bytes, to_native, to_text
 from ansible.plugins.connection import NetworkConnectionBase, ensure_connect
 
+import difflib
 import json
 import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 
 # Non-standard library imports and checks
 try:
@@ -236,6 +347,8 @@ except ImportError:
 
 try:
     from jnpr.junos.utils.scp import SCP
+    from paramiko import SSHException
+    from scp import SCPException
 
     HAS_PYEZ_SCP = True
 except ImportError:
@@ -264,6 +377,18 @@ try:
 except ImportError:
     HAS_PYEZ_EXCEPTIONS = False
 
+try:
+    from jnpr.junos import jxml as JXML
+    from jnpr.junos.decorators import ignoreWarnDecorator
+    from ncclient.operations import RPCError, TimeoutExpiredError
+    from ncclient.operations.rpc import RaiseMode
+    from ncclient.transport.errors import TransportError
+    from ncclient.xml_ import NCElement, to_ele
+
+    HAS_NCCLIENT_PIPELINE = True
+except ImportError:
+    HAS_NCCLIENT_PIPELINE = False
+
 try:
     from jnpr.jsnapy import SnapAdmin, __version__
     HAS_JSNAPY_VERSION = __version__
@@ -307,11 +432,62 @@ logging.getLogger("ncclient").setLevel(logging.INFO)
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.utils import (
     to_list,
 )
+from ansible_collections.juniper.device.plugins.module_utils import config_chunks
+from ansible_collections.juniper.device.plugins.module_utils import ephemeral_engine
+from ansible_collections.juniper.device.plugins.module_utils import reply_stream
+from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+from ansible_collections.juniper.device.plugins.module_utils import tables
 
 # Supported configuration modes
 CONFIG_MODE_CHOICES = ['exclusive', 'private', 'dynamic', 'batch', 'ephemeral']
 
 
+def _is_read_only_rpc(rpc_etree):
+    """Return True if rpc_etree only retrieves information from the device.
+
+    That is an rpc named get-* or a show command.
+    """
+    if rpc_etree.tag == 'command':
+        return (rpc_etree.text or '').strip().startswith('show ')
+    return rpc_etree.tag.startswith('get-')
+
+
+class _PipelinedReply(object):
+    """The reply to an rpc sent in ncclient's asynchronous mode.
+
+    parse() waits for the reply and raises the same exceptions as a
+    synchronous ncclient rpc. transform is the XSLT callable used by
+    ignoreWarnDecorator when warnings are stripped from the reply.
+    """
+
+    def __init__(self, rpc_obj, transform, timeout):
+        self.rpc_obj = rpc_obj
+        self.transform = transform
+        self.timeout = timeout
+
+    def parse(self):
+        rpc_obj = self.rpc_obj
+        rpc_obj.event.wait(self.timeout)
+        if not rpc_obj.event.is_set():
+            raise TimeoutExpiredError("ncclient timed out while waiting for "
+                                      "a pipelined rpc reply.")
+        if rpc_obj.error:
+            raise rpc_obj.error
+        reply = rpc_obj.reply
+        reply.parse()
+        handler = rpc_obj._device_handler
+        if (reply.error is not None and
+                not handler.is_rpc_error_exempt(reply.error.message)):
+            if (rpc_obj.raise_mode == RaiseMode.ALL or
+                    (rpc_obj.raise_mode == RaiseMode.ERRORS and
+                     reply.error.severity == "error")):
+                if len(reply.errors) > 1:
+                    raise RPCError(to_ele(reply._raw), errs=reply.errors)
+                raise reply.error
+        return NCElement(reply, self.transform(),
+                         huge_tree=rpc_obj.huge_tree)._NCElement__doc
+
+
 class Connection(NetworkConnectionBase):
     """NetConf connections"""
 
@@ -322,6 +498,15 @@ class Connection(NetworkConnectionBase):
         super(Connection, self).__init__(play_context, new_stdin, *args, **kwargs)
         self.dev = None
         self.config = None
+        # The deferred configuration session, while loads are pending
+        self._deferred = None
+        # The EphemeralEngine of each ephemeral instance, by instance name
+        self._ephemeral_engines = {}
+        self._rpc_cache = OrderedDict()
+        self._reply_files = []
+        self._session_pool = []
+        self._scp = None
+        self._scp_client = None
 
     @property
     @ensure_connect
@@ -358,6 +543,13 @@ class Connection(NetworkConnectionBase):
         Failures:
             - ConnectError: When unable to make a PyEZ connection.
         """
+        self.dev = self._open_device()
+
+    def _open_device(self):
+        """Open and return a new PyEZ Device instance.
+        Failures:
+            - ConnectError: When unable to make a PyEZ connection.
+        """
         # Move all of the connection arguments into connect_args
         connect_args = {}
 
@@ -394,22 +586,43 @@ class Connection(NetworkConnectionBase):
 
             self.queue_message("vvvv", "Creating device parameters: %s" % log_connect_args)
             timeout = connect_args.pop("timeout")
-            self.dev = jnpr.junos.device.Device(**connect_args)
+            dev = jnpr.junos.device.Device(gather_facts=False, **connect_args)
             self.queue_message("vvvv", "Opening device.")
-            self.dev.open()
+            dev.open()
             self.queue_message("vvvv", "Device opened.")
 
-            self.dev.timeout = self.get_option('persistent_command_timeout')
+            dev.timeout = self.get_option('persistent_command_timeout')
             self.queue_message("vvvv", "Setting default device timeout to %d." % timeout)
         # Exceptions raised by close() or open() are all sub-classes of
         # ConnectError, so this should catch all connection-related exceptions
         # raised from PyEZ.
         except pyez_exception.ConnectError as ex:
             raise AnsibleError("Unable to make a PyEZ connection: %s" % (str(ex)))
+        return dev
+
+    def _pool_devices(self):
+        """Return the open Device instances of the session pool.
+
+        The first instance is always self.dev. The additional sessions, up
+        to pyez_session_pool_size, are opened on first use. A session which
+        can't be opened is skipped and retried on the next call.
+        """
+        size = self.get_option('pyez_session_pool_size')
+        self._session_pool = [dev for dev in self._session_pool if dev.connected]
+        while len(self._session_pool) < size - 1:
+            try:
+                self._session_pool.append(self._open_device())
+            except AnsibleError as ex:
+                self.queue_message("vvvv", "Unable to open a pooled session: %s" % str(ex))
+                break
+        return [self.dev] + self._session_pool
 
     def close(self):
         """Close the self.dev PyEZ Device instance.
         """
+        if self._deferred is not None and self.dev is not None:
+            self._close_deferred()
+        self._close_ephemeral_engines()
         if self.dev is not None:
             try:
                 # Because self.fail_json() calls self.close(), we must set
@@ -427,6 +640,21 @@ class Connection(NetworkConnectionBase):
                 # anyway and they will just mask the real error that
                 # happened.
                 pass
+        self._close_scp()
+        # Close the additional sessions of the session pool.
+        for dev in self._session_pool:
+            try:
+                dev.close()
+            except (pyez_exception.ConnectError, pyez_exception.RpcError):
+                pass
+        self._session_pool = []
+        # Remove the reply files which were not consumed by a module.
+        for path in self._reply_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._reply_files = []
         super(Connection, self).close()
 
     @ensure_connect
@@ -459,13 +687,14 @@ class Connection(NetworkConnectionBase):
             - Format not understood by device.
         """
         resp = self.dev.rpc.get_config(filter_xml, options, model, namespace, remove_ns, **kwarg)
-        return etree.tostring(resp)
+        return self._spill_reply(rpc_codec.encode_reply(resp, (options or {}).get('format')))
 
     def get_rpc_resp(self,rpc, ignore_warning, format):
         """Execute rpc on the device and get response.
 
         Args:
-            rpc: the rpc to be executed on the device
+            rpc: the rpc to be executed on the device, as encoded by
+                 rpc_codec.encode_rpc().
             ignore_warning: flag to check if warning received by device are to be ignored or not.
             format: the format of the response received.
 
@@ -476,18 +705,332 @@ class Connection(NetworkConnectionBase):
         Fails:
             - If the RPC produces an exception.
         """
-        # data comes in JSON format, needs to be converted
-        rpc_val = xmltodict.unparse(rpc)
-        rpc_val = rpc_val.encode('utf-8')
-        parser = etree.XMLParser(ns_clean=True, recover=True, encoding='utf-8')
-        rpc_etree = etree.fromstring(rpc_val, parser=parser)
-        resp = self.dev.rpc(rpc_etree, normalize=bool(format == 'xml'), ignore_warning=ignore_warning)
-        if(format == 'json'):
-            return resp
-        return etree.tostring(resp)
+        return self._spill_reply(self._cached_rpc_resp(rpc, ignore_warning, format)[0])
+
+    def get_rpc_reply_file(self, rpc):
+        """Execute rpc on the device and write its unparsed reply to a file.
+
+        The reply is neither parsed nor answered from the response cache. It
+        is read by the module with rpc_codec.iter_reply_file() and streamed
+        to the destination of the output.
+
+        Args:
+            rpc: the rpc to be executed on the device, as encoded by
+                 rpc_codec.encode_rpc().
+
+        Returns:
+            - A dict describing the file which holds the <rpc-reply>.
+
+        Fails:
+            - If the RPC times out or the session is lost.
+        """
+        raw = reply_stream.fetch_raw_reply(self.dev, rpc_codec.decode_rpc(rpc))
+        return self._track_reply_file(
+            rpc_codec.write_reply_file(reply_stream.iter_text(raw)))
+
+    def _spill_reply(self, response):
+        """Write a reply larger than pyez_reply_file_threshold to a file.
+        """
+        response = rpc_codec.spill_reply(response,
+                                         self.get_option('pyez_reply_file_threshold'))
+        if rpc_codec.is_reply_file(response):
+            self._track_reply_file(response)
+        return response
+
+    def _track_reply_file(self, response):
+        """Remember the reply file, which close() removes if it's left over.
+        """
+        self._reply_files = [path for path in self._reply_files
+                             if os.path.exists(path)]
+        self._reply_files.append(response[rpc_codec.REPLY_FILE_KEY])
+        self.queue_message("vvvv", "Reply of %d bytes written to %s." %
+                           (response['size'], response[rpc_codec.REPLY_FILE_KEY]))
+        return response
+
+    def _cached_rpc_resp(self, rpc, ignore_warning, format):
+        """Execute rpc on the device, or answer it from the response cache.
+
+        Returns:
+            A (response, cache) tuple where cache is 'hit' or 'miss' when the
+            rpc is cacheable, and None otherwise.
+        """
+        rpc_etree = rpc_codec.decode_rpc(rpc)
+        normalize = bool(format == 'xml')
+        (key, ttl) = self._rpc_cache_key(rpc_etree, ignore_warning, format)
+        if key is None:
+            resp = self.dev.rpc(rpc_etree, normalize=normalize, ignore_warning=ignore_warning)
+            return (rpc_codec.encode_reply(resp, format), None)
+
+        response = self._rpc_cache_get(key)
+        if response is not None:
+            return (response, 'hit')
+        resp = self.dev.rpc(rpc_etree, normalize=normalize, ignore_warning=ignore_warning)
+        response = rpc_codec.encode_reply(resp, format)
+        self._rpc_cache_put(key, ttl, response)
+        return (response, 'miss')
+
+    def _rpc_cache_key(self, rpc_etree, ignore_warning, format):
+        """Return the (key, ttl) tuple of a cacheable rpc, or (None, None).
+        """
+        ttl = None
+        if self.get_option('pyez_rpc_cache_size') > 0:
+            ttl = (self.get_option('pyez_rpc_cache_ttl') or {}).get(rpc_etree.tag)
+        if ttl is None:
+            return (None, None)
+        key = (etree.tostring(rpc_etree, method='c14n'), format,
+               bool(format == 'xml'), repr(ignore_warning))
+        return (key, ttl)
+
+    def _rpc_cache_get(self, key):
+        """Return the cached response for key, or None if missing or expired.
+        """
+        entry = self._rpc_cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            self._rpc_cache.move_to_end(key)
+            return entry[1]
+        return None
+
+    def _rpc_cache_put(self, key, ttl, response):
+        """Cache response for ttl seconds, evicting the least recently used.
+        """
+        self._rpc_cache[key] = (time.time() + int(ttl), response)
+        self._rpc_cache.move_to_end(key)
+        while len(self._rpc_cache) > self.get_option('pyez_rpc_cache_size'):
+            self._rpc_cache.popitem(last=False)
+
+    def clear_rpc_cache(self):
+        """Discard every cached rpc response.
+        """
+        if self._rpc_cache:
+            self.queue_message("vvvv", "Clearing the rpc response cache.")
+            self._rpc_cache.clear()
+
+    def get_rpc_batch(self, rpcs):
+        """Execute several rpcs on the device in a single exchange.
+
+        When pyez_rpc_pipeline is set, the rpcs which are not answered from
+        the response cache are pipelined on the NETCONF session. When
+        pyez_session_pool_size is greater than 1 and every rpc is read-only,
+        the rpcs are spread over the sessions of the pool and executed in
+        parallel.
+
+        Args:
+            rpcs: list of dicts, one per rpc, with the keys rpc (as encoded by
+                  rpc_codec.encode_rpc()), format and ignore_warning.
+
+        Returns:
+            - A list of dicts in the same order as rpcs. Each dict has the key
+              failed. If failed is False, response holds the response as
+              returned by get_rpc_resp() and cache is 'hit' or 'miss' for
+              cacheable rpcs. If failed is True, msg holds the error message.
+        """
+        results = [None] * len(rpcs)
+        pending = []
+        for (index, item) in enumerate(rpcs):
+            rpc_etree = rpc_codec.decode_rpc(item['rpc'])
+            (key, ttl) = self._rpc_cache_key(rpc_etree, item.get('ignore_warning'),
+                                             item.get('format'))
+            response = None
+            if key is not None:
+                response = self._rpc_cache_get(key)
+            if response is not None:
+                results[index] = {'failed': False,
+                                  'response': self._spill_reply(response),
+                                  'cache': 'hit'}
+            else:
+                pending.append((index, rpc_etree, item, key, ttl))
+
+        requests = [(rpc_etree, item.get('ignore_warning'), item.get('format'))
+                    for (index, rpc_etree, item, key, ttl) in pending]
+        devs = [self.dev]
+        if (len(requests) > 1 and self.get_option('pyez_session_pool_size') > 1 and
+                all(_is_read_only_rpc(request[0]) for request in requests)):
+            devs = self._pool_devices()[:len(requests)]
+        if len(devs) > 1:
+            # Deal the rpcs round-robin, one share per session.
+            shares = [requests[start::len(devs)] for start in range(len(devs))]
+            with ThreadPoolExecutor(max_workers=len(devs)) as executor:
+                share_replies = list(executor.map(self._execute_rpcs, devs, shares))
+            replies = [None] * len(requests)
+            for (start, share) in enumerate(share_replies):
+                replies[start::len(devs)] = share
+            self.queue_message("vvvv", "Executed %d rpcs on %d sessions." %
+                               (len(requests), len(devs)))
+        else:
+            replies = self._execute_rpcs(self.dev, requests)
+
+        for ((index, rpc_etree, item, key, ttl), (response, ex)) in zip(pending, replies):
+            if ex is not None:
+                results[index] = {'failed': True, 'msg': str(ex)}
+                continue
+            cache = None
+            if key is not None:
+                self._rpc_cache_put(key, ttl, response)
+                cache = 'miss'
+            results[index] = {'failed': False,
+                              'response': self._spill_reply(response),
+                              'cache': cache}
+        return results
+
+    def _execute_rpcs(self, dev, requests):
+        """Execute requests on the dev session, pipelined when enabled.
+
+        Args:
+            dev: the Device instance whose session is used.
+            requests: list of (rpc_etree, ignore_warning, format) tuples.
+
+        Returns:
+            A list of (response, exception) tuples, as returned by
+            _execute_rpc(), in the same order as requests.
+        """
+        if (len(requests) > 1 and HAS_NCCLIENT_PIPELINE and
+                self.get_option('pyez_rpc_pipeline')):
+            return self._pipeline_rpcs(dev, requests)
+        return [self._execute_rpc(dev, *request) for request in requests]
+
+    def _execute_rpc(self, dev, rpc_etree, ignore_warning, format):
+        """Execute rpc_etree on the dev session and wait for its reply.
+
+        Returns:
+            A (response, exception) tuple. response is encoded by
+            rpc_codec.encode_reply(), exception is the PyEZ exception raised
+            by the rpc, if any.
+        """
+        try:
+            resp = dev.rpc(rpc_etree, normalize=bool(format == 'xml'),
+                           ignore_warning=ignore_warning)
+        except (pyez_exception.RpcError, pyez_exception.ConnectError) as ex:
+            return (None, ex)
+        return (rpc_codec.encode_reply(resp, format), None)
+
+    def _pipeline_rpcs(self, dev, requests):
+        """Send every rpc before waiting for the first reply.
+
+        The rpcs are sent in ncclient's asynchronous mode and ncclient
+        matches each reply to its rpc by message-id. The replies are then
+        handled the same way PyEZ handles the reply of a synchronous rpc.
+
+        Args:
+            dev: the Device instance whose session is used.
+            requests: list of (rpc_etree, ignore_warning, format) tuples.
+
+        Returns:
+            A list of (response, exception) tuples, as returned by
+            _execute_rpc(), in the same order as requests.
+        """
+        if dev.connected is not True:
+            ex = pyez_exception.ConnectClosedError(dev)
+            return [(None, ex) for request in requests]
+
+        manager = dev._conn
+        async_mode = manager.async_mode
+        submitted = []
+        manager.async_mode = True
+        try:
+            for (rpc_etree, ignore_warning, format) in requests:
+                try:
+                    submitted.append(manager.rpc(rpc_etree))
+                except TransportError:
+                    submitted.append(pyez_exception.ConnectClosedError(dev))
+        finally:
+            manager.async_mode = async_mode
+        self.queue_message("vvvv", "Pipelined %d rpcs." % len(submitted))
+
+        replies = []
+        for ((rpc_etree, ignore_warning, format), rpc_obj) in zip(requests, submitted):
+            if isinstance(rpc_obj, Exception):
+                replies.append((None, rpc_obj))
+                continue
+            try:
+                resp = self._pipelined_reply(dev, rpc_etree, rpc_obj,
+                                             ignore_warning, format)
+            except (pyez_exception.RpcError, pyez_exception.ConnectError) as ex:
+                replies.append((None, ex))
+                continue
+            replies.append((rpc_codec.encode_reply(resp, format), None))
+        return replies
+
+    def _pipelined_reply(self, dev, rpc_etree, rpc_obj, ignore_warning, format):
+        """Wait for the reply to a pipelined rpc and return it like dev.rpc().
+
+        This mirrors jnpr.junos.device._Connection.execute().
+
+        Raises:
+            - RpcTimeoutError when no reply is received within the device
+              timeout, ConnectClosedError when the session is lost,
+              PermissionError or RpcError when the reply holds an rpc-error.
+        """
+        if format == 'xml':
+            transform = dev._norm_transform
+        else:
+            transform = dev._nc_transform
+        reply = _PipelinedReply(rpc_obj, transform, dev.timeout)
+        try:
+            rpc_rsp_e = ignoreWarnDecorator(_PipelinedReply.parse)(
+                reply, ignore_warning=ignore_warning)
+        except TimeoutExpiredError:
+            raise pyez_exception.RpcTimeoutError(dev, rpc_etree.tag,
+                                                 dev.timeout)
+        except TransportError:
+            raise pyez_exception.ConnectClosedError(dev)
+        except RPCError as ex:
+            rsp = None
+            if hasattr(ex, "xml"):
+                rsp = JXML.remove_namespaces(ex.xml)
+                if rsp.findtext("error-message") == "permission denied":
+                    raise pyez_exception.PermissionError(cmd=rpc_etree, rsp=rsp, errs=ex)
+            raise pyez_exception.RpcError(cmd=rpc_etree, rsp=rsp, errs=ex)
+
+        if rpc_etree.attrib.get("format") in ["json", "JSON"]:
+            try:
+                return json.loads(rpc_rsp_e.text, strict=False)
+            except ValueError as ex:
+                if str(ex).startswith("Extra data"):
+                    return json.loads(re.sub(r"\s?{\s?}\s?", "", rpc_rsp_e.text))
+                raise pyez_exception.JSONLoadError(ex, rpc_rsp_e.text)
+
+        # Like PyEZ, return the first child of the <rpc-reply> element.
+        try:
+            return rpc_rsp_e[0]
+        except IndexError:
+            if rpc_rsp_e.text is not None and rpc_rsp_e.text.strip() != "":
+                return rpc_rsp_e
+            return True
+
+    def get_table(self, table_view, table, kwargs=None,
+                  response_type='list_of_dicts'):
+        """Retrieve the items of a PyEZ table/view from the device.
+
+        Args:
+            table_view: the table/view definitions, as parsed from the YAML file.
+            table: the name of the table to retrieve.
+            kwargs: the arguments passed to the get() method of the table.
+            response_type: 'list_of_dicts' or 'juniper_items'.
+
+        Returns:
+            - A dict with the number of items retrieved in length and the
+              items, converted according to response_type, in resource.
+
+        Fails:
+            - If the table is not defined or can't be retrieved.
+        """
+        try:
+            loader = tables.load_tables(table_view)
+            data = loader[table](self.dev)
+            self.queue_message("vvvv", "Table %s created successfully." % table)
+            data.get(**(kwargs or {}))
+        except KeyError:
+            raise AnsibleError("Unable to find table %s." % table)
+        except (pyez_exception.RpcError, pyez_exception.ConnectError) as ex:
+            raise AnsibleError("Unable to retrieve data from table %s. "
+                               "Error: %s" % (table, str(ex)))
+        return {'length': len(data),
+                'resource': tables.convert_items(data, response_type)}
 
     def get_facts(self):
         """Get device facts.
+
+        The facts are loaded from the device on first access.
         """
         return dict(self.dev.facts)
 
@@ -610,6 +1153,12 @@ class Connection(NetworkConnectionBase):
             - When there's a RPC problem including an already locked
                         config or an already opened private config.
         """
+        if self._deferred is not None:
+            raise AnsibleError("A deferred configuration session has %d "
+                               "pending loads. Flush or discard it with "
+                               "deferred_commit before using the "
+                               "configuration in another way." %
+                               self._deferred['loads'])
         if self.config is None:
             if mode not in CONFIG_MODE_CHOICES:
                 raise AnsibleError("Invalid configuration mode: %s" % mode)
@@ -658,6 +1207,11 @@ class Connection(NetworkConnectionBase):
             - When there's a problem with the PyEZ connection.
             - When there's a RPC problem closing the config.
         """
+        if self._deferred is not None:
+            # A failed task discards the pending loads rather than leaving
+            # them in a candidate it no longer holds.
+            self.discard_deferred()
+            return
         if self.config is not None:
             config = self.config
             self.config = None
@@ -686,6 +1240,7 @@ class Connection(NetworkConnectionBase):
         Failures:
             - Unable to rollback the configuration due to an RpcError or ConnectError
         """
+        self.clear_rpc_cache()
         if self.dev is None or self.config is None:
             raise AnsibleError('The device or configuration is not open.')
 
@@ -694,8 +1249,8 @@ class Connection(NetworkConnectionBase):
             try:
                 self.config.rescue(action='reload')
                 self.queue_message("log", "Rescue configuration loaded.")
-            except (self.pyez_exception.RpcError,
-                    self.pyez_exception.ConnectError) as ex:
+            except (pyez_exception.RpcError,
+                    pyez_exception.ConnectError) as ex:
                 raise AnsibleError('Unable to load the rescue configuraton: '
                                    '%s' % (str(ex)))
         elif id >= 0 and id <= 49:
@@ -703,8 +1258,8 @@ class Connection(NetworkConnectionBase):
             try:
                 self.config.rollback(rb_id=id)
                 self.queue_message("log", "Rollback {} configuration loaded.".format(id))
-            except (self.pyez_exception.RpcError,
-                    self.pyez_exception.ConnectError) as ex:
+            except (pyez_exception.RpcError,
+                    pyez_exception.ConnectError) as ex:
                 raise AnsibleError('Unable to load the rollback %d '
                                    'configuraton: %s' % (id, str(ex)))
         else:
@@ -722,8 +1277,8 @@ class Connection(NetworkConnectionBase):
         try:
             self.config.commit_check()
             self.queue_message("log", "Configuration checked.")
-        except (self.pyez_exception.RpcError,
-                self.pyez_exception.ConnectError) as ex:
+        except (pyez_exception.RpcError,
+                pyez_exception.ConnectError) as ex:
             raise AnsibleError('Failure checking the configuraton: %s' %
                                (str(ex)))
 
@@ -740,8 +1295,8 @@ class Connection(NetworkConnectionBase):
             diff = self.config.diff(rb_id=0, ignore_warning=ignore_warning)
             self.queue_message("log", "Configuration diff completed.")
             return diff
-        except (self.pyez_exception.RpcError,
-                self.pyez_exception.ConnectError) as ex:
+        except (pyez_exception.RpcError,
+                pyez_exception.ConnectError) as ex:
             raise AnsibleError('Failure diffing the configuraton: %s' %
                                (str(ex)))
 
@@ -759,11 +1314,62 @@ class Connection(NetworkConnectionBase):
                 self.queue_message("log", "Load args %s." %str(load_args))
                 self.config.load(**load_args)
             self.queue_message("log", "Configuration loaded.")
-        except (self.pyez_exception.RpcError,
-                self.pyez_exception.ConnectError) as ex:
+        except (pyez_exception.RpcError,
+                pyez_exception.ConnectError) as ex:
             raise AnsibleError('Failure loading the configuraton: %s' %
                                (str(ex)))
 
+    def load_configuration_chunks(self, chunks, format, action,
+                                  ignore_warning=None, window=1, retries=0):
+        """Load the chunks of a configuration into the candidate configuration.
+
+        Each chunk is loaded with its own load-configuration rpc. When window
+        is greater than 1, window rpcs are pipelined on the session at a
+        time. A chunk which times out is loaded again, along with the chunks
+        sent after it, up to retries times.
+
+        Args:
+            chunks - The chunks, as split by
+                     config_chunks.split_configuration().
+            format - 'set' or 'text'.
+            action - 'merge', 'replace' or 'set'.
+            ignore_warning - Which warnings to ignore.
+            window - The number of chunks sent before waiting for replies.
+            retries - The number of times a timed out chunk is loaded again.
+
+        Returns:
+            The progress of each chunk, as returned by
+            config_chunks.load_chunks().
+
+        Failures:
+            - A chunk failed to load.
+        """
+        pipeline = window > 1 and HAS_NCCLIENT_PIPELINE
+
+        def send(indexes):
+            requests = [(config_chunks.load_rpc(chunks[index], format, action),
+                         ignore_warning, 'xml') for index in indexes]
+            if pipeline and len(requests) > 1:
+                replies = self._pipeline_rpcs(self.dev, requests)
+            else:
+                replies = [self._execute_rpc(self.dev, *request)
+                           for request in requests]
+            return [ex for (response, ex) in replies]
+
+        try:
+            progress = config_chunks.load_chunks(
+                chunks, send, window=window if pipeline else 1,
+                retries=retries,
+                retryable=lambda ex: isinstance(
+                    ex, pyez_exception.RpcTimeoutError),
+                log=lambda msg: self.queue_message("log", msg))
+        except config_chunks.ChunkLoadError as ex:
+            raise AnsibleError('Failure loading the configuraton: %s' %
+                               (str(ex)))
+        self.queue_message("log", "Configuration loaded in %d chunks." %
+                           len(chunks))
+        return progress
+
     def commit_configuration(self, ignore_warning=None, comment=None,
                              confirmed=None, timeout=30, full=False,
                              force_sync=False, sync=False):
@@ -778,6 +1384,7 @@ class Connection(NetworkConnectionBase):
         Failures:
             - An error returned from committing the configuration.
         """
+        self.clear_rpc_cache()
         if self.dev.timeout:
             timeout = self.dev.timeout
         try:
@@ -789,14 +1396,252 @@ class Connection(NetworkConnectionBase):
                                force_sync=force_sync,
                                sync=sync)
             self.queue_message("log", "Configuration committed.")
-        except (self.pyez_exception.RpcError,
-                self.pyez_exception.ConnectError) as ex:
+        except (pyez_exception.RpcError,
+                pyez_exception.ConnectError) as ex:
             raise AnsibleError('Failure committing the configuraton: %s' %
                                (str(ex)))
 
+    def deferred_load(self, config, load_args, mode, ignore_warn=None,
+                      ephemeral_instance=None, diff=False):
+        """Load into the deferred configuration session, opening it if needed.
+
+        The session, and its lock on the candidate configuration, remains
+        open after the task, so that the loads of several tasks are
+        committed together by deferred_flush().
+
+        Args:
+            config, load_args - As for load_configuration().
+            mode, ignore_warn, ephemeral_instance - As for
+                open_configuration(). The mode must be the same for every
+                load of a session.
+            diff - Whether to return the differences made by this load.
+
+        Returns:
+            A dict with the diff of this load, as unified diff of the
+            candidate configuration text before and after the load, or None
+            when the load made no difference or diff is False, and the
+            number of pending loads.
+
+        Failures:
+            - An error opening the configuration or loading it. The pending
+              loads are discarded.
+        """
+        if self._deferred is None:
+            if self.config is not None:
+                raise AnsibleError("The configuration is already open.")
+            self.open_configuration(mode, ignore_warn=ignore_warn,
+                                    ephemeral_instance=ephemeral_instance)
+            self._deferred = {'mode': mode, 'loads': 0, 'candidate': None}
+        elif self._deferred['mode'] != mode:
+            raise AnsibleError("The deferred configuration session is open in "
+                               "%s mode, not in %s mode." %
+                               (self._deferred['mode'], mode))
+        try:
+            before = None
+            if diff:
+                before = self._deferred['candidate']
+                if before is None:
+                    before = self._candidate_text()
+            self.load_configuration(config, load_args)
+            self._deferred['loads'] += 1
+            # The candidate text is kept as the "before" of the next load.
+            self._deferred['candidate'] = None
+            load_diff = None
+            if diff:
+                after = self._candidate_text()
+                self._deferred['candidate'] = after
+                lines = list(difflib.unified_diff(before.splitlines(),
+                                                  after.splitlines(),
+                                                  'candidate', 'candidate',
+                                                  lineterm=''))
+                if lines:
+                    load_diff = '\n'.join(lines) + '\n'
+        except AnsibleError:
+            self.discard_deferred()
+            raise
+        return {'diff': load_diff, 'loads': self._deferred['loads']}
+
+    def _candidate_text(self):
+        """Return the candidate configuration of the session as text."""
+        try:
+            config = self.dev.rpc.get_config(options={'database': 'candidate',
+                                                      'format': 'text'})
+        except (pyez_exception.ConnectError,
+                pyez_exception.RpcError) as ex:
+            raise AnsibleError('Unable to retrieve the candidate '
+                               'configuration: %s' % (str(ex)))
+        return config.text or ''
+
+    def deferred_flush(self, check=True, diff=True, commit=True,
+                       commit_empty_changes=False, check_commit_wait=None,
+                       ignore_warning=None, **commit_args):
+        """Check, diff and commit the deferred session once, then close it.
+
+        Args:
+            check - Whether to check the candidate configuration.
+            diff - Whether to diff the candidate and committed configurations.
+                   Without a diff, the loads are assumed to make changes.
+            commit - Whether to commit the changes.
+            commit_empty_changes - Whether to commit when the diff is empty.
+            check_commit_wait - The seconds to wait before the commit.
+            ignore_warning, commit_args - As for commit_configuration().
+
+        Returns:
+            A dict with the number of loads flushed, the diff of all of them,
+            and whether they were committed. Nothing is done, and loads is 0,
+            when there is no deferred session.
+
+        Failures:
+            - An error checking, diffing or committing. The pending loads
+              are discarded.
+        """
+        result = {'loads': 0, 'diff': None, 'changed': False,
+                  'committed': False}
+        if self._deferred is None:
+            return result
+        result['loads'] = self._deferred['loads']
+        try:
+            if check:
+                self.check_configuration()
+            result['changed'] = True
+            if diff:
+                result['diff'] = self.diff_configuration(ignore_warning)
+                result['changed'] = result['diff'] is not None
+            if commit and (result['changed'] or commit_empty_changes):
+                if check_commit_wait is not None:
+                    time.sleep(check_commit_wait)
+                self.commit_configuration(ignore_warning=ignore_warning,
+                                          **commit_args)
+                result['committed'] = True
+        except AnsibleError:
+            self.discard_deferred()
+            raise
+        self._deferred = None
+        self.close_configuration()
+        self.queue_message("log", "Flushed %d deferred loads." %
+                           result['loads'])
+        return result
+
+    def discard_deferred(self):
+        """Roll back the pending loads of the deferred session and close it.
+
+        Returns:
+            The number of loads discarded.
+        """
+        if self._deferred is None:
+            return 0
+        loads = self._deferred['loads']
+        self._deferred = None
+        try:
+            if self.config is not None and self.config.mode != 'ephemeral':
+                self.config.rollback(rb_id=0)
+        except (pyez_exception.ConnectError, pyez_exception.RpcError) as ex:
+            self.queue_message("warning", "Unable to discard the deferred "
+                               "configuration loads: %s" % (str(ex)))
+        finally:
+            self.close_configuration()
+        self.queue_message("log", "Discarded %d deferred loads." % loads)
+        return loads
+
+    def has_pending_state(self):
+        """Return whether closing the connection would end pending work.
+
+        That is a deferred configuration session or an ephemeral engine.
+        The connection hub never closes such a connection while it is unused.
+        """
+        return self._deferred is not None or bool(self._ephemeral_engines)
+
+    def _close_deferred(self):
+        """Commit or discard the loads still pending when closing."""
+        if self.get_option('pyez_deferred_commit_on_close'):
+            try:
+                self.deferred_flush(check=False, diff=False)
+                return
+            except AnsibleError as ex:
+                self.queue_message("warning", "Unable to commit the deferred "
+                                   "configuration loads: %s" % (str(ex)))
+        loads = self.discard_deferred()
+        self.queue_message("warning", "Discarded %d deferred configuration "
+                           "loads which were not flushed." % loads)
+
+    def ephemeral_submit(self, updates, instance=None,
+                         window=ephemeral_engine.DEFAULT_WINDOW,
+                         max_batch=ephemeral_engine.DEFAULT_MAX_BATCH,
+                         wait=False, flush=False, close=False,
+                         ignore_warn=None):
+        """Queue updates of an ephemeral instance for batched commits.
+
+        The instance is programmed by an EphemeralEngine on its own NETCONF
+        session, which stays open, with the instance, until the connection
+        is closed or close is True. The updates of successive calls share
+        the batches.
+
+        Args:
+            updates - A list of [content, format, action] updates.
+            instance - The ephemeral instance. None is the default instance.
+            window, max_batch - The coalescing window and maximum batch of
+                                the engine.
+            wait - Whether to wait for these updates to be committed.
+            flush - Whether to wait for all the queued updates, and return
+                    the statistics since the last flush.
+            close - Whether to flush, then close the instance.
+            ignore_warn - As for open_configuration(), when the engine is
+                          created.
+
+        Returns:
+            A dict with the number of updates 'queued', the 'errors' of the
+            failed batches with these updates when wait, flush or close,
+            and the 'stats' of flush() when flush or close.
+
+        Failures:
+            - The engine's session can't be opened.
+            - The updates are not applied within persistent_command_timeout.
+        """
+        key = instance or ''
+        engine = self._ephemeral_engines.get(key)
+        if engine is None:
+            session = ephemeral_engine.EphemeralSession(
+                self._open_device(), instance=instance,
+                ignore_warning=ignore_warn, close_device=True)
+            engine = ephemeral_engine.EphemeralEngine(session)
+            self._ephemeral_engines[key] = engine
+        engine.window = window
+        engine.max_batch = max_batch
+        timeout = self.get_option('persistent_command_timeout')
+        result = {'queued': len(updates)}
+        try:
+            seq = engine.submit([tuple(update) for update in updates])
+            if wait or flush or close:
+                result['errors'] = engine.wait(seq, timeout,
+                                               since=seq - len(updates) + 1)
+            if close:
+                del self._ephemeral_engines[key]
+                result['stats'] = engine.close(timeout)
+            elif flush:
+                result['stats'] = engine.flush(timeout)
+        except ephemeral_engine.EphemeralEngineError as ex:
+            raise AnsibleError(str(ex))
+        if wait or flush or close:
+            self.clear_rpc_cache()
+        return result
+
+    def _close_ephemeral_engines(self):
+        """Apply the queued ephemeral updates, then close the engines."""
+        timeout = self.get_option('persistent_command_timeout')
+        for (key, engine) in list(self._ephemeral_engines.items()):
+            try:
+                stats = engine.close(timeout)
+                for error in stats['errors']:
+                    self.queue_message("warning", "Ephemeral update failed: "
+                                       "%s" % error)
+            except ephemeral_engine.EphemeralEngineError as ex:
+                self.queue_message("warning", str(ex))
+        self._ephemeral_engines = {}
+
     def system_api(self, action, in_min, at, all_re, vmhost, other_re, media, member_id=None):
         """Triggers the system calls like reboot, shutdown, halt and zeroize to device.
         """
+        self.clear_rpc_cache()
         msg = None
         if action != 'zeroize':
             if (at == 'now' or (in_min == 0 and at is None)):
@@ -844,6 +1689,7 @@ class Connection(NetworkConnectionBase):
     def software_api(self, install_params):
         """Installs package to device.
         """
+        self.clear_rpc_cache()
         try:
             self.sw = jnpr.junos.utils.sw.SW(self.dev)
             ok, msg_ret = self.sw.install(**install_params)
@@ -862,6 +1708,7 @@ class Connection(NetworkConnectionBase):
     def reboot_api(self, all_re, vmhost, member_id=None):
         """reboots the device.
         """
+        self.clear_rpc_cache()
         msg = None
         try:
             restore_timeout = self.dev.timeout
@@ -920,13 +1767,7 @@ class Connection(NetworkConnectionBase):
             local_file local file path/name.
             remote_file: remote file path/name.
         """
-        try:
-            with SCP(self.dev, progress=True) as scp:
-                scp.put(local_file, remote_file)
-        except (self.pyez_exception.RpcError, self.pyez_exception.ConnectError) as ex:
-            raise AnsibleError(
-                "Failure checking the configuraton: {0}".format(str(ex))
-            ) from ex
+        self._scp_transfer('put', local_file, remote_file)
 
     def scp_file_copy_get(self, remote_file, local_file):
         """Copy the file using scp.
@@ -935,10 +1776,71 @@ class Connection(NetworkConnectionBase):
             local_file local file path/name.
             remote_file: remote file path/name.
         """
-        try:
-            with SCP(self.dev, progress=True) as scp:
-                scp.get(remote_file, local_file)
-        except (self.pyez_exception.RpcError, self.pyez_exception.ConnectError) as ex:
+        self._scp_transfer('get', remote_file, local_file)
+
+    def _scp_transfer(self, method, *args):
+        """Call the put or get method of the long-lived SCPClient.
+
+        The SSH transport of the SCPClient is kept open across tasks, so
+        only a new channel is opened for each transfer. If the transfer
+        fails because the transport was lost, the transport is re-opened
+        and the transfer retried once. A local file error, such as a missing
+        source or an unwritable destination, fails at once.
+        """
+        for attempt in (1, 2):
+            try:
+                return getattr(self._get_scp_client(), method)(*args)
+            except OSError as ex:
+                if getattr(ex, 'filename', None) is None:
+                    # A socket error of the transport.
+                    self._scp_transport_failed(method, ex, attempt)
+                    continue
+                raise AnsibleError(
+                    "Failure copying the file: {0}".format(str(ex))
+                ) from ex
+            except (SCPException, SSHException, EOFError) as ex:
+                self._scp_transport_failed(method, ex, attempt)
+            except (pyez_exception.RpcError, pyez_exception.ConnectError) as ex:
+                self._close_scp()
+                raise AnsibleError(
+                    "Failure copying the file: {0}".format(str(ex))
+                ) from ex
+
+    def _scp_transport_failed(self, method, ex, attempt):
+        """Drop the SCPClient whose transport failed, and fail on the last attempt.
+        """
+        self.queue_message("vvvv", "SCP %s failed: %s" % (method, str(ex)))
+        self._close_scp()
+        if attempt == 2:
             raise AnsibleError(
-                "Failure checking the configuraton: {0}".format(str(ex))
-           ) from ex
+                "Failure copying the file: {0}".format(str(ex))
+            ) from ex
+
+    def _get_scp_client(self):
+        """Return the long-lived SCPClient, opening it when needed.
+
+        The client is re-opened when its SSH transport is no longer active.
+        """
+        if self._scp_client is not None:
+            if self._scp_client.transport.is_active():
+                return self._scp_client
+            self.queue_message("vvvv", "SCP transport is not active, re-opening it.")
+            self._close_scp()
+        self._scp = ExitStack()
+        self._scp_client = self._scp.enter_context(SCP(self.dev, progress=True))
+        # Keep the idle transport open between tasks.
+        self._scp_client.transport.set_keepalive(30)
+        self.queue_message("vvvv", "SCP transport opened.")
+        return self._scp_client
+
+    def _close_scp(self):
+        """Close the long-lived SCPClient, if any.
+        """
+        scp = self._scp
+        self._scp = None
+        self._scp_client = None
+        if scp is not None:
+            try:
+                scp.close()
+            except Exception:
+                pass
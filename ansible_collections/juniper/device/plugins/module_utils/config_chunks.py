@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Splitting of large configurations into size-bounded loads.
+
+A configuration in set or text format, loaded with the merge, set or replace
+action, can be loaded as a sequence of smaller load-configuration RPCs into
+the same candidate configuration with the same result:
+
+set
+    The chunks are made of whole lines.
+text
+    The chunks are made of whole statements. With the merge action a chunk
+    may end inside a hierarchy: the chunk closes the open hierarchies and
+    the next one opens them again, so a single huge prefix-list or firewall
+    filter is split too. With the replace action, whose replace: tags apply
+    to a whole hierarchy, the chunks only end between top-level statements.
+
+A chunk is larger than the size limit only when a single line, or a single
+statement which can't be split, is.
+
+load_chunks() loads the chunks in order, a window of chunks at a time. When
+a chunk fails with a retryable error, typically a timeout, the chunks are
+loaded again from that chunk on, so the candidate configuration receives
+the statements in their original order whatever the window.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import re
+import time
+
+try:
+    from lxml.builder import E
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# The formats and load actions which may be split
+CHUNK_FORMATS = ['set', 'text']
+CHUNK_ACTIONS = ['merge', 'set', 'replace']
+
+# The tokens of the text format which delimit the statements
+_TEXT_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|/\*.*?\*/|#[^\n]*|[{};]',
+                          re.S)
+
+
+def split_configuration(content, format, action, max_bytes):
+    """Return the chunks of content, a list of strings.
+
+    Args:
+        content - The configuration, as a string.
+        format - 'set' or 'text'.
+        action - 'merge', 'set' or 'replace'.
+        max_bytes - The maximum size of a chunk, in bytes of UTF-8.
+
+    Raises:
+        ValueError: When format or action can't be split.
+    """
+    if action == 'set':
+        format = 'set'
+    if format is None:
+        raise ValueError("The format of the configuration is unknown. Set "
+                         "the format option.")
+    if format not in CHUNK_FORMATS or action not in CHUNK_ACTIONS:
+        raise ValueError("A configuration in %s format loaded with the %s "
+                         "action can't be split." % (format, action))
+    if format == 'set':
+        return split_set(content, max_bytes)
+    return split_text(content, max_bytes,
+                      max_depth=None if action == 'merge' else 0)
+
+
+def guess_format(content):
+    """Return 'set' or 'text' when content looks like it, else None.
+
+    The content is recognized with the regular expressions Config.load() of
+    PyEZ uses to guess the format of a string.
+    """
+    if re.search(r"^\s*<.*>$", content, re.MULTILINE):
+        return None
+    if re.search(r"^\s*(set|delete|rename|insert|activate|deactivate"
+                 r"|annotate|copy|protect|unprotect)\s", content):
+        return 'set'
+    if (re.search(r"^[a-z:]*\s*[\w-]+\s+\{", content, re.I) and
+            re.search(r".*}\s*$", content)):
+        return 'text'
+    return None
+
+
+def _size(text):
+    return len(text.encode('utf-8'))
+
+
+def split_set(content, max_bytes):
+    """Split set commands into chunks of whole lines."""
+    chunks = []
+    lines = []
+    size = 0
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        line_size = _size(line) + 1
+        if lines and size + line_size > max_bytes:
+            chunks.append('\n'.join(lines) + '\n')
+            (lines, size) = ([], 0)
+        lines.append(line)
+        size += line_size
+    if lines:
+        chunks.append('\n'.join(lines) + '\n')
+    return chunks
+
+
+def split_text(content, max_bytes, max_depth=None):
+    """Split a text configuration into chunks of whole statements.
+
+    Args:
+        content - The configuration.
+        max_bytes - The maximum size of a chunk.
+        max_depth - The deepest hierarchy level at which a chunk may end,
+                    or None for any level.
+    """
+    # The candidate ends of chunks: (end offset, the headers of the
+    # hierarchies open at that offset).
+    boundaries = []
+    stack = ()
+    statement_start = 0
+    for match in _TEXT_TOKENS.finditer(content):
+        token = match.group()
+        if token == '{':
+            header = content[statement_start:match.start()].strip()
+            stack = stack + (header,)
+            statement_start = match.end()
+        elif token in (';', '}'):
+            if token == '}':
+                stack = stack[:-1]
+            statement_start = match.end()
+            if max_depth is None or len(stack) <= max_depth:
+                boundaries.append((match.end(), stack))
+    if stack:
+        raise ValueError("The configuration has %d unclosed hierarchies." %
+                         len(stack))
+    if not boundaries or boundaries[-1][0] < len(content.rstrip()):
+        boundaries.append((len(content), ()))
+
+    chunks = []
+    (start, start_stack) = (0, ())
+    opening = _opening_size(start_stack)
+    # The size of content[start:previous end]
+    size = 0
+    previous = None
+    for (end, end_stack) in boundaries:
+        statement = _size(content[previous[0] if previous else start:end])
+        # The closing of the hierarchies takes 2 bytes per level.
+        if (previous is not None and
+                opening + size + statement + 2 * len(end_stack) + 1 >
+                max_bytes):
+            chunks.append(_chunk(content, start, start_stack, *previous))
+            (start, start_stack) = previous
+            opening = _opening_size(start_stack)
+            size = 0
+        size += statement
+        previous = (end, end_stack)
+    if previous is not None and previous[0] > start:
+        chunks.append(_chunk(content, start, start_stack, *previous))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _opening_size(stack):
+    return sum(_size(header) + 3 for header in stack)
+
+
+def _chunk(content, start, start_stack, end, end_stack):
+    """Return content[start:end] as a balanced configuration."""
+    parts = ['%s {\n' % header for header in start_stack]
+    parts.append(content[start:end].strip('\n'))
+    parts.append('\n')
+    parts.extend('}\n' for header in end_stack)
+    return ''.join(parts)
+
+
+def load_attributes(format, action):
+    """Return the attributes of the load-configuration rpc of a chunk.
+
+    These are the attributes Config.load() of PyEZ sets for the same
+    arguments.
+    """
+    if action == 'set' or format == 'set':
+        return {'action': 'set', 'format': 'text'}
+    attributes = {'format': format}
+    if action == 'replace':
+        attributes['action'] = 'replace'
+    return attributes
+
+
+def load_rpc(chunk, format, action):
+    """Return the load-configuration rpc of a chunk, as an lxml Element."""
+    attributes = load_attributes(format, action)
+    if attributes.get('action') == 'set':
+        return E('load-configuration', E('configuration-set', chunk),
+                 **attributes)
+    return E('load-configuration', E('configuration-text', chunk),
+             **attributes)
+
+
+class ChunkLoadError(Exception):
+    """A chunk failed to load.
+
+    Attributes:
+        chunk - The number of the chunk, from 1.
+        error - The exception raised by the load of the chunk.
+        progress - The progress of the chunks, as returned by load_chunks().
+    """
+
+    def __init__(self, chunk, error, progress):
+        self.chunk = chunk
+        self.error = error
+        self.progress = progress
+        super(ChunkLoadError, self).__init__(
+            'Chunk %d of %d failed (attempts: %d): %s' %
+            (chunk, len(progress), progress[chunk - 1]['attempts'], error))
+
+
+def load_chunks(chunks, send, window=1, retries=0, retryable=None, log=None):
+    """Load the chunks in order, a window of chunks at a time.
+
+    Args:
+        chunks - The list of chunks.
+        send - A callable taking a list of chunk indexes, loading those
+               chunks in order and returning a list of the exception raised
+               by each load, or None.
+        window - The number of chunks given to each call of send.
+        retries - The number of times a chunk is loaded again after a
+                  retryable error.
+        retryable - A callable telling whether an exception is retryable.
+        log - A callable logging a message, or None.
+
+    Returns:
+        A list of dicts, one per chunk, with the chunk number, its bytes,
+        the number of times it was sent and the seconds elapsed since the
+        first load when it was acknowledged.
+
+    Raises:
+        ChunkLoadError: When a chunk failed with an error which isn't
+                        retryable, or failed more than retries times.
+    """
+    progress = [{'chunk': index + 1, 'bytes': _size(chunk), 'attempts': 0,
+                 'seconds': None} for (index, chunk) in enumerate(chunks)]
+    failures = [0] * len(chunks)
+    window = max(1, window)
+    start = time.time()
+    index = 0
+    while index < len(chunks):
+        loaded = index
+        indexes = list(range(index, min(index + window, len(chunks))))
+        errors = send(indexes)
+        for sent in indexes:
+            progress[sent]['attempts'] += 1
+        for (sent, error) in zip(indexes, errors):
+            if error is None:
+                progress[sent]['seconds'] = round(time.time() - start, 3)
+                index = sent + 1
+                continue
+            failures[sent] += 1
+            if (retryable is not None and retryable(error) and
+                    failures[sent] <= retries):
+                if log is not None:
+                    log('Chunk %d of %d failed, loading again from it: %s' %
+                        (sent + 1, len(chunks), error))
+                # The chunks after it in the window are loaded again too.
+                break
+            raise ChunkLoadError(sent + 1, error, progress)
+        if log is not None and index > loaded:
+            log('Loaded %d of %d chunks.' % (index, len(chunks)))
+    return progress
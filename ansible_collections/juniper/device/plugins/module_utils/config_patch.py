@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""The minimal patch which turns one text configuration into another.
+
+A configuration loaded with the override action replaces the whole
+committed configuration, which the device then has to parse and compare in
+full. minimal_patch() compares the desired configuration with the committed
+one locally, both in text format, and returns a configuration which, loaded
+with the replace action, gives the same candidate configuration as the
+override, while holding only the hierarchies which differ:
+
+- A hierarchy which only exists in the committed configuration is removed
+  with the delete: tag.
+- A hierarchy which only exists in the desired configuration is loaded as
+  is.
+- A hierarchy whose statements, or the order of its hierarchies, differ is
+  loaded whole with the replace: tag, or deleted and loaded again when it
+  has a tag such as inactive:. The order matters for the ordered lists,
+  such as the terms of a filter, which can't be told from the others
+  without the schema.
+- The top-level statements which differ, such as version, are loaded with
+  the replace: tag, or removed, one by one, so a leaf-list such as
+  apply-groups is replaced rather than merged.
+
+Comments and annotations are ignored, so, unlike the override, the patch
+doesn't change the annotations of the committed configuration.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import re
+import tempfile
+
+# The tokens of the text format. Comments are matched so they are skipped.
+_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|/\*.*?\*/|#[^\n]*|[{};]|'
+                     r'[^\s{};"]+', re.S)
+# A quoted string the device displays without its quotes
+_PLAIN_STRING = re.compile(r'^"([^\s{};"\'\\#\[\]]+)"$')
+# The tags which may precede a statement
+_TAGS = ['inactive:', 'protect:', 'replace:', 'delete:', 'active:',
+         'unprotect:']
+
+
+class _Hierarchy(object):
+    """A hierarchy of the configuration.
+
+    Attributes:
+        header - The words of the statement opening the hierarchy, as
+                 written, including its tags.
+        key - The normalized words of the header without its tags.
+        statements - The (normalized, as written) text of the statements
+                     which aren't hierarchies, in order.
+        children - The hierarchies by key, in order.
+    """
+
+    def __init__(self, header=()):
+        self.header = list(header)
+        words = [_normalize(word) for word in header]
+        self.tags = [word for word in words if word in _TAGS]
+        self.key = ' '.join(word for word in words if word not in _TAGS)
+        self.statements = []
+        self.children = {}
+        self.order = []
+
+    def child(self, header):
+        hierarchy = _Hierarchy(header)
+        existing = self.children.get(hierarchy.key)
+        if existing is not None and existing.tags == hierarchy.tags:
+            # Junos merges the repeated hierarchies.
+            return existing
+        if existing is None:
+            self.order.append(hierarchy.key)
+        self.children[hierarchy.key] = hierarchy
+        return hierarchy
+
+    def text(self, indent=0, tag=None):
+        """Return the hierarchy as text, with the tag before its header."""
+        pad = '    ' * indent
+        header = ' '.join(([tag] if tag else []) + self.header)
+        lines = ['%s%s {' % (pad, header)]
+        lines.extend(self.body(indent + 1))
+        lines.append('%s}' % pad)
+        return lines
+
+    def body(self, indent):
+        pad = '    ' * indent
+        lines = ['%s%s;' % (pad, written)
+                 for (normalized, written) in self.statements]
+        for key in self.order:
+            lines.extend(self.children[key].text(indent))
+        return lines
+
+
+def _normalize(word):
+    match = _PLAIN_STRING.match(word)
+    if match is not None:
+        return match.group(1)
+    return word
+
+
+def parse(content):
+    """Return the root _Hierarchy of a text configuration.
+
+    Raises:
+        ValueError: When the braces aren't balanced.
+    """
+    root = _Hierarchy()
+    stack = [root]
+    words = []
+    for match in _TOKENS.finditer(content):
+        token = match.group()
+        if token.startswith('/*') or token.startswith('#'):
+            continue
+        if token == '{':
+            stack.append(stack[-1].child(words))
+            words = []
+        elif token == ';':
+            if words:
+                statement = ' '.join(_normalize(word) for word in words)
+                stack[-1].statements.append((statement, ' '.join(words)))
+            words = []
+        elif token == '}':
+            if len(stack) == 1:
+                raise ValueError("Unexpected '}' in the configuration.")
+            hierarchy = stack.pop()
+            if not hierarchy.statements and not hierarchy.children:
+                # An empty hierarchy is displayed as a statement.
+                stack[-1].children.pop(hierarchy.key, None)
+                stack[-1].order.remove(hierarchy.key)
+                stack[-1].statements.append((' '.join(
+                    [_normalize(word) for word in hierarchy.header]),
+                    ' '.join(hierarchy.header)))
+            words = []
+        else:
+            words.append(token)
+    if len(stack) > 1 or words:
+        raise ValueError("The configuration is incomplete: %d hierarchies "
+                         "are not closed." % (len(stack) - 1))
+    return root
+
+
+# The result of _compare() when a hierarchy must be replaced whole
+_REPLACE = 'replace'
+
+
+def _compare(old, new):
+    """Return the changes turning the old hierarchy into the new one.
+
+    Returns:
+        _REPLACE, or a list of (operation, hierarchy, changes) tuples where
+        the operation is 'delete', 'add', 'replace' or 'descend', and
+        changes are the changes of a descended hierarchy.
+    """
+    if [s[0] for s in old.statements] != [s[0] for s in new.statements]:
+        return _REPLACE
+    common_old = [key for key in old.order if key in new.children]
+    common_new = [key for key in new.order if key in old.children]
+    if common_old != common_new:
+        return _REPLACE
+    if new.order[:len(common_new)] != common_new:
+        # A hierarchy is inserted before one which already exists.
+        return _REPLACE
+    return _compare_children(old, new)
+
+
+def _compare_children(old, new):
+    changes = []
+    for key in old.order:
+        if key not in new.children:
+            changes.append(('delete', old.children[key], None))
+    for key in new.order:
+        hierarchy = new.children[key]
+        if key not in old.children:
+            changes.append(('add', hierarchy, None))
+            continue
+        if old.children[key].tags != hierarchy.tags:
+            child_changes = _REPLACE
+        else:
+            child_changes = _compare(old.children[key], hierarchy)
+        if child_changes == _REPLACE and (hierarchy.tags or
+                                          old.children[key].tags):
+            # The replace: tag isn't combined with, or relied on to clear,
+            # the other tags.
+            changes.append(('delete', old.children[key], None))
+            changes.append(('add', hierarchy, None))
+        elif child_changes == _REPLACE:
+            changes.append(('replace', hierarchy, None))
+        elif child_changes:
+            changes.append(('descend', hierarchy, child_changes))
+    return changes
+
+
+def _render(changes, indent, counts):
+    pad = '    ' * indent
+    lines = []
+    for (operation, hierarchy, child_changes) in changes:
+        if operation == 'delete':
+            lines.append('%sdelete: %s;' % (pad, hierarchy.key))
+            counts['deleted'] += 1
+        elif operation == 'add':
+            lines.extend(hierarchy.text(indent))
+            counts['added'] += 1
+        elif operation == 'replace':
+            lines.extend(hierarchy.text(indent, tag='replace:'))
+            counts['replaced'] += 1
+        else:
+            lines.append('%s%s {' % (pad, ' '.join(hierarchy.header)))
+            lines.extend(_render(child_changes, indent + 1, counts))
+            lines.append('%s}' % pad)
+    return lines
+
+
+def minimal_patch(committed, desired):
+    """Return the patch turning the committed configuration into desired.
+
+    Args:
+        committed - The committed configuration, in text format.
+        desired - The desired configuration, in text format.
+
+    Returns:
+        A tuple of the patch, as a text configuration to load with the
+        replace action, or '' when the configurations are the same, and a
+        dict counting the hierarchies 'added', 'deleted' and 'replaced' and
+        the top-level 'statements' changed.
+
+    Raises:
+        ValueError: When a configuration can't be parsed.
+    """
+    old = parse(committed)
+    new = parse(desired)
+    lines = []
+    counts = {'added': 0, 'deleted': 0, 'replaced': 0, 'statements': 0}
+    # The top-level statements are loaded, or deleted, one by one.
+    old_statements = dict((_statement_key(normalized), normalized)
+                          for (normalized, written) in old.statements)
+    new_keys = set()
+    for (normalized, written) in new.statements:
+        key = _statement_key(normalized)
+        new_keys.add(key)
+        if key not in old_statements:
+            lines.append('%s;' % written)
+            counts['statements'] += 1
+        elif old_statements[key] != normalized:
+            # A bare statement would be merged, adding to a leaf-list such
+            # as apply-groups, rather than replacing it.
+            if (_statement_tags(normalized) or
+                    _statement_tags(old_statements[key])):
+                lines.append('delete: %s;' % key)
+                lines.append('%s;' % written)
+            else:
+                lines.append('replace: %s;' % written)
+            counts['statements'] += 1
+    for key in old_statements:
+        if key not in new_keys:
+            lines.append('delete: %s;' % key)
+            counts['statements'] += 1
+    lines.extend(_render(_compare_children(old, new), 0, counts))
+    if not lines:
+        return ('', counts)
+    return ('\n'.join(lines) + '\n', counts)
+
+
+def _statement_key(statement):
+    """Return the keyword of a top-level statement, without its tags."""
+    words = [word for word in statement.split() if word not in _TAGS]
+    return words[0] if words else statement
+
+
+def _statement_tags(statement):
+    """Return the tags of a top-level statement."""
+    return [word for word in statement.split() if word in _TAGS]
+
+
+class CommittedConfigCache(object):
+    """The committed configuration of a host, by commit identifier.
+
+    Only the configuration of the last commit seen is kept.
+    """
+
+    def __init__(self, cache_dir, host):
+        self.path = os.path.join(cache_dir, '%s.json' % host)
+
+    def get(self, commit_id):
+        """Return the configuration cached for commit_id, or None."""
+        try:
+            with open(self.path) as cache_file:
+                entry = json.load(cache_file)
+            if entry.get('commit_id') == commit_id:
+                return entry.get('config')
+        except (IOError, OSError, ValueError, AttributeError):
+            pass
+        return None
+
+    def put(self, commit_id, config):
+        """Cache the configuration of commit_id, replacing the file atomically.
+
+        Raises:
+            IOError, OSError: When the file can't be written.
+        """
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        (fd, tmp_path) = tempfile.mkstemp(prefix='.%s.' %
+                                          os.path.basename(self.path),
+                                          dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump({'commit_id': commit_id, 'config': config},
+                          cache_file)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
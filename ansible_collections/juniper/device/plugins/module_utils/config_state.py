@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""The controller side record of the configuration loaded on each device.
+
+With the state_dir option of the config module, a JSON file per host maps
+the digest of each loaded content to the identifier of the commit at which
+the content was known to be part of the committed configuration. That is
+the commit which followed the load, or the current commit when the load
+made no difference.
+
+While the last commit of the device is still that commit, loading the
+same content again can't change the configuration, and the config module
+skips it. Any other commit, by anyone, invalidates the record.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# The number of contents remembered per host
+MAX_STATE_ENTRIES = 64
+
+
+def content_digest(action, format, content):
+    """Return the digest of the content loaded with action and format."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([action, format]).encode('utf-8'))
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class ConfigStateStore(object):
+    """The commits at which the contents loaded on a host were applied."""
+
+    def __init__(self, state_dir, host):
+        self.path = os.path.join(state_dir, '%s.json' % host)
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as state_file:
+                    self._entries = json.load(state_file).get('contents', {})
+            except (IOError, OSError, ValueError, AttributeError):
+                self._entries = {}
+        return self._entries
+
+    def lookup(self, digest):
+        """Return the commit identifier recorded for digest, or None."""
+        entry = self._load().get(digest)
+        if entry is None:
+            return None
+        return entry.get('commit_id')
+
+    def record(self, digest, commit_id):
+        """Record that digest was applied at commit_id.
+
+        The file is replaced atomically. The least recently recorded
+        entries beyond MAX_STATE_ENTRIES are dropped.
+
+        Raises:
+            IOError, OSError: When the file can't be written.
+        """
+        entries = dict(self._load())
+        entries[digest] = {'commit_id': commit_id, 'recorded': time.time()}
+        if len(entries) > MAX_STATE_ENTRIES:
+            kept = sorted(entries.items(),
+                          key=lambda item: item[1].get('recorded', 0),
+                          reverse=True)[:MAX_STATE_ENTRIES]
+            entries = dict(kept)
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        (fd, tmp_path) = tempfile.mkstemp(prefix='.%s.' %
+                                          os.path.basename(self.path),
+                                          dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as state_file:
+                json.dump({'contents': entries}, state_file, indent=1,
+                          sort_keys=True)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self._entries = entries
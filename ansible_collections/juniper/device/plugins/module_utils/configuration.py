@@ -30,56 +30,96 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
-from distutils.version import LooseVersion
+import hashlib
+import importlib
+import importlib.util
+import json
 import os
+import sys
+import tempfile
 
-# Non-standard library imports and checks
 try:
-    from jnpr.junos.version import VERSION
-    HAS_PYEZ_VERSION = VERSION
+    from ansible.module_utils.compat.version import LooseVersion
 except ImportError:
-    HAS_PYEZ_VERSION = None
-
-try:
-    import jnpr.junos.op
-    import jnpr.junos.factory.factory_loader
-    import jnpr.junos.factory.table
-    HAS_PYEZ_OP_TABLE = True
-except ImportError:
-    HAS_PYEZ_OP_TABLE = False
-
-try:
-    import ncclient.operations.errors as ncclient_exception
-    HAS_NCCLIENT_EXCEPTIONS = True
-except ImportError:
-    HAS_NCCLIENT_EXCEPTIONS = False
-
-try:
-    import jnpr.jsnapy
-    HAS_JSNAPY_VERSION = jnpr.jsnapy.__version__
-except ImportError:
-    HAS_JSNAPY_VERSION = None
-# Most likely JSNAPy 1.2.0 with https://github.com/Juniper/jsnapy/issues/263
-except TypeError:
-    HAS_JSNAPY_VERSION = 'possibly 1.2.0'
-
-try:
-    from lxml import etree
-    HAS_LXML_ETREE_VERSION = '.'.join(map(str, etree.LXML_VERSION))
-except ImportError:
-    HAS_LXML_ETREE_VERSION = None
-
-try:
-    import jxmlease
-    HAS_JXMLEASE_VERSION = jxmlease.__version__
-except ImportError:
-    HAS_JXMLEASE_VERSION = None
-
-try:
-    import yaml
-    HAS_YAML_VERSION = yaml.__version__
-except ImportError:
-    HAS_YAML_VERSION = None
+    from distutils.version import LooseVersion
+
+# Non-standard libraries. They are imported on first access to the matching
+# attribute of this module, see __getattr__(), so each module only pays for
+# the libraries it actually uses.
+_LAZY_IMPORTS = {
+    'etree': 'lxml.etree',
+    'jxmlease': 'jxmlease',
+    'yaml': 'yaml',
+    'jsnapy': 'jnpr.jsnapy',
+    'ncclient_exception': 'ncclient.operations.errors',
+    'pyez_op_table': 'jnpr.junos.op',
+    'pyez_factory_loader': 'jnpr.junos.factory.factory_loader',
+    'pyez_factory_table': 'jnpr.junos.factory.table',
+}
+
+
+def __getattr__(name):
+    """Import the library named name in _LAZY_IMPORTS on first access.
+
+    Raises:
+        ImportError: When the library is not installed.
+    """
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    module = importlib.import_module(_LAZY_IMPORTS[name])
+    globals()[name] = module
+    return module
+
+
+def _pyez_version():
+    try:
+        from jnpr.junos.version import VERSION
+        return VERSION
+    except ImportError:
+        return None
+
+
+def _has_ncclient_exceptions():
+    try:
+        import ncclient.operations.errors
+        return True
+    except ImportError:
+        return False
+
+
+def _jsnapy_version():
+    try:
+        import jnpr.jsnapy
+        return jnpr.jsnapy.__version__
+    except ImportError:
+        return None
+    # Most likely JSNAPy 1.2.0 with https://github.com/Juniper/jsnapy/issues/263
+    except TypeError:
+        return 'possibly 1.2.0'
+
+
+def _lxml_etree_version():
+    try:
+        from lxml import etree
+        return '.'.join(map(str, etree.LXML_VERSION))
+    except ImportError:
+        return None
+
+
+def _jxmlease_version():
+    try:
+        import jxmlease
+        return jxmlease.__version__
+    except ImportError:
+        return None
+
+
+def _yaml_version():
+    try:
+        import yaml
+        return yaml.__version__
+    except ImportError:
+        return None
 
 try:
     # Python 2
@@ -109,6 +149,10 @@ JXMLEASE_INSTALLATION_URL = \
 # Minimum yaml version required by shared code.
 MIN_YAML_VERSION = "3.08"
 YAML_INSTALLATION_URL = "http://pyyaml.org/wiki/PyYAMLDocumentation"
+# Known output sinks, see output_sink.
+OUTPUT_SINK_CHOICES = ['file', 'gzip', 'zstd', 'sqlite', 'tar']
+# Known engines converting XML replies into parsed data, see xml_dict.
+XML_PARSER_CHOICES = ['native', 'jxmlease']
 
 
 def _check_library(
@@ -173,10 +217,10 @@ def check_pyez(minimum=None):
         - PyEZ not installed (unable to import).
         - PyEZ version < minimum.
     """
-    if HAS_NCCLIENT_EXCEPTIONS is False:
+    if not _has_ncclient_exceptions():
             return('ncclient.operations.errors module could not '
                                'be imported.')
-    return _check_library('junos-eznc', HAS_PYEZ_VERSION,
+    return _check_library('junos-eznc', _pyez_version(),
                         PYEZ_INSTALLATION_URL, minimum=minimum,
                         library_nickname='junos-eznc (aka PyEZ)')
 
@@ -191,7 +235,7 @@ def check_jsnapy(minimum=None):
         - jsnapy not installed.
         - jsnapy version < minimum.
     """
-    return _check_library('jsnapy', HAS_JSNAPY_VERSION,
+    return _check_library('jsnapy', _jsnapy_version(),
                         JSNAPY_INSTALLATION_URL, minimum=minimum)
 
 def check_jxmlease(minimum=None):
@@ -205,7 +249,7 @@ def check_jxmlease(minimum=None):
         - jxmlease not installed.
         - jxmlease version < minimum.
     """
-    return _check_library('jxmlease', HAS_JXMLEASE_VERSION,
+    return _check_library('jxmlease', _jxmlease_version(),
                         JXMLEASE_INSTALLATION_URL, minimum=minimum)
 
 def check_lxml_etree(minimum=None):
@@ -219,7 +263,7 @@ def check_lxml_etree(minimum=None):
         - lxml not installed.
         - lxml version < minimum.
     """
-    return _check_library('lxml Etree', HAS_LXML_ETREE_VERSION,
+    return _check_library('lxml Etree', _lxml_etree_version(),
                         LXML_ETREE_INSTALLATION_URL, minimum=minimum)
 
 def check_yaml(minimum=None):
@@ -233,22 +277,116 @@ def check_yaml(minimum=None):
         - yaml not installed.
         - yaml version < minimum.
     """
-    return _check_library('yaml', HAS_YAML_VERSION,
+    return _check_library('yaml', _yaml_version(),
                         YAML_INSTALLATION_URL, minimum=minimum)
 
+# The file caching the successful compatibility checks.
+COMPATIBILITY_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.ansible',
+                                        'juniper_device_compatibility.json')
+# The number of successful compatibility checks kept in the cache file.
+COMPATIBILITY_CACHE_SIZE = 32
+
+
+def _library_fingerprint(module_name):
+    """Return the location and modification time of module_name.
+
+    The module is located without being imported. Installing another version
+    of the library changes its modification time.
+    """
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or spec.origin is None:
+        return [module_name, None, None]
+    try:
+        return [module_name, spec.origin, os.stat(spec.origin).st_mtime]
+    except OSError:
+        return [module_name, spec.origin, None]
+
+
+def _compatibility_key(min_versions):
+    """Return the cache key of a compatibility check.
+
+    The key covers the interpreter, the location and modification time of
+    each library which is checked, and the minimum versions required.
+    """
+    libraries = ['jnpr.junos', 'lxml', 'ncclient']
+    if min_versions[2] is not None:
+        libraries.append('jnpr.jsnapy')
+    if min_versions[3] is not None:
+        libraries.append('jxmlease')
+    if min_versions[4] is not None:
+        libraries.append('yaml')
+    fingerprint = [sys.executable, sys.version, list(min_versions)]
+    fingerprint.extend(_library_fingerprint(name) for name in libraries)
+    return hashlib.sha256(json.dumps(fingerprint).encode('utf-8')).hexdigest()
+
+
+def _read_compatibility_cache():
+    try:
+        with open(COMPATIBILITY_CACHE_FILE) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return []
+    if not isinstance(cache, list):
+        return []
+    return cache
+
+
+def _write_compatibility_cache(cache):
+    """Atomically replace the cache file. Failures are ignored.
+    """
+    cache_dir = os.path.dirname(COMPATIBILITY_CACHE_FILE)
+    try:
+        (fd, path) = tempfile.mkstemp(dir=cache_dir, prefix='.juniper_device_')
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump(cache[-COMPATIBILITY_CACHE_SIZE:], cache_file)
+        os.replace(path, COMPATIBILITY_CACHE_FILE)
+    except (IOError, OSError):
+        pass
+
+
 def check_sw_compatibility(min_pyez_version,
                         min_lxml_etree_version,
                         min_jsnapy_version=None,
                         min_jxmlease_version=None,
                         min_yaml_version=None):
-    """Check yaml is available and version is >= minimum.
+    """Check the libraries are available and their versions are >= minimum.
+
+        A successful check is cached in COMPATIBILITY_CACHE_FILE, keyed on
+        the interpreter, the installed libraries and the minimum versions,
+        and is not repeated until one of them changes.
 
         Args:
-            minimum: The minimum PyYAML version required.
-                     Default = None which means no version check.
+            min_*_version: The minimum version required of each library.
+                     None means the library is not checked, except for
+                     PyEZ and lxml Etree which are always checked.
         Returns:
             string as success or the error
     """
+    key = _compatibility_key((min_pyez_version, min_lxml_etree_version,
+                              min_jsnapy_version, min_jxmlease_version,
+                              min_yaml_version))
+    cache = _read_compatibility_cache()
+    if key in cache:
+        return "success"
+    ret_output = _check_sw_compatibility(min_pyez_version,
+                                         min_lxml_etree_version,
+                                         min_jsnapy_version,
+                                         min_jxmlease_version,
+                                         min_yaml_version)
+    if ret_output == "success":
+        cache.append(key)
+        _write_compatibility_cache(cache)
+    return ret_output
+
+
+def _check_sw_compatibility(min_pyez_version,
+                            min_lxml_etree_version,
+                            min_jsnapy_version=None,
+                            min_jxmlease_version=None,
+                            min_yaml_version=None):
     ret_output = check_pyez(min_pyez_version)
     if ret_output != "success":
         return ret_output
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Batched programming of a Junos ephemeral configuration instance.
+
+An EphemeralEngine keeps an ephemeral instance open on a NETCONF session
+and applies the updates submitted to it from a worker thread:
+
+- the updates which arrive within the coalescing window of the first one,
+  up to the maximum batch size, form a batch;
+- the consecutive set or text updates of a batch with the same load action
+  are joined into a single load-configuration RPC;
+- each batch is committed once.
+
+submit() returns as soon as the updates are queued, so the updates of
+successive tasks, or of one task with many updates, share the commits. A
+batch which fails is discarded by closing and opening the instance again,
+then its two halves are applied on their own, and so on down to the single
+updates, so only the updates which fail are discarded. Their errors are
+reported by wait() and flush().
+
+The juniper.device.pyez connection keeps an engine per instance, on a
+dedicated session, for the life of the persistent connection. The ephemeral
+module uses an engine on its own device when it runs without a persistent
+connection.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+import time
+from collections import deque
+
+try:
+    import jnpr.junos.utils.config
+    HAS_PYEZ_CONFIG = True
+except ImportError:
+    HAS_PYEZ_CONFIG = False
+
+# The seconds the first update of a batch waits for the others
+DEFAULT_WINDOW = 0.05
+# The maximum number of updates committed at once
+DEFAULT_MAX_BATCH = 500
+# The load actions of an ephemeral instance
+EPHEMERAL_LOAD_CHOICES = ['merge', 'replace', 'set', 'update']
+# The formats whose updates are joined into one load
+_JOINABLE_FORMATS = ['set', 'text']
+
+
+class EphemeralEngineError(Exception):
+    """An ephemeral instance which can't be opened or programmed."""
+
+
+class EphemeralSession(object):
+    """An ephemeral instance opened with PyEZ on a Device.
+
+    The methods raise the RpcError and ConnectError exceptions of PyEZ.
+    With close_device, shutdown() also closes the Device.
+    """
+
+    def __init__(self, dev, instance=None, ignore_warning=None,
+                 close_device=False):
+        self.dev = dev
+        self.instance = instance
+        self.ignore_warning = ignore_warning
+        self.close_device = close_device
+        self.config = None
+
+    def open(self):
+        kwargs = {'mode': 'ephemeral'}
+        if self.instance is not None:
+            kwargs['ephemeral_instance'] = self.instance
+        config = jnpr.junos.utils.config.Config(self.dev, **kwargs)
+        if self.instance is None:
+            self.dev.rpc.open_configuration(
+                ephemeral=True, ignore_warning=self.ignore_warning)
+        else:
+            self.dev.rpc.open_configuration(
+                ephemeral_instance=self.instance,
+                ignore_warning=self.ignore_warning)
+        self.config = config
+
+    def load(self, content, format, action):
+        load_args = {'ignore_warning': self.ignore_warning}
+        if format is not None:
+            load_args['format'] = format
+        if action == 'merge':
+            load_args['merge'] = True
+        elif action == 'update':
+            load_args['update'] = True
+        elif action == 'set':
+            load_args['format'] = 'set'
+        self.config.load(content, **load_args)
+
+    def commit(self):
+        self.config.commit(ignore_warning=self.ignore_warning)
+
+    def close(self):
+        if self.config is not None:
+            self.config = None
+            self.dev.rpc.close_configuration()
+
+    def shutdown(self):
+        try:
+            self.close()
+        finally:
+            if self.close_device:
+                self.dev.close()
+
+
+class EphemeralEngine(object):
+    """Apply the updates of an ephemeral instance in committed batches.
+
+    Args:
+        session - The EphemeralSession, not yet opened. It is only used by
+                  the worker thread, and must not share its NETCONF session
+                  with other users of the configuration.
+        window - The coalescing window, in seconds.
+        max_batch - The maximum number of updates per commit.
+    """
+
+    def __init__(self, session, window=DEFAULT_WINDOW,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.session = session
+        self.window = window
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._submitted = 0
+        self._done = 0
+        self._failed = set()
+        self._errors = []
+        self._thread = None
+        self._closing = False
+        self._opened = False
+        # Statistics since the last flush()
+        self._stats_start = None
+        self._stats_end = None
+        self._stats = {'updates': 0, 'batches': 0, 'loads': 0, 'failed': 0}
+
+    def submit(self, updates):
+        """Queue updates, a list of (content, format, action) tuples.
+
+        Returns:
+            The sequence number of the last update, for wait().
+        """
+        with self._cond:
+            if self._closing:
+                raise EphemeralEngineError('The ephemeral engine is closed.')
+            if self._stats_start is None:
+                self._stats_start = time.time()
+            for update in updates:
+                self._submitted += 1
+                self._queue.append((self._submitted, update))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='ephemeral-engine')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+            return self._submitted
+
+    def wait(self, seq, timeout=None, since=1):
+        """Wait until the updates up to seq are applied.
+
+        Returns:
+            The list of the errors of the failed batches with updates from
+            since to seq.
+
+        Raises:
+            EphemeralEngineError: When timeout expires.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._done < seq:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise EphemeralEngineError(
+                            'Timed out after %s seconds waiting for %d '
+                            'ephemeral updates.' % (timeout, seq - self._done))
+                self._cond.wait(remaining)
+            return [error for (first, last, error) in self._errors
+                    if first <= seq and last >= since]
+
+    def flush(self, timeout=None):
+        """Wait for every queued update, then return and reset the statistics.
+
+        Returns:
+            A dict with the number of updates applied, batches committed,
+            load RPCs and failed updates, the elapsed seconds from the first
+            submit() to the last commit, the updates per second over that
+            time, and the errors of the failed batches.
+        """
+        with self._cond:
+            seq = self._submitted
+        self.wait(seq, timeout)
+        with self._cond:
+            stats = dict(self._stats)
+            elapsed = 0.0
+            if self._stats_start is not None and self._stats_end is not None:
+                elapsed = self._stats_end - self._stats_start
+            stats['elapsed'] = round(elapsed, 6)
+            stats['updates_per_second'] = (
+                round(stats['updates'] / elapsed, 1) if elapsed > 0 else None)
+            stats['errors'] = [error for (_, _, error) in self._errors]
+            self._stats = {'updates': 0, 'batches': 0, 'loads': 0,
+                           'failed': 0}
+            self._stats_start = self._stats_end = None
+            self._errors = []
+            return stats
+
+    def close(self, timeout=None):
+        """Flush, stop the worker thread and shut the session down.
+
+        The worker thread shuts the session down once it has applied the
+        queued updates. When flush() times out, close() raises while the
+        worker goes on with the queued updates, and the session is only shut
+        down after its last batch.
+
+        Returns:
+            The statistics of flush().
+        """
+        try:
+            return self.flush(timeout)
+        finally:
+            with self._cond:
+                self._closing = True
+                thread = self._thread
+                self._cond.notify_all()
+            if thread is None:
+                self._shutdown()
+            else:
+                thread.join(timeout)
+
+    def _next_batch(self):
+        """Return the next batch, or None when closing with nothing queued."""
+        with self._cond:
+            while not self._queue and not self._closing:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            # Wait for the updates arriving within the window.
+            deadline = time.time() + self.window
+            while len(self._queue) < self.max_batch and not self._closing:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._queue), self.max_batch)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _shutdown(self):
+        self._opened = False
+        try:
+            self.session.shutdown()
+        except Exception:
+            pass
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._shutdown()
+                return
+            (results, loads) = self._apply_split(batch)
+            with self._cond:
+                self._done = batch[-1][0]
+                self._stats_end = time.time()
+                self._stats['loads'] += loads
+                for (part, error) in results:
+                    if error is None:
+                        self._stats['updates'] += len(part)
+                        self._stats['batches'] += 1
+                    else:
+                        self._stats['failed'] += len(part)
+                        self._errors.append((part[0][0], part[-1][0], error))
+                self._cond.notify_all()
+
+    def _apply_split(self, batch):
+        """Apply batch, or its halves, recursively, when it fails.
+
+        The batch isn't split when the instance can't be opened, as its
+        halves would fail the same way.
+
+        Returns:
+            A tuple of the list of the (part, error message or None) tuples
+            of the parts of batch, in order, and the number of loads.
+        """
+        (error, loads, opened) = self._apply(batch)
+        if error is None or len(batch) == 1 or not opened:
+            return ([(batch, error)], loads)
+        results = []
+        half = len(batch) // 2
+        for part in (batch[:half], batch[half:]):
+            (part_results, part_loads) = self._apply_split(part)
+            results.extend(part_results)
+            loads += part_loads
+        return (results, loads)
+
+    def _apply(self, batch):
+        """Load and commit batch.
+
+        Returns:
+            A tuple of the error message, or None, the number of loads and
+            whether the instance was opened.
+        """
+        loads = 0
+        try:
+            if not self._opened:
+                self.session.open()
+                self._opened = True
+            for (content, format, action) in _coalesce(
+                    [update for (_, update) in batch]):
+                self.session.load(content, format, action)
+                loads += 1
+            self.session.commit()
+            return (None, loads, True)
+        except Exception as ex:
+            opened = self._opened
+            # Discard the uncommitted loads of the batch.
+            if self._opened:
+                self._opened = False
+                try:
+                    self.session.close()
+                except Exception:
+                    pass
+            return ('Updates %d to %d: %s' % (batch[0][0], batch[-1][0],
+                                              str(ex)), loads, opened)
+
+
+def _coalesce(updates):
+    """Join the consecutive joinable updates with the same format and action.
+
+    Returns:
+        A list of (content, format, action) tuples.
+    """
+    loads = []
+    for (content, format, action) in updates:
+        if action == 'set':
+            format = 'set'
+        if (loads and format in _JOINABLE_FORMATS and
+                loads[-1][1] == format and loads[-1][2] == action):
+            loads[-1] = (loads[-1][0] + '\n' + content, format, action)
+        else:
+            loads.append((content, format, action))
+    return loads
@@ -49,9 +49,7 @@ from ansible.module_utils.common.validation import check_type_dict
 
 # Standard library imports
 from argparse import ArgumentParser
-from distutils.version import LooseVersion
 import json
-import xmltodict
 import logging
 import os
 import hashlib
@@ -63,306 +61,6 @@ except NameError:
     # Python 3
     basestring = str
 
-class ModuleDocFragment(object):
-    """Documentation fragment for connection-related parameters.
-
-    All modules share a common set of connection parameters
-    which are documented in this class.
-
-    Attributes:
-        CONNECTION_DOCUMENTATION: The documentation string defining the
-                                  connection-related parameters for the
-                                  modules.
-        LOGGING_DOCUMENTATION: The documentation string defining the
-                               logging-related parameters for the
-                               modules.
-    """
-
-    # The connection-specific options. Defined here so it can be re-used as
-    # suboptions in provider.
-    _CONNECT_DOCUMENTATION = '''
-      attempts:
-        description:
-          - The number of times to try connecting and logging in to the Junos
-            device. This option is only applicable when using C(mode = 'telnet')
-            or C(mode = 'serial'). Mutually exclusive with the I(console)
-            option.
-        required: false
-        default: 10
-        type: int
-      baud:
-        description:
-          - The serial baud rate, in bits per second, used to connect to the
-            Junos device. This option is only applicable when using
-            C(mode = 'serial'). Mutually exclusive with the I(console) option.
-        required: false
-        default: 9600
-        type: int
-      console:
-        description:
-          - An alternate method of specifying a NETCONF over serial console
-            connection to the Junos device using Telnet to a console server.
-            The value of this option must be a string in the format
-            C(--telnet <console_hostname>,<console_port_number>).
-            This option is deprecated. It is present only for backwards
-            compatibility. The string value of this option is exactly equivalent
-            to specifying I(host) with a value of C(<console_hostname>),
-            I(mode) with a value of C(telnet), and I(port) with a value of
-            C(<console_port_number>). Mutually exclusive with the I(mode),
-            I(port), I(baud), and I(attempts) options.
-        required: false
-        default: none
-        type: str
-      host:
-        description:
-          - The hostname or IP address of the Junos device to which the
-            connection should be established. This is normally the Junos device
-            itself, but is the hostname or IP address of a console server when
-            connecting to the console of the device by setting the I(mode)
-            option to the value C(telnet). This option is required, but does not
-            have to be specified explicitly by the user because it defaults to
-            C({{ inventory_hostname }}).
-        required: true
-        default: C({{ inventory_hostname }})
-        type: str
-        aliases:
-          - hostname
-          - ip
-      mode:
-        description:
-          - The PyEZ mode used to establish a NETCONF connection to the Junos
-            device. A value of C(none) uses the default NETCONF over SSH mode.
-            Depending on the values of the I(host) and I(port) options, a value
-            of C(telnet) results in either a direct NETCONF over Telnet
-            connection to the Junos device, or a NETCONF over serial console
-            connection to the Junos device using Telnet to a console server.
-            A value of C(serial) results in a NETCONF over serial console
-            connection to the Junos device. Mutually exclusive with the
-            I(console) option.
-        required: false
-        default: none
-        type: str
-        choices:
-          - none
-          - telnet
-          - serial
-      passwd:
-        description:
-          - The password, or ssh key's passphrase, used to authenticate with the
-            Junos device. If this option is not specified, authentication is
-            attempted using an empty password, or ssh key passphrase.
-        required: false
-        default: The first defined value from the following list
-                 1) The C(ANSIBLE_NET_PASSWORD) environment variable.
-                    (used by Ansible Tower)
-                 2) The value specified using the C(-k) or C(--ask-pass)
-                    command line arguments to the C(ansible) or
-                    C(ansible-playbook) command.
-                 3) none (An empty password/passphrase)
-        type: str
-        aliases:
-          - password
-      port:
-        description:
-          - The TCP port number or serial device port used to establish the 
-            connection. Mutually exclusive with the I(console) option.
-        required: false
-        default: C(830) if C(mode = none), C(23) if C(mode = 'telnet'),
-                 C('/dev/ttyUSB0') if (mode = 'serial')
-        type: int or str
-      ssh_private_key_file:
-        description:
-          - The path to the SSH private key file used to authenticate with the
-            Junos device. If this option is not specified, and no default value
-            is found using the algorithm below, then the SSH private key file
-            specified in the user's SSH configuration, or the
-            operating-system-specific default is used.
-          - This must be in the RSA PEM format, and not the newer OPENSSH
-            format. To check if the private key is in the correct format, issue
-            the command `head -n1 ~/.ssh/some_private_key` and ensure that
-            it's RSA and not OPENSSH. To create a key in the RSA PEM format,
-            issue the command `ssh-keygen -m PEM -t rsa -b 4096`. To convert
-            an OPENSSH key to an RSA key, issue the command `ssh-keygen -p -m
-            PEM -f ~/.ssh/some_private_key`
-        required: false
-        default: The first defined value from the following list
-                 1) The C(ANSIBLE_NET_SSH_KEYFILE) environment variable.
-                    (used by Ansible Tower)
-                 2) The value specified using the C(--private-key) or
-                    C(--key-file) command line arguments to the C(ansible) or
-                    C(ansible-playbook) command.
-                 3) none (the file specified in the user's SSH configuration,
-                          or the operating-system-specific default)
-        type: path
-        aliases:
-          - ssh_keyfile
-      ssh_config:
-        description:
-          - The path to the SSH client configuration file. If this option is not
-            specified, then the PyEZ Device instance by default queries file
-            ~/.ssh/config.
-        required: false
-        type: path
-      timeout:
-        description:
-          - The maximum number of seconds to wait for RPC responses from the
-            Junos device. This option does NOT control the initial connection
-            timeout value.
-        required: false
-        default: 30
-        type: int
-      user:
-        description:
-          - The username used to authenticate with the Junos device. This option
-            is required, but does not have to be specified explicitly by the
-            user due to the algorithm for determining the default value.
-        required: true
-        default: The first defined value from the following list
-                 1) The C(ANSIBLE_NET_USERNAME) environment variable.
-                    (used by Ansible Tower)
-                 2) The C(remote_user) as defined by Ansible. Ansible sets this
-                    value via several methods including
-                    a) C(-u) or C(--user) command line arguments to the
-                       C(ansible) or C(ansible-playbook) command.
-                    b) C(ANSIBLE_REMOTE_USER) environment variable.
-                    c) C(remote_user) configuration setting.
-                    See the Ansible documentation for the precedence used to set
-                    the C(remote_user) value.
-                3) The C(USER) environment variable.
-        type: str
-        aliases:
-          - username
-      cs_user:
-        description:
-          - The username used to authenticate with the console server over SSH. 
-            This option is only required if you want to connect to a device over console
-             using SSH as transport. Mutually exclusive with the I(console) option.
-        required: false
-        type: str
-        aliases:
-          - console_username
-      cs_passwd:
-        description:
-          - The password used to authenticate with the console server over SSH. 
-            This option is only required if you want to connect to a device over console
-             using SSH as transport. Mutually exclusive with the I(console) option.
-        required: false
-        type: str
-        aliases:
-          - console_password
-      huge_tree:
-        description:
-          - Parse XML with very deep trees and long text content.
-        required: false
-        type: bool
-        default: false
-'''
-
-    LOGGING_DOCUMENTATION = '''
-    logging_options:
-      logdir:
-        description:
-          - The path to a directory, on the Ansible control machine, where
-            debugging information for the particular task is logged.
-          - If this option is specified, debugging information is logged to a
-            file named C({{ inventory_hostname }}.log) in the directory
-            specified by the I(logdir) option.
-          - The log file must be writeable. If the file already exists, it is
-            appended. It is the users responsibility to delete/rotate log files.
-          - The level of information logged in this file is controlled by
-            Ansible's verbosity, debug options and level option in task
-          - 1) By default, messages at level C(WARNING) or higher are logged.
-          - 2) If the C(-v) or C(--verbose) command-line options to the
-               C(ansible-playbook) command are specified, messages at level
-               C(INFO) or higher are logged.
-          - 3) If the C(-vv) (or more verbose) command-line option to the
-               C(ansible-playbook) command is specified, or the C(ANSIBLE_DEBUG)
-               environment variable is set, then messages at level C(DEBUG) or
-               higher are logged.
-          - 4) If C(level) is mentioned then messages at level C(level) or more are
-               logged.
-          - The I(logfile) and I(logdir) options are mutually exclusive. The
-            I(logdir) option is recommended for all new playbooks.
-        required: false
-        default: none
-        type: path
-        aliases:
-          - log_dir
-      logfile:
-        description:
-          - The path to a file, on the Ansible control machine, where debugging
-            information for the particular task is logged.
-          - The log file must be writeable. If the file already exists, it is
-            appended. It is the users responsibility to delete/rotate log files.
-          - The level of information logged in this file is controlled by
-            Ansible's verbosity, debug options and level option in task
-          - 1) By default, messages at level C(WARNING) or higher are logged.
-          - 2) If the C(-v) or C(--verbose) command-line options to the
-               C(ansible-playbook) command are specified, messages at level
-               C(INFO) or higher are logged.
-          - 3) If the C(-vv) (or more verbose) command-line option to the
-               C(ansible-playbook) command is specified, or the C(ANSIBLE_DEBUG)
-               environment variable is set, then messages at level C(DEBUG) or
-               higher are logged.
-          - 4) If C(level) is mentioned then messages at level C(level) or more are
-               logged.
-          - When tasks are executed against more than one target host,
-            one process is forked for each target host. (Up to the maximum
-            specified by the forks configuration. See
-            U(forks|http://docs.ansible.com/ansible/latest/intro_configuration.html#forks)
-            for details.) This means that the value of this option must be
-            unique per target host. This is usually accomplished by including
-            C({{ inventory_hostname }}) in the I(logfile) value. It is the
-            user's responsibility to ensure this value is unique per target
-            host.
-          - For this reason, this option is deprecated. It is maintained for
-            backwards compatibility. Use the I(logdir) option in new playbooks.
-            The I(logfile) and I(logdir) options are mutually exclusive.
-        required: false
-        default: none
-        type: path
-        aliases:
-          - log_file
-      level:
-        description:
-          - The level of information to be logged can be modified using this option
-          - 1) By default, messages at level C(WARNING) or higher are logged.
-          - 2) If the C(-v) or C(--verbose) command-line options to the
-               C(ansible-playbook) command are specified, messages at level
-               C(INFO) or higher are logged.
-          - 3) If the C(-vv) (or more verbose) command-line option to the
-               C(ansible-playbook) command is specified, or the C(ANSIBLE_DEBUG)
-               environment variable is set, then messages at level C(DEBUG) or
-               higher are logged.
-          - 4) If C(level) is mentioned then messages at level C(level) or more are
-               logged.
-        required: false
-        default: WARNING
-        type: str
-        choices:
-          - INFO
-          - DEBUG
-               
-
-'''
-
-    # _SUB_CONNECT_DOCUMENTATION is just _CONNECT_DOCUMENTATION with each
-    # line indented.
-    _SUB_CONNECT_DOCUMENTATION = ''
-    for line in _CONNECT_DOCUMENTATION.splitlines(True):
-        _SUB_CONNECT_DOCUMENTATION += '    ' + line
-
-    # Build actual DOCUMENTATION string by putting the pieces together.
-    CONNECTION_DOCUMENTATION = '''
-    connection_options:''' + _CONNECT_DOCUMENTATION + '''
-    requirements:
-      - U(junos-eznc|https://github.com/Juniper/py-junos-eznc) >= ''' + cfg.MIN_PYEZ_VERSION + '''
-      - Python >= 3.5
-    notes:
-      - The NETCONF system service must be enabled on the target Junos device.
-'''
-
-
 # The common argument specification for connecting to Junos devices.
 connection_spec = {
     'host': dict(type='str',
@@ -445,12 +143,26 @@ connection_spec_mutually_exclusive = [['mode', 'console'],
 logging_spec = {
     'logfile': dict(type='path', required=False, default=None),
     'logdir': dict(type='path', required=False, default=None),
-    'level': dict(choices=[None, 'INFO', 'DEBUG'], required=False, default=None)
+    'level': dict(choices=[None, 'INFO', 'DEBUG'], required=False, default=None),
+    'log_max_size': dict(type='int', required=False, default=0),
+    'log_backup_count': dict(type='int', required=False, default=5)
 }
 
 # The logdir and logfile options are mutually exclusive.
 logging_spec_mutually_exclusive = ['logfile', 'logdir']
 
+# The options selecting the sink of the saved outputs and the parser of the
+# XML outputs. Included in the argument_spec of the modules which save
+# outputs.
+output_spec = {
+    'output_sink': dict(type='str', required=False, default='file',
+                        choices=cfg.OUTPUT_SINK_CHOICES),
+    'output_atomic': dict(type='bool', required=False, default=False),
+    'output_archive': dict(type='path', required=False, default=None),
+    'xml_parser': dict(type='str', required=False, default='native',
+                       choices=cfg.XML_PARSER_CHOICES)
+}
+
 # Other logging names which should be logged to the logfile
 additional_logger_names = ['ncclient', 'paramiko']
 
@@ -472,11 +184,22 @@ internal_spec = {
                                 default=None),
     '_connection': dict(type='str',
                         default=None),
+    '_hub_socket': dict(type='path',
+                        default=None),
 }
 
+# The connection arguments which identify a device's session in the
+# connection hub.
+HUB_DEVICE_ARGS = ['host', 'port', 'user', 'passwd', 'ssh_private_key_file',
+                   'ssh_config', 'timeout']
+
 # Known RPC output formats
 RPC_OUTPUT_FORMAT_CHOICES = ['text', 'xml', 'json']
 
+# Known output modes selecting the returned keys of an output
+OUTPUT_MODE_CHOICES = ['full', 'lines_only', 'parsed_only', 'digest_only',
+                       'file_only']
+
 # Known configuration formats
 CONFIG_FORMAT_CHOICES = ['xml', 'set', 'text', 'json']
 # Known configuration databases
@@ -489,6 +212,22 @@ CONFIG_MODE_CHOICES = ['exclusive', 'private', 'dynamic', 'batch', 'ephemeral']
 # Supported configuration models
 CONFIG_MODEL_CHOICES = ['openconfig', 'custom', 'ietf', 'True']
 
+class HubConnection(Connection):
+    """A Connection to the session of one device in the connection hub.
+
+    The calls of the juniper.device.pyez Connection methods are sent to the
+    hub's device_call() with the device's connection arguments.
+    """
+
+    def __init__(self, socket_path, device):
+        super(HubConnection, self).__init__(socket_path)
+        self._device = device
+
+    def __rpc__(self, name, *args, **kwargs):
+        return super(HubConnection, self).__rpc__('device_call', self._device,
+                                                  name, list(args), kwargs)
+
+
 class JuniperJunosModule(AnsibleModule):
     """A subclass of AnsibleModule used by all modules.
 
@@ -496,7 +235,8 @@ class JuniperJunosModule(AnsibleModule):
     this class.
 
     Attributes:
-        dev: An instance of a PyEZ Device() object.
+        dev: An instance of a PyEZ Device() object. For local connections
+             it is opened on first access.
 
     Public Methods:
         exit_json: Close self.dev and call parent's exit_json().
@@ -523,6 +263,7 @@ class JuniperJunosModule(AnsibleModule):
         commit_configuration: Commit the candidate configuration.
         ping: Execute a ping command from a Junos device.
         save_text_output: Save text output into a file.
+        get_rpc_batch: Execute a list of RPCs over the persistent connection.
     """
 
     # Method overrides
@@ -539,7 +280,9 @@ class JuniperJunosModule(AnsibleModule):
 
         Combines module-specific parameters with the common parameters shared
         by all modules. Performs additional checks on options.
-        Checks the minimum PyEZ version. Creates and opens the PyEZ Device instance.
+        Checks the minimum PyEZ version. For local connections, the PyEZ
+        Device instance is created and opened on the first access to self.dev,
+        so a module which exits before using the device never connects to it.
 
         Args:
             agument_spec: Module-specific argument_spec added to top_spec.
@@ -576,9 +319,23 @@ class JuniperJunosModule(AnsibleModule):
         # by default local
         self.conn_type = "local"
         # Initialize the dev attribute
-        self.dev = None
+        self._dev = None
+        # Whether self.dev is opened on first access
+        self._dev_pending = False
         # Initialize the config attribute
         self.config = None
+        # Hits and misses of the persistent connection's rpc cache.
+        self.rpc_cache_stats = {'hits': 0, 'misses': 0}
+        # The logging_utils.QueuedFileLog of the logfile or logdir option
+        self._file_log = None
+        # The sink of the saved outputs, opened on first use
+        self._output_sink = None
+        # The template_render.TemplateRenderer, created on first use
+        self._template_renderer = None
+        # The rendered templates, by (template, vars) key
+        self._rendered_templates = {}
+        # Whether the configuration of a persistent connection was used
+        self._config_used = False
 
         # Update argument_spec with the internal_spec
         argument_spec.update(internal_spec)
@@ -609,27 +366,58 @@ class JuniperJunosModule(AnsibleModule):
         if ret_output != 'success':
             self.fail_json(msg="%s" % ret_output)
 
-        self.pyez_factory_loader = jnpr.junos.factory.factory_loader
-        self.pyez_factory_table = jnpr.junos.factory.table
-        self.pyez_op_table = jnpr.junos.op
+        # The optional libraries (jxmlease, yaml, jsnapy and the PyEZ
+        # op/factory tables) are properties which import them on first use.
         self.pyez_exception = pyez_exception
         self.ncclient_exception = cfg.ncclient_exception
         self.etree = cfg.etree
-        self.jxmlease = cfg.jxmlease
-        self.yaml = cfg.yaml
-
-        if min_jsnapy_version is not None:
-            self.jsnapy = jnpr.jsnapy
 
         # Setup logging.
         self.logger = self._setup_logging()
 
-        # Open the PyEZ connection
+        # Open the PyEZ connection, on first access for local connections
         if self.conn_type == "local":
-            self.open()
+            self._dev_pending = True
         else:
             self._pyez_conn = self.get_connection()
 
+    @property
+    def dev(self):
+        """The PyEZ Device instance, opened on first access.
+        """
+        if self._dev is None and self._dev_pending:
+            self._dev_pending = False
+            self.open()
+        return self._dev
+
+    @dev.setter
+    def dev(self, value):
+        self._dev = value
+
+    @property
+    def pyez_factory_loader(self):
+        return cfg.pyez_factory_loader
+
+    @property
+    def pyez_factory_table(self):
+        return cfg.pyez_factory_table
+
+    @property
+    def pyez_op_table(self):
+        return cfg.pyez_op_table
+
+    @property
+    def jxmlease(self):
+        return cfg.jxmlease
+
+    @property
+    def yaml(self):
+        return cfg.yaml
+
+    @property
+    def jsnapy(self):
+        return cfg.jsnapy
+
     def initialize_params(self):
         """
         Initalize the parameters in common module
@@ -639,6 +427,7 @@ class JuniperJunosModule(AnsibleModule):
         self.module_name = self.params.get('_module_name')
         self.inventory_hostname = self.params.get('_inventory_hostname')
         self.conn_type = self.params.get('_connection')
+        self._hub_socket = self.params.get('_hub_socket')
 
         # Parse the console option
         self._parse_console_options()
@@ -685,9 +474,30 @@ class JuniperJunosModule(AnsibleModule):
                 self.fail_json(msg="The attempts option (%s) is not valid when "
                                    "mode == none." % (self.params.get('attempts')))
 
+        # The file_only output mode returns the location of the saved output.
+        if (self.params.get('output_mode') == 'file_only' and
+                self.params.get('dest') is None and
+                self.params.get('dest_dir') is None):
+            self.fail_json(msg="The dest or dest_dir option is required when "
+                               "output_mode is file_only.")
+        if (self.params.get('stream_output') and
+                self.params.get('dest') is None and
+                self.params.get('dest_dir') is None):
+            self.fail_json(msg="The dest or dest_dir option is required when "
+                               "stream_output is set.")
+
+        # The connection hub only hosts NETCONF over SSH sessions.
+        if (self._hub_socket is not None and self.conn_type == "local" and
+                self.params.get('mode') is None):
+            self.conn_type = "hub"
+
     def get_connection(self):
         if hasattr(self, "_pyez_connection"):
             return self._pyez_connection
+        if self.conn_type == "hub":
+            device = dict((arg, self.params.get(arg)) for arg in HUB_DEVICE_ARGS)
+            self._pyez_connection = HubConnection(self._hub_socket, device)
+            return self._pyez_connection
         try:
             capabilities = self.get_capabilities()
         except ConnectionError as exc:
@@ -726,8 +536,20 @@ class JuniperJunosModule(AnsibleModule):
             except TimeoutExpiredError:
                 if hasattr(self, 'logger'):
                     self.logger.debug("Ignoring dev.close() timeout error")
+        # Report the rpc cache counters if the cache was consulted.
+        if self.rpc_cache_stats['hits'] or self.rpc_cache_stats['misses']:
+            kwargs.setdefault('rpc_cache', dict(self.rpc_cache_stats))
         if hasattr(self, 'logger'):
             self.logger.debug("Exit JSON: %s", kwargs)
+        # Write the staged outputs.
+        if self._output_sink is not None:
+            from ansible_collections.juniper.device.plugins.module_utils import output_sink
+            try:
+                self.close_output_sink()
+            except (IOError, OSError, output_sink.OutputSinkError) as ex:
+                self.fail_json(msg="Unable to save output. %s" % (str(ex)))
+        # Write the pending log records.
+        self.stop_file_log()
         # Call the parent's exit_json()
         super(JuniperJunosModule, self).exit_json(**kwargs)
 
@@ -749,11 +571,28 @@ class JuniperJunosModule(AnsibleModule):
                 self.logger.debug("Ignoring dev.close() timeout error")
         if hasattr(self, 'logger'):
             self.logger.debug("Fail JSON: %s", kwargs)
+        # Write the staged outputs.
+        if self._output_sink is not None:
+            from ansible_collections.juniper.device.plugins.module_utils import output_sink
+            try:
+                self.close_output_sink()
+            except (IOError, OSError, output_sink.OutputSinkError) as ex:
+                if hasattr(self, 'logger'):
+                    self.logger.debug("Unable to save output. %s", ex)
+        # Write the pending log records.
+        self.stop_file_log()
         # Call the parent's fail_json()
         super(JuniperJunosModule, self).fail_json(**kwargs)
 
     # JuniperJunosModule-specific methods below this point.
 
+    def stop_file_log(self):
+        """Write the pending records to the log file and close it.
+        """
+        if self._file_log is not None:
+            self._file_log.stop()
+            self._file_log = None
+
     def _parse_console_options(self):
         """Parse the console option value.
 
@@ -831,13 +670,16 @@ class JuniperJunosModule(AnsibleModule):
         3) Sets the level for other Logger objects specified in
            additional_logger_names depending on verbosity and
            debug settings specified by the user.
-        4) If the logfile or logdir option is specified, attach a FileHandler
-           instance which logs messages from jnpr.ansible_module.<mod_name> or
-           any of the names in additional_logger_names.
+        4) If the logfile or logdir option is specified, attach a
+           logging_utils.QueuedFileLog which logs messages from
+           jnpr.ansible_module.<mod_name> or any of the names in
+           additional_logger_names from a background thread. The file is
+           rotated at log_max_size bytes, keeping log_backup_count files.
 
         Returns:
             Logger instance object for the name jnpr.ansible_module.<mod_name>.
         """
+        from ansible_collections.juniper.device.plugins.module_utils import logging_utils
 
         class CustomAdapter(logging.LoggerAdapter):
             """
@@ -877,24 +719,22 @@ class JuniperJunosModule(AnsibleModule):
         elif self.params.get('logdir') is not None:
             logfile = os.path.normpath(self.params.get('logdir') + '/' +
                                        self.params.get('host') + '.log')
-        # Create the FileHandler and attach it.
+        # Create the queued log file and attach it.
         if logfile is not None:
             try:
-                handler = logging.FileHandler(logfile, mode='a')
-                handler.setLevel(level)
-                # Create a custom formatter.
-                formatter = logging.Formatter(
-                    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-                # add formatter to handler
-                handler.setFormatter(formatter)
-                # Handler should log anything from the 'jnpr.ansible_module.' namespace to
-                # catch PyEZ, JSNAPY, etc. logs.
-                logger.addHandler(handler)
-                for name in additional_logger_names:
-                    logging.getLogger(name).addHandler(handler)
+                self._file_log = logging_utils.QueuedFileLog(
+                    logfile, level,
+                    max_bytes=self.params.get('log_max_size'),
+                    backup_count=self.params.get('log_backup_count'))
             except IOError as ex:
                 self.fail_json(msg="Unable to open the log file %s. %s" %
                                    (logfile, str(ex)))
+            # The log file should get anything from the 'jnpr.ansible_module.'
+            # namespace and from additional_logger_names to catch PyEZ,
+            # JSNAPY, etc. logs.
+            self._file_log.attach(logger)
+            for name in additional_logger_names:
+                self._file_log.attach(logging.getLogger(name))
         # Use the CustomAdapter to add host information.
         return CustomAdapter(logger, {'host': self.params.get('host')})
 
@@ -1092,7 +932,11 @@ class JuniperJunosModule(AnsibleModule):
             self.logger.debug("Creating device parameters: %s",
                               log_connect_args)
             timeout = connect_args.pop('timeout')
-            self.dev = jnpr.junos.device.Device(**connect_args)
+            # The facts aren't refreshed when the device is opened. PyEZ
+            # loads each fact on its first access, so a module only sends the
+            # rpcs of the facts it reads.
+            self.dev = jnpr.junos.device.Device(gather_facts=False,
+                                                **connect_args)
             self.logger.debug("Opening device.")
             self.dev.open()
             self.logger.debug("Device opened.")
@@ -1109,7 +953,9 @@ class JuniperJunosModule(AnsibleModule):
     def close(self, raise_exceptions=False):
         """Close the self.dev PyEZ Device instance.
         """
-        if self.dev is not None:
+        # A device which was never opened doesn't need to be.
+        self._dev_pending = False
+        if self._dev is not None:
             try:
                 # Because self.fail_json() calls self.close(), we must set
                 # self.dev = None BEFORE calling dev.close() in order to avoid
@@ -1145,19 +991,10 @@ class JuniperJunosModule(AnsibleModule):
             - RpcError: When there's a RPC problem including an already locked
                         config or an already opened private config.
         """
-
-        ignore_warn = ['uncommitted changes will be discarded on exit']
-        # if ignore_warning is a bool, pass the bool
-        # if ignore_warning is a string add to the list
-        # if ignore_warning is a list, merge them
-        if ignore_warning != None and isinstance(ignore_warning, bool):
-            ignore_warn = ignore_warning
-        elif ignore_warning != None and isinstance(ignore_warning, str):
-            ignore_warn.append(ignore_warning)
-        elif ignore_warning != None and isinstance(ignore_warning, list):
-            ignore_warn = ignore_warn + ignore_warning
+        ignore_warn = self._open_ignore_warning(ignore_warning)
 
         if self.conn_type != "local":
+            self._config_used = True
             self._pyez_conn.open_configuration(mode,ignore_warn)
             return
 
@@ -1202,6 +1039,21 @@ class JuniperJunosModule(AnsibleModule):
             self.config = config
             self.logger.debug("Configuration opened in %s mode.", config.mode)
 
+    @staticmethod
+    def _open_ignore_warning(ignore_warning):
+        """Return the ignore_warning argument of open-configuration."""
+        ignore_warn = ['uncommitted changes will be discarded on exit']
+        # if ignore_warning is a bool, pass the bool
+        # if ignore_warning is a string add to the list
+        # if ignore_warning is a list, merge them
+        if ignore_warning != None and isinstance(ignore_warning, bool):
+            ignore_warn = ignore_warning
+        elif ignore_warning != None and isinstance(ignore_warning, str):
+            ignore_warn.append(ignore_warning)
+        elif ignore_warning != None and isinstance(ignore_warning, list):
+            ignore_warn = ignore_warn + ignore_warning
+        return ignore_warn
+
     def close_configuration(self):
         """Close candidate configuration database.
 
@@ -1210,7 +1062,11 @@ class JuniperJunosModule(AnsibleModule):
             - RpcError: When there's a RPC problem closing the config.
         """
         if self.conn_type != "local":
-            self._pyez_conn.close_configuration()
+            # The configuration of the persistent connection may be a
+            # deferred session of other tasks, which only the modules using
+            # the configuration may close.
+            if self._config_used:
+                self._pyez_conn.close_configuration()
             return
 
         if self.config is not None:
@@ -1289,7 +1145,7 @@ class JuniperJunosModule(AnsibleModule):
                 self.open()
 
         self.logger.debug("Retrieving device configuration. Options: %s  "
-                          "Filter %s", str(options), str(filter))
+                          "Filter %s", options, filter)
         config = None
         try:
             if self.conn_type == "local":
@@ -1338,7 +1194,7 @@ class JuniperJunosModule(AnsibleModule):
                                    'Configuration is: %s' %
                                    (self.etree.tostring(config, pretty_print=True)))
             return_val = (self.etree.tostring(config, pretty_print=True),
-                          self.jxmlease.parse_etree(config))
+                          self.parse_xml(config))
         elif format == 'json':
             return_val = (json.dumps(config), config)
         else:
@@ -1346,6 +1202,66 @@ class JuniperJunosModule(AnsibleModule):
                                (format))
         return return_val
 
+    def stream_configuration(self, name, extension, database='committed',
+                             format='text', options={}, filter=None):
+        """Stream the device configuration to the destination file.
+
+        Like get_configuration(), but the configuration is written, a chunk
+        at a time, by stream_rpc_output() instead of being returned.
+
+        Args:
+            name: The name portion of the destination filename when the
+                  'dest_dir' parameter is specified.
+            extension: The format portion of the destination filename when
+                       the 'dest_dir' parameter is specified.
+            database: The configuration database to return. Choices are
+                      defined in CONFIG_DATABASE_CHOICES.
+            format: The format of the configuration to return. Choices are
+                    defined in CONFIG_FORMAT_CHOICES.
+            options: Additional options, specified as a dictionary of
+                     key/value pairs, used when retrieving the configuration.
+            filter: A string of XML, or '/'-separated configuration
+                    hierarchies, which specifies a filter used to restrict
+                    the portions of the configuration which are retrieved.
+
+        Returns:
+            The location of the saved configuration.
+
+        Failures:
+            - Invalid database.
+            - Invalid format.
+            - Invalid filter.
+            - Format not understood by device.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import reply_stream
+        if database not in CONFIG_DATABASE_CHOICES:
+            self.fail_json(msg='The configuration database %s is not in the '
+                               'list of recognized configuration databases: '
+                               '%s.' %
+                               (database, str(CONFIG_DATABASE_CHOICES)))
+
+        if format not in CONFIG_FORMAT_CHOICES:
+            self.fail_json(msg='The configuration format %s is not in the '
+                               'list of recognized configuration formats: '
+                               '%s.' %
+                               (format, str(CONFIG_FORMAT_CHOICES)))
+
+        options.update({'database': database,
+                        'format': format})
+        self.logger.debug("Streaming device configuration. Options: %s  "
+                          "Filter %s", options, filter)
+        try:
+            rpc = reply_stream.get_configuration_rpc(options, filter)
+        except self.etree.XMLSyntaxError as ex:
+            self.fail_json(msg='Invalid filter: %s' % (str(ex)))
+        (location, error) = self.stream_rpc_output(name, format, rpc,
+                                                   extension=extension)
+        if error is not None:
+            self.fail_json(msg='Unable to retrieve the configuration: %s' %
+                               (error))
+        self.logger.debug("Configuration streamed.")
+        return location
+
     def rollback_configuration(self, id):
         """Rollback the device configuration to the specified id.
 
@@ -1477,6 +1393,32 @@ class JuniperJunosModule(AnsibleModule):
             if self.dev is None or self.config is None:
                 self.fail_json(msg='The device or configuration is not open.')
 
+        (config, load_args) = self._load_arguments(action, lines, src,
+                                                   template, vars, url,
+                                                   ignore_warning, format)
+        if self.conn_type != "local":
+            self._pyez_conn.load_configuration(config, load_args)
+            return
+
+        try:
+            if config is not None:
+                self.config.load(config, **load_args)
+            else:
+                self.logger.debug("Load args %s.", load_args)
+                self.config.load(**load_args)
+            self.logger.debug("Configuration loaded.")
+        except (self.pyez_exception.RpcError,
+                self.pyez_exception.ConnectError) as ex:
+            self.fail_json(msg='Failure loading the configuraton: %s' %
+                               (str(ex)))
+
+    def _load_arguments(self, action, lines, src, template, vars, url,
+                        ignore_warning, format):
+        """Return the content and keyword arguments of Config.load().
+
+        See load_configuration() for the arguments.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import template_render
         load_args = {}
         config = None
         if ignore_warning is not None:
@@ -1501,29 +1443,354 @@ class JuniperJunosModule(AnsibleModule):
             load_args['path'] = abs_path_src
             self.logger.debug("Loading the configuration from: %s.", src)
         if template is not None:
-            load_args['template_path'] = template
-            load_args['template_vars'] = vars
+            # The template is rendered here, rather than by PyEZ, so that the
+            # compiled and rendered template caches are used.
+            config = self.render_template(template, vars)
+            if format is None:
+                try:
+                    load_args['format'] = \
+                        template_render.format_by_extension(template)
+                except ValueError as ex:
+                    self.fail_json(msg='Unable to load the %s template: %s. '
+                                       'Set the format option.' %
+                                       (template, str(ex)))
             self.logger.debug("Loading the configuration from the %s "
                               "template.", template)
         if url is not None:
             load_args['url'] = url
             self.logger.debug("Loading the configuration from %s.", url)
+        return (config, load_args)
+
+    def load_configuration_chunks(self, action, chunk_size, lines=None,
+                                  src=None, template=None, vars=None,
+                                  ignore_warning=None, format=None,
+                                  window=1, retries=0):
+        """Load a large candidate configuration in size-bounded chunks.
+
+        The configuration is split by config_chunks.split_configuration()
+        and each chunk is loaded with its own load-configuration rpc into
+        the same candidate configuration. With the persistent connection,
+        window chunks are pipelined at a time. A chunk which times out is
+        loaded again, along with the chunks which followed it, up to retries
+        times.
+
+        Args:
+            action - 'merge', 'replace' or 'set'.
+            chunk_size - The maximum size of a chunk, in bytes.
+            lines, src, template, vars, ignore_warning, format - As for
+                load_configuration().
+            window - The number of chunks sent before waiting for replies.
+            retries - The number of times a timed out chunk is loaded again.
 
+        Returns:
+            The progress of each chunk, as returned by
+            config_chunks.load_chunks().
+
+        Failures:
+            - The configuration can't be split.
+            - A chunk failed to load.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import config_chunks
+        if self.conn_type == "local":
+            if self.dev is None or self.config is None:
+                self.fail_json(msg='The device or configuration is not open.')
+
+        content = self.load_content(lines=lines, src=src, template=template,
+                                    vars=vars)
+        if action == 'set':
+            format = 'set'
+        try:
+            format = self._content_format(format, src, template, content)
+            chunks = config_chunks.split_configuration(content, format,
+                                                       action, chunk_size)
+        except ValueError as ex:
+            self.fail_json(msg='Unable to load the configuration in chunks: '
+                               '%s' % (str(ex)))
+        self.logger.debug("Loading the configuration in %d chunks of at "
+                          "most %d bytes.", len(chunks), chunk_size)
         if self.conn_type != "local":
-            self._pyez_conn.load_configuration(config, load_args)
-            return
+            return self._pyez_conn.load_configuration_chunks(
+                chunks, format, action, ignore_warning=ignore_warning,
+                window=window, retries=retries)
+
+        attributes = config_chunks.load_attributes(format, action)
+
+        def send(indexes):
+            errors = []
+            for index in indexes:
+                try:
+                    self.dev.rpc.load_config(chunks[index],
+                                             ignore_warning=ignore_warning,
+                                             **attributes)
+                    errors.append(None)
+                except (self.pyez_exception.RpcError,
+                        self.pyez_exception.ConnectError) as ex:
+                    errors.append(ex)
+            return errors
 
         try:
-            if config is not None:
-                self.config.load(config, **load_args)
-            else:
-                self.logger.debug("Load args %s.", str(load_args))
-                self.config.load(**load_args)
-            self.logger.debug("Configuration loaded.")
-        except (self.pyez_exception.RpcError,
-                self.pyez_exception.ConnectError) as ex:
+            progress = config_chunks.load_chunks(
+                chunks, send, retries=retries,
+                retryable=lambda ex: isinstance(
+                    ex, self.pyez_exception.RpcTimeoutError),
+                log=self.logger.debug)
+        except config_chunks.ChunkLoadError as ex:
             self.fail_json(msg='Failure loading the configuraton: %s' %
-                               (str(ex)))
+                               (str(ex)),
+                           load_chunks=ex.progress)
+        self.logger.debug("Configuration loaded.")
+        return progress
+
+    @staticmethod
+    def _content_format(format, src, template, content):
+        """Return the format in which Config.load() loads the content.
+
+        That is the format option, else the format of the src or template
+        extension, else the format guessed from the content, which is None
+        when it is neither set nor text.
+
+        Raises:
+            ValueError: When the extension isn't a known format.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import config_chunks
+        from ansible_collections.juniper.device.plugins.module_utils import template_render
+        if format is not None:
+            return format
+        if src is not None:
+            return template_render.format_by_extension(src)
+        if template is not None:
+            return template_render.format_by_extension(template)
+        return config_chunks.guess_format(content)
+
+    def load_configuration_patch(self, lines=None, src=None, template=None,
+                                 vars=None, ignore_warning=None, format=None,
+                                 cache_dir=None):
+        """Load the minimal patch which has the effect of an override.
+
+        The desired configuration is compared with the committed
+        configuration by config_patch.minimal_patch() and only the patch is
+        loaded, with the replace action. The candidate configuration must be
+        open, and equal to the committed configuration.
+
+        Args:
+            lines, src, template, vars, ignore_warning, format - As for
+                load_configuration(). The configuration must be in text
+                format.
+            cache_dir - A directory where the committed configuration is
+                        cached by commit, or None to retrieve it every time.
+
+        Returns:
+            A dict with the 'bytes' of the desired configuration, the
+            'patch_bytes' of the patch loaded, the counts of
+            config_patch.minimal_patch() and whether the committed
+            configuration was 'cached'.
+
+        Failures:
+            - The configuration isn't in text format or can't be parsed.
+            - An error retrieving the committed configuration or loading
+              the patch.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import config_patch
+        content = self.load_content(lines=lines, src=src, template=template,
+                                    vars=vars)
+        try:
+            format = self._content_format(format, src, template, content)
+        except ValueError as ex:
+            self.fail_json(msg='Unable to load the configuration as a patch: '
+                               '%s' % (str(ex)))
+        if format != 'text':
+            self.fail_json(msg='Unable to load the configuration as a patch: '
+                               'the configuration must be in text format, '
+                               'not %s.' % (format))
+        (committed, cached) = self.committed_configuration(cache_dir)
+        try:
+            (patch, counts) = config_patch.minimal_patch(committed, content)
+        except ValueError as ex:
+            self.fail_json(msg='Unable to compute the configuration patch: '
+                               '%s' % (str(ex)))
+        stats = dict(counts, bytes=len(to_bytes(content)),
+                     patch_bytes=len(to_bytes(patch)), cached=cached)
+        self.logger.debug("Configuration patch of %d bytes for %d bytes of "
+                          "configuration: %s.", stats['patch_bytes'],
+                          stats['bytes'], counts)
+        if patch:
+            self.load_configuration(action='replace', lines=[patch],
+                                    ignore_warning=ignore_warning,
+                                    format='text')
+        return stats
+
+    def committed_configuration(self, cache_dir=None):
+        """Return the committed configuration in text format.
+
+        With cache_dir, the configuration is cached per host and is only
+        retrieved again after another commit.
+
+        Returns:
+            A tuple of the configuration and whether it came from the cache.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import config_patch
+        cache = None
+        commit_id = None
+        if cache_dir is not None:
+            commit_id = self.get_commit_id()
+        if commit_id is not None:
+            cache = config_patch.CommittedConfigCache(cache_dir,
+                                                      self.inventory_hostname)
+            committed = cache.get(commit_id)
+            if committed is not None:
+                self.logger.debug("Using the committed configuration cached "
+                                  "for the commit %s.", commit_id)
+                return (committed, True)
+        (committed, parsed) = self.get_configuration(database='committed',
+                                                     format='text',
+                                                     options={})
+        if cache is not None:
+            try:
+                cache.put(commit_id, committed)
+            except (IOError, OSError) as ex:
+                self.logger.debug("Unable to cache the committed "
+                                  "configuration: %s", ex)
+        return (committed, False)
+
+    def deferred_load_configuration(self, action, mode, lines=None, src=None,
+                                    template=None, vars=None, url=None,
+                                    ignore_warning=None, format=None,
+                                    ephemeral_instance=None, diff=False):
+        """Load into the deferred configuration session of the connection.
+
+        The persistent connection opens the session, in mode, on the first
+        load and keeps it open after the task, so that the loads of several
+        tasks are checked, diffed and committed once by
+        flush_deferred_configuration().
+
+        Args:
+            action, lines, src, template, vars, url, ignore_warning, format -
+                As for load_configuration().
+            mode, ephemeral_instance - As for open_configuration().
+            diff - Whether to return the differences made by this load.
+
+        Returns:
+            A dict with the 'diff' of this load, or None, and the number of
+            pending 'loads' of the session.
+
+        Failures:
+            - The connection doesn't keep sessions across tasks.
+            - An error opening the configuration or loading it. The pending
+              loads of the session are discarded.
+        """
+        if self.conn_type == "local":
+            self.fail_json(msg='A deferred commit requires the '
+                               'juniper.device.pyez connection or the '
+                               'connection hub.')
+        (config, load_args) = self._load_arguments(action, lines, src,
+                                                   template, vars, url,
+                                                   ignore_warning, format)
+        self._config_used = True
+        return self._pyez_conn.deferred_load(
+            config, load_args, mode,
+            ignore_warn=self._open_ignore_warning(ignore_warning),
+            ephemeral_instance=ephemeral_instance, diff=diff)
+
+    def flush_deferred_configuration(self, check=True, diff=True,
+                                     commit=True, commit_empty_changes=False,
+                                     check_commit_wait=None,
+                                     ignore_warning=None, comment=None,
+                                     timeout=30, full=False, sync=False,
+                                     force_sync=False):
+        """Check, diff and commit the deferred configuration session once.
+
+        Returns:
+            A dict with the number of 'loads' flushed, the 'diff' of all of
+            them, whether they 'changed' the configuration and whether they
+            were 'committed'. 'loads' is 0 when no session is pending.
+
+        Failures:
+            - The connection doesn't keep sessions across tasks.
+            - An error checking, diffing or committing. The pending loads
+              are discarded.
+        """
+        if self.conn_type == "local":
+            self.fail_json(msg='A deferred commit requires the '
+                               'juniper.device.pyez connection or the '
+                               'connection hub.')
+        self._config_used = True
+        return self._pyez_conn.deferred_flush(
+            check=check, diff=diff, commit=commit,
+            commit_empty_changes=commit_empty_changes,
+            check_commit_wait=check_commit_wait,
+            ignore_warning=ignore_warning, comment=comment, timeout=timeout,
+            full=full, sync=sync, force_sync=force_sync)
+
+    def discard_deferred_configuration(self):
+        """Roll back the deferred configuration session and close it.
+
+        Returns:
+            The number of loads discarded.
+        """
+        if self.conn_type == "local":
+            self.fail_json(msg='A deferred commit requires the '
+                               'juniper.device.pyez connection or the '
+                               'connection hub.')
+        return self._pyez_conn.discard_deferred()
+
+    def ephemeral_updates(self, updates, instance=None,
+                          window=None, max_batch=None,
+                          wait=False, flush=False, close=False,
+                          ignore_warning=None):
+        """Apply updates to an ephemeral instance in committed batches.
+
+        With a persistent connection, the updates are queued to the
+        connection's engine of the instance, which outlives the task. Without
+        one, an engine on the module's device applies them before returning,
+        as if close were True.
+
+        Args:
+            updates - A list of (content, format, action) updates.
+            instance - The ephemeral instance. None is the default instance.
+            window - The coalescing window, in seconds. Defaults to
+                     ephemeral_engine.DEFAULT_WINDOW.
+            max_batch - The maximum number of updates per commit. Defaults to
+                        ephemeral_engine.DEFAULT_MAX_BATCH.
+            wait - Whether to wait for these updates to be committed.
+            flush - Whether to wait for all the queued updates of the
+                    instance and return the statistics since the last flush.
+            close - Whether to flush, then close the instance.
+            ignore_warning - Which warnings to ignore.
+
+        Returns:
+            A dict with the number of updates 'queued', the 'errors' of the
+            failed batches when waiting, and the 'stats' of the engine when
+            flushing.
+
+        Failures:
+            - The instance can't be opened, or the updates are not applied
+              in time.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import ephemeral_engine
+        if window is None:
+            window = ephemeral_engine.DEFAULT_WINDOW
+        if max_batch is None:
+            max_batch = ephemeral_engine.DEFAULT_MAX_BATCH
+        ignore_warn = self._open_ignore_warning(ignore_warning)
+        if self.conn_type != "local":
+            return self._pyez_conn.ephemeral_submit(
+                [list(update) for update in updates], instance=instance,
+                window=window, max_batch=max_batch, wait=wait, flush=flush,
+                close=close, ignore_warn=ignore_warn)
+
+        session = ephemeral_engine.EphemeralSession(
+            self.dev, instance=instance, ignore_warning=ignore_warn)
+        engine = ephemeral_engine.EphemeralEngine(session, window=window,
+                                                  max_batch=max_batch)
+        engine.submit(updates)
+        try:
+            stats = engine.close(self.dev.timeout)
+        except ephemeral_engine.EphemeralEngineError as ex:
+            self.fail_json(msg=str(ex))
+        self.logger.debug("Applied %d ephemeral updates in %d batches.",
+                          stats['updates'], stats['batches'])
+        return {'queued': len(updates), 'errors': stats['errors'],
+                'stats': stats}
 
     def commit_configuration(self, ignore_warning=None, comment=None,
                              confirmed=None, timeout=30, full=False,
@@ -1576,6 +1843,103 @@ class JuniperJunosModule(AnsibleModule):
             self.fail_json(msg='Failure committing the configuraton: %s' %
                                (str(ex)))
 
+    def get_commit_id(self):
+        """Return an identifier of the last commit of the configuration.
+
+        The identifier is made of the time, user and client of the first
+        entry of the commit history, retrieved with the get-commit-information
+        RPC.
+
+        Returns:
+            The identifier as a string, or None when the device has no commit
+            history or the RPC fails.
+        """
+        rpc = self.etree.Element('get-commit-information')
+        try:
+            if self.conn_type == "local":
+                resp = self.dev.rpc(rpc, normalize=True)
+            else:
+                resp = self.get_rpc(rpc, format='xml')
+        except (self.pyez_exception.RpcError,
+                self.pyez_exception.ConnectError) as ex:
+            self.logger.debug("Unable to retrieve the commit information: "
+                              "%s", ex)
+            return None
+        if not isinstance(resp, self.etree._Element):
+            return None
+        entry = resp.find('commit-history')
+        if entry is None:
+            return None
+        return '|'.join((entry.findtext(tag) or '').strip()
+                        for tag in ('date-time', 'user', 'client'))
+
+    def load_content(self, lines=None, src=None, template=None, vars=None):
+        """Return the configuration text which load_configuration() loads.
+
+        Args:
+            lines - A list of strings containing the configuration.
+            src - The file path to the configuration to be loaded.
+            template - The Jinja2 template used to render the configuration.
+            vars - The variables used to render the template.
+
+        Returns:
+            The configuration as a string, or None when it is loaded from a
+            URL.
+
+        Failures:
+            - The src file or template can't be read or rendered.
+        """
+        if lines is not None:
+            return '\n'.join(map(lambda line: line.rstrip('\n'), lines))
+        if src is not None:
+            try:
+                with open(os.path.abspath(src), 'rb') as src_file:
+                    return to_text(src_file.read(), encoding='utf-8')
+            except (IOError, OSError) as ex:
+                self.fail_json(msg='Unable to read %s: %s' % (src, str(ex)))
+        if template is not None:
+            return self.render_template(template, vars)
+        return None
+
+    def render_template(self, template, vars=None):
+        """Return the output of a Jinja2 template of the configuration.
+
+        The template is rendered like PyEZ renders the template_path argument
+        of Config.load(). When the module has a template_cache_dir option,
+        the compiled template and the rendered output are cached in that
+        directory. The output is also kept for the life of the module, so
+        the template is rendered at most once per run.
+
+        Args:
+            template - The path of the Jinja2 template.
+            vars - The variables used to render the template.
+
+        Returns:
+            The rendered configuration as a string.
+
+        Failures:
+            - Jinja2 isn't installed.
+            - The template can't be loaded or rendered.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import template_render
+        if not template_render.HAS_JINJA2:
+            self.fail_json(msg='The jinja2 library is required to render the '
+                               '%s template.' % (template))
+        key = (template, template_render.vars_key(vars))
+        if key in self._rendered_templates:
+            return self._rendered_templates[key]
+        try:
+            if self._template_renderer is None:
+                self._template_renderer = template_render.TemplateRenderer(
+                    self.params.get('template_cache_dir'))
+            output = self._template_renderer.render(template, vars)
+        except Exception as ex:
+            self.fail_json(msg='Unable to render the %s template: %s' %
+                               (template, str(ex)))
+        self.logger.debug("Rendered the %s template.", template)
+        self._rendered_templates[key] = output
+        return output
+
     def ping(self, params, acceptable_percent_loss=0, results={}):
         """Execute a ping command with the parameters specified in params.
 
@@ -1614,13 +1978,13 @@ class JuniperJunosModule(AnsibleModule):
             - If the ping RPC produces an exception.
             - If there are errors present in the results.
         """
+        from ansible_collections.juniper.device.plugins.module_utils import logging_utils
         # Assume failure until we know success.
         results['failed'] = True
 
         # Execute the ping.
         try:
-            self.logger.debug("Executing ping with parameters: %s",
-                              str(params))
+            self.logger.debug("Executing ping with parameters: %s", params)
             if self.conn_type == "local":
                 resp = self.dev.rpc.ping(normalize=True, **params)
             else:
@@ -1634,7 +1998,9 @@ class JuniperJunosModule(AnsibleModule):
         if not isinstance(resp, self.etree._Element):
             self.fail_json(msg='Unexpected ping response: %s' % (str(resp)))
 
-        resp_xml = self.etree.tostring(resp, pretty_print=True)
+        # Only rendered by the messages of the failure paths.
+        resp_xml = logging_utils.LazyFormat(self.etree.tostring, resp,
+                                            pretty_print=True)
 
         # Fail if any errors in the results
         errors = resp.findall(
@@ -1731,7 +2097,8 @@ class JuniperJunosModule(AnsibleModule):
         specified and the self.destfile attribute is not present, the file is
         overwritten. If the 'dest' parameter is specified and the
         self.destfile attribute is present, then the file is appended. This
-        allows multiple text outputs to be written to the same file.
+        allows multiple text outputs to be written to the same file. The
+        file is written by write_output().
 
         Args:
             name: The name portion of the destination filename when the
@@ -1740,9 +2107,23 @@ class JuniperJunosModule(AnsibleModule):
                   'dest_dir' parameter is specified.
             text: The text to be written into the destination file.
 
+        Returns:
+            The location of the saved output, or None when it isn't saved.
+
         Fails:
             - If the destination file is not writable.
         """
+        (file_path, append) = self._output_path(name, format)
+        if file_path is not None:
+            return self.write_output(file_path, text, append=append)
+        return None
+
+    def _output_path(self, name, format):
+        """Return the (file_path, append) tuple of an output.
+
+        file_path is None when the output isn't saved. See
+        save_text_output().
+        """
         file_path = None
         mode = 'wb'
         if name == 'diff':
@@ -1768,30 +2149,242 @@ class JuniperJunosModule(AnsibleModule):
                 name = '' if name == 'config' else '_' + name
                 file_name = '%s%s.%s' % (self.inventory_hostname, name, format)
                 file_path = os.path.normpath(os.path.join(dest_dir, file_name))
-        if file_path is not None:
-            try:
-                # Use ansible utility to convert objects to bytes
-                # to achieve Python2/3 compatibility
-                with open(file_path, mode) as save_file:
-                    save_file.write(to_bytes(text, encoding='utf-8'))
-                self.logger.debug("Output saved to: %s.", file_path)
-            except IOError:
-                self.fail_json(msg="Unable to save output. Failed to "
-                                   "open the %s file." % (file_path))
+        return (file_path, mode == 'ab')
+
+    def stream_rpc_output(self, name, format, rpc, normalize=False,
+                          extension=None):
+        """Execute rpc and stream its reply to the destination file.
+
+        The reply isn't parsed into an element tree. It is written, as
+        save_text_output() would have written it, a chunk at a time while
+        it is parsed. See reply_stream.
+
+        Args:
+            name: The name portion of the destination filename when the
+                  'dest_dir' parameter is specified.
+            format: The format of the rpc reply.
+            rpc: The rpc, as an etree Element.
+            normalize: Normalize the white space of an xml reply.
+            extension: The format portion of the destination filename when
+                       the 'dest_dir' parameter is specified. Defaults to
+                       format.
+
+        Returns:
+            A (location, error) tuple. location is the location of the saved
+            output, error is the message of a failed rpc, or None.
+
+        Fails:
+            - If the destination file is not writable.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import reply_stream
+        from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+        (file_path, append) = self._output_path(name, extension or format)
+        try:
+            if self.conn_type == "local":
+                raw = reply_stream.fetch_raw_reply(self.dev, rpc)
+                chunks = reply_stream.iter_text(raw)
+            else:
+                response = self._pyez_conn.get_rpc_reply_file(
+                    rpc_codec.encode_rpc(rpc))
+                self.logger.debug("Streaming the %d byte reply from %s.",
+                                  response['size'],
+                                  response[rpc_codec.REPLY_FILE_KEY])
+                chunks = rpc_codec.iter_reply_file(response)
+            output = reply_stream.stream_reply(
+                chunks, format, normalize=normalize,
+                huge_tree=self.params.get('huge_tree'))
+            return (self.write_output_chunks(file_path, output,
+                                             append=append), None)
+        except (self.pyez_exception.ConnectError,
+                self.pyez_exception.RpcError,
+                reply_stream.ReplyStreamError,
+                ValueError) as ex:
+            return (None, str(ex))
+
+    def output_keys(self, text, parsed, location, text_key='stdout',
+                    lines_key='stdout_lines', parsed_key='parsed_output'):
+        """Return the result keys of an output selected by output_mode.
+
+        Args:
+            text: The output as a string, or None.
+            parsed: The parsed output, or None.
+            location: The location returned by save_text_output(), or None.
+            text_key: The result key of the output as a string. The digest
+                      and location keys are named after it.
+            lines_key: The result key of the output as a list of lines.
+            parsed_key: The result key of the parsed output.
+
+        Returns:
+            A dict of result keys.
+        """
+        mode = self.params.get('output_mode') or 'full'
+        keys = {}
+        # A streamed output is only saved to its file.
+        if mode == 'file_only' or self.params.get('stream_output'):
+            keys[text_key + '_file'] = location
+        elif mode == 'digest_only':
+            if text is not None:
+                data = to_bytes(text, encoding='utf-8')
+                keys[text_key + '_size'] = len(data)
+                keys[text_key + '_sha256'] = hashlib.sha256(data).hexdigest()
+        elif mode == 'parsed_only' and parsed is None:
+            if text is not None:
+                keys[text_key] = text
+        else:
+            if text is not None and mode == 'full':
+                keys[text_key] = text
+            if text is not None and mode in ('full', 'lines_only'):
+                keys[lines_key] = text.splitlines()
+            if parsed is not None and mode in ('full', 'parsed_only'):
+                keys[parsed_key] = parsed
+        return keys
+
+    def write_output(self, file_path, text, append=False):
+        """Write text to file_path through the output sink.
+
+        The sink is selected by the output_sink, output_atomic and
+        output_archive options. Without them, text is written to file_path.
+
+        Args:
+            file_path: The path of the destination file.
+            text: The text to be written into the destination file.
+            append: Append text to the output already written to file_path.
+
+        Returns:
+            The location of the saved output.
+
+        Fails:
+            - If the destination file is not writable.
+        """
+        return self.write_output_chunks(file_path, [text], append=append)
+
+    def write_output_chunks(self, file_path, chunks, append=False):
+        """Write the iterable of text chunks to file_path as they are produced.
+
+        See write_output(). An exception raised by chunks is not handled.
+
+        Returns:
+            The location of the saved output.
+
+        Fails:
+            - If the destination file is not writable.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import output_sink
+        try:
+            if self._output_sink is None:
+                self._output_sink = output_sink.open_sink(
+                    self.params.get('output_sink') or 'file',
+                    atomic=self.params.get('output_atomic'),
+                    archive=self.params.get('output_archive'))
+            location = self._output_sink.write_chunks(file_path, chunks,
+                                                      append=append)
+        except output_sink.OutputSinkError as ex:
+            self.fail_json(msg="Unable to save output. %s" % (str(ex)))
+        except (IOError, OSError):
+            self.fail_json(msg="Unable to save output. Failed to "
+                               "open the %s file." % (file_path))
+        self.logger.debug("Output saved to: %s.", location)
+        return location
+
+    def close_output_sink(self):
+        """Write the outputs staged by the output sink.
+        """
+        if self._output_sink is not None:
+            sink = self._output_sink
+            self._output_sink = None
+            sink.close()
+
+    def parse_xml(self, element):
+        """Return the parsed data of the lxml element.
+
+        The engine is selected by the xml_parser option. Both engines return
+        the same data once serialized to JSON.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import xml_dict
+        if self.params.get('xml_parser') == 'jxmlease':
+            return self.jxmlease.parse_etree(element)
+        return xml_dict.etree_to_dict(element)
 
     def get_config(self, filter_xml=None, options=None, model=None,
                          namespace=None, remove_ns=True, **kwarg):
         response = self._pyez_conn.get_config(filter_xml, options, model, namespace, remove_ns, **kwarg)
-        return self.etree.fromstring(response)
+        return self._decode_reply(response, (options or {}).get('format'))
 
     def get_rpc(self, rpc, ignore_warning=None, format=None):
-        rpc_1 = self.etree.tostring(rpc)
-        rpc_str = xmltodict.parse(rpc_1)
-        #json.dumps(rpc_str)
-        response = self._pyez_conn.get_rpc_resp(rpc_str, ignore_warning=ignore_warning, format=format)
-        if format == 'json':
-            return response
-        return self.etree.fromstring(response)
+        from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+        response = self._pyez_conn.get_rpc_resp(rpc_codec.encode_rpc(rpc),
+                                                ignore_warning=ignore_warning,
+                                                format=format)
+        return self._decode_reply(response, format)
+
+    def _decode_reply(self, response, format):
+        """Decode a reply received from the persistent connection.
+
+        Fails:
+            - If the reply was written to a file which doesn't match its
+              size and digest.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+        if rpc_codec.is_reply_file(response):
+            self.logger.debug("Reading the %d byte reply from %s.",
+                              response['size'],
+                              response[rpc_codec.REPLY_FILE_KEY])
+        try:
+            return rpc_codec.decode_reply(response, format,
+                                          huge_tree=self.params.get('huge_tree'))
+        except (IOError, ValueError) as ex:
+            self.fail_json(msg='Unable to read the reply: %s' % (str(ex)))
+
+    def get_rpc_batch(self, rpcs, ignore_warning=None):
+        """Execute a list of RPCs in a single exchange with the connection.
+
+        Args:
+            rpcs: A list of (rpc, format) tuples, where rpc is an etree
+                  Element.
+            ignore_warning: Which warnings to ignore for every RPC.
+
+        Returns:
+            A list of (response, error) tuples in the same order as rpcs. On
+            success, error is None. On failure, response is None and error
+            is the error message.
+        """
+        from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+        batch = [{'rpc': rpc_codec.encode_rpc(rpc),
+                  'format': format,
+                  'ignore_warning': ignore_warning} for (rpc, format) in rpcs]
+        self.logger.debug("Executing %d RPCs in one batch.", len(batch))
+        results = []
+        for (item, (rpc, format)) in zip(self._pyez_conn.get_rpc_batch(batch),
+                                         rpcs):
+            # Count the responses answered from the connection's rpc cache.
+            if item.get('cache') == 'hit':
+                self.rpc_cache_stats['hits'] += 1
+            elif item.get('cache') == 'miss':
+                self.rpc_cache_stats['misses'] += 1
+            if item.get('failed') is True:
+                results.append((None, item.get('msg')))
+            else:
+                results.append((self._decode_reply(item.get('response'),
+                                                   format),
+                                None))
+        return results
+
+    def get_table(self, table_view, table, kwargs=None,
+                  response_type='list_of_dicts'):
+        """Retrieve a PyEZ table/view through the persistent connection.
+
+        Args:
+            table_view: The table/view definitions parsed from the YAML file.
+            table: The name of the table to retrieve.
+            kwargs: The arguments passed to the get() method of the table.
+            response_type: One of the choices in tables.RESPONSE_CHOICES.
+
+        Returns:
+            A dict with the number of items retrieved in length and the
+            converted items in resource.
+        """
+        return self._pyez_conn.get_table(table_view, table, kwargs,
+                                         response_type)
 
     def get_facts(self):
         facts = self._pyez_conn.get_facts()
@@ -1849,9 +2442,9 @@ class JuniperJunosModule(AnsibleModule):
         return checksum
 
     def scp_file_copy_put(self, local_file, remote_file):
-        self.logger.info("Computing local MD5 checksum on: {0}".format(local_file))
+        self.logger.info("Computing local MD5 checksum on: %s", local_file)
         local_checksum = self.local_md5(local_file, "put")
-        self.logger.info("Local checksum: {0}".format(local_checksum))
+        self.logger.info("Local checksum: %s", local_checksum)
         remote_checksum = self.remote_md5(remote_file, "put")
         if remote_checksum == "no_file" or remote_checksum != local_checksum:
             status = "File not present, need to transfer"
@@ -1861,9 +2454,9 @@ class JuniperJunosModule(AnsibleModule):
                     scp1.put(local_file, remote_file)
             else:
                 self._pyez_conn.scp_file_copy_put(local_file, remote_file)
-            self.logger.info("computing remote MD5 checksum on: {0}".format(remote_file))
+            self.logger.info("computing remote MD5 checksum on: %s", remote_file)
             remote_checksum = self.remote_md5(remote_file, "put")
-            self.logger.info("Remote checksum: {0}".format(remote_checksum))
+            self.logger.info("Remote checksum: %s", remote_checksum)
             if remote_checksum != local_checksum:
                 status = "Transfer failed (different MD5 between local and remote) {0} | {1}".format(
                     local_checksum,
@@ -1883,9 +2476,9 @@ class JuniperJunosModule(AnsibleModule):
             return [status, False]
 
     def scp_file_copy_get(self, remote_file, local_file):
-        self.logger.info("Computing remote MD5 checksum on: {0}".format(remote_file))
+        self.logger.info("Computing remote MD5 checksum on: %s", remote_file)
         remote_checksum = self.remote_md5(remote_file, "get")
-        self.logger.info("Remote checksum: {0}".format(remote_checksum))
+        self.logger.info("Remote checksum: %s", remote_checksum)
         local_checksum = self.local_md5(local_file, "get")
         if (local_checksum == "no_file" or local_checksum != remote_checksum):
             status = "File not present, need to transfer"
@@ -1895,9 +2488,9 @@ class JuniperJunosModule(AnsibleModule):
                     scp1.get(remote_file, local_file)
             else:
                 self._pyez_conn.scp_file_copy_get(remote_file, local_file)
-            self.logger.info("computing local MD5 checksum on: {0}".format(local_file))
+            self.logger.info("computing local MD5 checksum on: %s", local_file)
             local_checksum = self.local_md5(local_file, "get")
-            self.logger.info("Local checksum: {0}".format(local_checksum))
+            self.logger.info("Local checksum: %s", local_checksum)
             if remote_checksum != local_checksum:
                 status = "Transfer failed (different MD5 between local and remote) {0} | {1}".format(
                     local_checksum,
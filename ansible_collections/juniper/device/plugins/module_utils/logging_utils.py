@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Logging helpers of the modules.
+
+LazyFormat defers an expensive rendering, such as pretty-printing an RPC,
+to the formatting of a log record, which only happens when the record is
+emitted.
+
+The loggers of the module, PyEZ and ncclient only put their records on a
+queue. A QueueListener thread writes the records to the log file and
+flushes the file each time the queue is drained, so a burst of debug
+records costs one write instead of one write per record. QueuedFileLog.stop()
+writes the pending records and closes the file.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+class LazyFormat(object):
+    """A logging argument which calls func(*args, **kwargs) when formatted.
+
+    str() of a LazyFormat is str() of the func result, so replacing an
+    argument by LazyFormat(func, ...) keeps the logged message the same.
+    The call is skipped when the record isn't emitted.
+    """
+
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+
+# The format of the records in the log file.
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class BufferedFileHandler(RotatingFileHandler):
+    """A RotatingFileHandler whose writes are flushed by flush_buffer().
+
+    The file is rotated at max_bytes. A max_bytes of 0 never rotates it.
+    Closing or rotating the file also flushes it.
+    """
+
+    def flush(self):
+        pass
+
+    def flush_buffer(self):
+        super(BufferedFileHandler, self).flush()
+
+
+class _BatchingQueueListener(QueueListener):
+    """A QueueListener which flushes its handlers once the queue is empty."""
+
+    def handle(self, record):
+        super(_BatchingQueueListener, self).handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush_buffer()
+
+
+class QueuedFileLog(object):
+    """Log the records of several loggers to a file from a background thread.
+
+    Args:
+        logfile: The path of the log file. The file is appended.
+        level: The minimum level of the records written to the file.
+        max_bytes: The size at which the file is rotated. 0 never rotates.
+        backup_count: The number of rotated files which are kept.
+
+    Raises:
+        IOError: When the log file can't be opened.
+    """
+
+    def __init__(self, logfile, level, max_bytes=0, backup_count=5):
+        self.handler = BufferedFileHandler(logfile, mode='a',
+                                           maxBytes=max_bytes or 0,
+                                           backupCount=backup_count or 0)
+        self.handler.setLevel(level)
+        self.handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        self._queue = queue.Queue()
+        self._queue_handler = QueueHandler(self._queue)
+        self._loggers = []
+        self._listener = _BatchingQueueListener(self._queue, self.handler,
+                                                respect_handler_level=True)
+        self._listener.start()
+        # Don't lose the pending records if the module exits another way.
+        atexit.register(self.stop)
+
+    def attach(self, logger):
+        """Send the records of logger to the log file."""
+        logger.addHandler(self._queue_handler)
+        self._loggers.append(logger)
+
+    def stop(self):
+        """Write the pending records, then close the log file.
+
+        Calling stop() again does nothing.
+        """
+        if self._listener is None:
+            return
+        for logger in self._loggers:
+            logger.removeHandler(self._queue_handler)
+        self._loggers = []
+        self._listener.stop()
+        self._listener = None
+        self.handler.close()
+        atexit.unregister(self.stop)
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Destinations of the outputs saved by the modules.
+
+save_text_output() and the facts module write each output through the
+sink selected by the output_sink option:
+
+file, gzip, zstd
+    One file per output, as before, optionally compressed (with a .gz or
+    .zst suffix). With output_atomic, the outputs are written to a
+    temporary file in the same directory which is renamed over the
+    destination when the module exits, so readers never see a partial file.
+sqlite, tar
+    One archive, the output_archive option, shared by all the hosts of a
+    run. Each output is a row (sqlite) or a member (tar) named after the
+    file name it would have had. The outputs of a module are written in one
+    transaction (sqlite) or under an exclusive lock of the archive (tar)
+    when the module exits.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import fcntl
+import gzip
+import io
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+from collections import OrderedDict
+
+from ansible.module_utils._text import to_bytes, to_text
+
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+# Seconds to wait for the lock of a shared archive
+ARCHIVE_LOCK_TIMEOUT = 300
+
+
+class OutputSinkError(Exception):
+    """An output sink which can't be created or written."""
+
+
+def open_sink(kind, atomic=False, archive=None):
+    """Return the output sink for the output_sink option value kind.
+
+    Raises:
+        OutputSinkError: When the sink isn't usable.
+    """
+    if kind in ('sqlite', 'tar'):
+        if archive is None:
+            raise OutputSinkError("The output_archive option is required "
+                                  "when output_sink is %s." % kind)
+        if kind == 'sqlite':
+            return SqliteSink(archive)
+        return TarSink(archive)
+    if kind == 'gzip':
+        return GzipSink(atomic)
+    if kind == 'zstd':
+        if not HAS_ZSTANDARD:
+            raise OutputSinkError("The zstandard library is required when "
+                                  "output_sink is zstd.")
+        return ZstdSink(atomic)
+    return FileSink(atomic)
+
+
+class FileSink(object):
+    """Write each output to its own file.
+
+    With atomic, the writes to a path go to a temporary file which close()
+    renames to the path.
+    """
+
+    suffix = ''
+
+    def __init__(self, atomic=False):
+        self.atomic = atomic
+        # path -> (stream, raw file, temporary path) of the atomic writes
+        self._staged = OrderedDict()
+
+    def _wrap(self, raw):
+        """Return the stream writing to the binary file raw."""
+        return raw
+
+    def write(self, path, data, append=False):
+        """Write data to path, or append it to the output already there.
+
+        Returns:
+            The path of the written file.
+        """
+        return self.write_chunks(path, [data], append=append)
+
+    def write_chunks(self, path, chunks, append=False):
+        """Write the iterable of chunks to path as they are produced.
+
+        If chunks raises an exception, the output is removed, unless it was
+        appended to a previous output.
+
+        Returns:
+            The path of the written file.
+        """
+        path = path + self.suffix
+        if not self.atomic:
+            try:
+                with open(path, 'ab' if append else 'wb') as raw:
+                    stream = self._wrap(raw)
+                    try:
+                        for chunk in chunks:
+                            stream.write(to_bytes(chunk, encoding='utf-8'))
+                    finally:
+                        if stream is not raw:
+                            stream.close()
+            except Exception:
+                if not append and os.path.exists(path):
+                    os.remove(path)
+                raise
+            return path
+        if path in self._staged and not append:
+            self._discard(path)
+        if path not in self._staged:
+            (fd, tmp_path) = tempfile.mkstemp(
+                prefix='.%s.' % os.path.basename(path),
+                dir=os.path.dirname(path) or '.')
+            raw = os.fdopen(fd, 'wb')
+            self._staged[path] = (self._wrap(raw), raw, tmp_path)
+        stream = self._staged[path][0]
+        try:
+            for chunk in chunks:
+                stream.write(to_bytes(chunk, encoding='utf-8'))
+        except Exception:
+            if not append:
+                self._discard(path)
+            raise
+        return path
+
+    def _discard(self, path):
+        (stream, raw, tmp_path) = self._staged.pop(path)
+        if stream is not raw:
+            stream.close()
+        raw.close()
+        os.remove(tmp_path)
+
+    def close(self):
+        """Rename the temporary files of the atomic writes to their paths."""
+        umask = os.umask(0)
+        os.umask(umask)
+        while self._staged:
+            (path, (stream, raw, tmp_path)) = self._staged.popitem(last=False)
+            if stream is not raw:
+                stream.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+            raw.close()
+            # mkstemp() creates the file readable by its owner only.
+            os.chmod(tmp_path, 0o666 & ~umask)
+            os.rename(tmp_path, path)
+
+
+class GzipSink(FileSink):
+    """Write each output to its own gzip file.
+
+    Appending adds a gzip member, which gzip readers concatenate.
+    """
+
+    suffix = '.gz'
+
+    def _wrap(self, raw):
+        return gzip.GzipFile(filename='', mode='wb', fileobj=raw)
+
+
+class ZstdSink(FileSink):
+    """Write each output to its own zstd file.
+
+    Appending adds a zstd frame, which zstd readers concatenate.
+    """
+
+    suffix = '.zst'
+
+    def _wrap(self, raw):
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+
+
+class _ArchiveSink(object):
+    """Collect the outputs of a module, written to archive by close()."""
+
+    def __init__(self, archive):
+        self.archive = archive
+        # member name -> list of bytes
+        self._members = OrderedDict()
+
+    def write(self, path, data, append=False):
+        """Add data to the member named after the file name of path.
+
+        Returns:
+            The archive path and the member name, separated by a colon.
+        """
+        return self.write_chunks(path, [data], append=append)
+
+    def write_chunks(self, path, chunks, append=False):
+        """Add the iterable of chunks to the member named after path.
+
+        The member is written by close(), so the chunks are kept in memory
+        until then.
+
+        Returns:
+            The archive path and the member name, separated by a colon.
+        """
+        name = os.path.basename(path)
+        data = [to_bytes(chunk, encoding='utf-8') for chunk in chunks]
+        if append and name in self._members:
+            self._members[name].extend(data)
+        else:
+            self._members[name] = data
+        return '%s:%s' % (self.archive, name)
+
+    def close(self):
+        if self._members:
+            self._write_members(self._members)
+            self._members = OrderedDict()
+
+
+class SqliteSink(_ArchiveSink):
+    """Write the outputs as the rows of a SQLite database.
+
+    The outputs table has the name, the time and the content of each
+    output. A new output replaces the row of the same name.
+    """
+
+    def _write_members(self, members):
+        try:
+            connection = sqlite3.connect(self.archive,
+                                         timeout=ARCHIVE_LOCK_TIMEOUT,
+                                         isolation_level=None)
+            try:
+                connection.execute('CREATE TABLE IF NOT EXISTS outputs ('
+                                   'name TEXT PRIMARY KEY, '
+                                   'saved REAL NOT NULL, '
+                                   'content TEXT NOT NULL)')
+                connection.execute('BEGIN IMMEDIATE')
+                now = time.time()
+                connection.executemany(
+                    'INSERT OR REPLACE INTO outputs (name, saved, content) '
+                    'VALUES (?, ?, ?)',
+                    [(name, now, to_text(b''.join(chunks), encoding='utf-8'))
+                     for (name, chunks) in members.items()])
+                connection.execute('COMMIT')
+            finally:
+                connection.close()
+        except sqlite3.Error as ex:
+            raise OutputSinkError("Unable to write %s: %s" %
+                                  (self.archive, str(ex)))
+
+
+class TarSink(_ArchiveSink):
+    """Append the outputs as the members of a tar archive.
+
+    A new output with the name of an existing member is appended after it,
+    and extracting the archive keeps the last one.
+    """
+
+    def _write_members(self, members):
+        with open(self.archive, 'ab') as lock:
+            _lock_file(lock)
+            try:
+                # A new archive has no end-of-archive blocks to append to.
+                mode = 'a' if os.fstat(lock.fileno()).st_size else 'w'
+                with tarfile.open(self.archive, mode) as archive:
+                    now = time.time()
+                    for (name, chunks) in members.items():
+                        data = b''.join(chunks)
+                        info = tarfile.TarInfo(name)
+                        info.size = len(data)
+                        info.mtime = now
+                        info.mode = 0o644
+                        archive.addfile(info, io.BytesIO(data))
+            except tarfile.TarError as ex:
+                raise OutputSinkError("Unable to write %s: %s" %
+                                      (self.archive, str(ex)))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _lock_file(lock):
+    """Take the exclusive lock of the open file lock.
+
+    Raises:
+        OutputSinkError: When the lock isn't taken within
+                         ARCHIVE_LOCK_TIMEOUT seconds.
+    """
+    deadline = time.time() + ARCHIVE_LOCK_TIMEOUT
+    while True:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except (IOError, OSError):
+            if time.time() > deadline:
+                raise OutputSinkError("Timed out waiting for the lock of %s."
+                                      % lock.name)
+            time.sleep(0.05)
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Streaming of RPC replies to the destination file of the output.
+
+With the stream_output option, the <rpc-reply> is never parsed into an
+element tree. fetch_raw_reply() returns the reply as ncclient received it,
+and stream_reply() feeds it to an lxml target parser which produces the
+output, as save_text_output() would have written it, a chunk at a time:
+
+text
+    The text of the <output> (or <configuration-text>, ...) element,
+    written as the parser reports it.
+json
+    The JSON text of the <rpc-reply>, written as the parser reports it.
+xml
+    The reply element with its namespaces removed, like PyEZ returns it,
+    serialized as it is parsed. Only the open elements are held in memory.
+
+ncclient itself still reads a complete reply before delivering it, so the
+memory used is the size of the reply, instead of several times that size
+for the element tree and its serialized copies.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import re
+from xml.sax.saxutils import escape
+
+try:
+    from lxml import etree
+    HAS_LXML_ETREE = True
+except ImportError:
+    HAS_LXML_ETREE = False
+
+try:
+    from jnpr.junos import exception as pyez_exception
+    from ncclient.operations import TimeoutExpiredError
+    from ncclient.transport.errors import TransportError
+    HAS_PYEZ = True
+except ImportError:
+    HAS_PYEZ = False
+
+
+# The size, in characters, of the chunks fed to the parser
+STREAM_CHUNK_SIZE = 65536
+
+# The elements of a text reply which hold the text output
+_TEXT_OUTPUT_TAGS = ('output', 'configuration-text', 'configuration-set',
+                     'configuration-output')
+
+
+# The characters of an attribute value escaped like lxml does
+_ATTRIBUTE_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;',
+                       '\t': '&#9;'}
+
+
+class ReplyStreamError(Exception):
+    """A reply which holds an rpc-error, or which can't be parsed."""
+
+
+def fetch_raw_reply(dev, rpc):
+    """Execute the rpc etree Element on dev and return the unparsed reply.
+
+    The rpc is sent in ncclient's asynchronous mode, which delivers the
+    <rpc-reply> as text and leaves its parsing to the caller.
+
+    Raises:
+        - RpcTimeoutError when no reply is received within the device
+          timeout, ConnectClosedError when the session is lost.
+    """
+    if dev.connected is not True:
+        raise pyez_exception.ConnectClosedError(dev)
+    manager = dev._conn
+    async_mode = manager.async_mode
+    manager.async_mode = True
+    try:
+        rpc_obj = manager.rpc(rpc)
+    except TransportError:
+        raise pyez_exception.ConnectClosedError(dev)
+    finally:
+        manager.async_mode = async_mode
+    rpc_obj.event.wait(dev.timeout)
+    if not rpc_obj.event.is_set():
+        raise pyez_exception.RpcTimeoutError(dev, rpc.tag, dev.timeout)
+    if rpc_obj.error:
+        if isinstance(rpc_obj.error, (TransportError, TimeoutExpiredError)):
+            raise pyez_exception.ConnectClosedError(dev)
+        raise rpc_obj.error
+    return rpc_obj.reply._raw
+
+
+def get_configuration_rpc(options=None, filter_xml=None):
+    """Return the <get-configuration> rpc sent by dev.rpc.get_config().
+
+    Args:
+        options: A dict of the attributes of the rpc.
+        filter_xml: A string of XML, or '/'-separated configuration
+                    hierarchies, or an etree Element, which restricts the
+                    portions of the configuration which are retrieved.
+    """
+    rpc = etree.Element('get-configuration', options or {})
+    if filter_xml is not None:
+        if not isinstance(filter_xml, etree._Element):
+            if re.search(r'^<.*>$', filter_xml):
+                filter_xml = etree.XML(filter_xml)
+            else:
+                filter_data = None
+                for tag in filter_xml.split('/')[::-1]:
+                    element = etree.Element(tag)
+                    if filter_data is not None:
+                        element.append(filter_data)
+                    filter_data = element
+                filter_xml = filter_data
+        if filter_xml.tag != 'configuration':
+            etree.SubElement(rpc, 'configuration').append(filter_xml)
+        else:
+            rpc.append(filter_xml)
+    return rpc
+
+
+def iter_text(text, size=STREAM_CHUNK_SIZE):
+    """Yield text in chunks of size characters."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def _local_name(tag):
+    return tag[tag.find('}') + 1:]
+
+
+def _normalize_space(text):
+    if text is None:
+        return None
+    return ' '.join(text.split()) or None
+
+
+class _ReplyTarget(object):
+    """The lxml parser target producing the output of an <rpc-reply>.
+
+    The produced chunks are collected in self.chunks. Depth 1 is the
+    <rpc-reply> element and depth 2 the element returned by PyEZ, the
+    payload.
+
+    An xml payload is serialized as its elements are parsed. Only the open
+    elements are held, and the start tag of the innermost one until it's
+    known whether it is empty, holds text or holds elements. With
+    normalize, the output is indented like etree.tostring(pretty_print=True)
+    does, except that an element holding text after its first element is
+    indented.
+    """
+
+    def __init__(self, format, normalize):
+        self.format = format
+        self.normalize = normalize
+        self.chunks = []
+        self.errors = []
+        self.warnings = []
+        self._depth = 0
+        # The tag of the depth 2 element which is written, once known.
+        self._payload = None
+        self._payload_done = False
+        # The text of an element holding text output is written.
+        self._text_depth = None
+        # The TreeBuilder of an <rpc-error>.
+        self._builder = None
+        self._reply_text = []
+        # The open elements of an xml payload, as (tag, indented) tuples,
+        # where indented tells if the content of the element is indented.
+        self._open = []
+        # The [tag, start tag, text chunks] of the innermost element, while
+        # its start tag isn't written.
+        self._pending = None
+
+    def start(self, tag, attrib):
+        self._depth += 1
+        tag = _local_name(tag)
+        if self._builder is not None:
+            self._builder.start(tag, self._attrib(attrib))
+        elif self._depth == 2:
+            if tag == 'rpc-error':
+                self._builder = etree.TreeBuilder()
+                self._builder.start(tag, self._attrib(attrib))
+            elif tag != 'ok' and self._payload is None:
+                self._payload = tag
+                if self.format == 'xml':
+                    self._start_element(tag, attrib)
+                elif tag in _TEXT_OUTPUT_TAGS:
+                    self._text_depth = 2
+        elif self._depth > 2 and self._writing():
+            if self.format == 'xml':
+                self._start_element(tag, attrib)
+            elif (self._depth == 3 and tag in _TEXT_OUTPUT_TAGS and
+                    self._text_depth is None):
+                self._text_depth = 3
+
+    def end(self, tag):
+        depth = self._depth
+        self._depth -= 1
+        if self._builder is not None:
+            self._builder.end(_local_name(tag))
+            if depth == 2:
+                self._rpc_error(self._builder.close())
+                self._builder = None
+            return
+        if depth == self._text_depth:
+            self._text_depth = None
+        if depth >= 2 and self._writing():
+            if self.format == 'xml':
+                self._end_element()
+            if depth == 2:
+                self._payload_done = True
+
+    def data(self, data):
+        depth = self._depth
+        if self._builder is not None:
+            self._builder.data(data)
+        elif depth == 1:
+            if self.format == 'json':
+                self.chunks.append(data)
+            else:
+                self._reply_text.append(data)
+        elif not self._writing():
+            pass
+        elif self.format == 'xml':
+            if self._pending is not None:
+                self._pending[2].append(data)
+            else:
+                # Text following a child element.
+                if self.normalize:
+                    data = _normalize_space(data)
+                if data:
+                    self.chunks.append(escape(data))
+        elif self._text_depth is not None and depth == self._text_depth:
+            self.chunks.append(data)
+
+    def comment(self, text):
+        if self._builder is not None:
+            self._builder.comment(text)
+        elif self.format == 'xml' and self._depth >= 2 and self._writing():
+            self._open_pending()
+            self.chunks.append(self._indent() + etree.tostring(
+                etree.Comment(text), encoding='unicode') + self._newline())
+
+    def close(self):
+        # Like PyEZ, a reply without a child element is its own output.
+        if self._payload is None and self.format not in ('xml', 'json'):
+            self.chunks.append(''.join(self._reply_text))
+        self._reply_text = []
+
+    def _writing(self):
+        return self._payload is not None and not self._payload_done
+
+    def _attrib(self, attrib):
+        return dict((_local_name(name), value)
+                    for (name, value) in attrib.items())
+
+    def _indent(self):
+        """Return the indentation of a child of the innermost element."""
+        if self.normalize and (not self._open or self._open[-1][1]):
+            return '  ' * len(self._open)
+        return ''
+
+    def _newline(self):
+        """Return the line end following a child of the innermost element."""
+        if not self._open or (self.normalize and self._open[-1][1]):
+            return '\n'
+        return ''
+
+    def _start_element(self, tag, attrib):
+        self._open_pending()
+        start_tag = '<%s%s' % (tag, ''.join(
+            ' %s="%s"' % (name, escape(value, _ATTRIBUTE_ENTITIES))
+            for (name, value) in self._attrib(attrib).items()))
+        self._pending = [tag, start_tag, []]
+
+    def _pending_text(self):
+        text = ''.join(self._pending[2])
+        if self.normalize:
+            text = _normalize_space(text)
+        return text
+
+    def _open_pending(self):
+        """Write the start tag of the innermost element, which holds more."""
+        if self._pending is None:
+            return
+        (tag, start_tag, text) = self._pending
+        text = self._pending_text()
+        indented = self.normalize and not text and (not self._open or
+                                                    self._open[-1][1])
+        self.chunks.append('%s%s>%s%s' % (self._indent(), start_tag,
+                                          escape(text or ''),
+                                          '\n' if indented else ''))
+        self._open.append((tag, indented))
+        self._pending = None
+
+    def _end_element(self):
+        if self._pending is not None:
+            (tag, start_tag, text) = self._pending
+            text = self._pending_text()
+            if text:
+                element = '%s>%s</%s>' % (start_tag, escape(text), tag)
+            else:
+                element = '%s/>' % start_tag
+            self.chunks.append(self._indent() + element + self._newline())
+            self._pending = None
+            return
+        (tag, indented) = self._open.pop()
+        self.chunks.append('%s</%s>%s' % (self._indent() if indented else '',
+                                          tag, self._newline()))
+
+    def _rpc_error(self, element):
+        severity = element.findtext('error-severity')
+        message = (element.findtext('error-message') or '').strip()
+        if severity is not None and severity.strip() == 'warning':
+            self.warnings.append(message)
+        else:
+            self.errors.append(message)
+
+
+def stream_reply(chunks, format, normalize=False, huge_tree=False):
+    """Yield the output of the <rpc-reply> read from chunks.
+
+    Args:
+        chunks: An iterable of the text, or bytes, of the <rpc-reply>.
+        format: The format of the reply, text, xml or json. Any other format
+                (set) is handled like text.
+        normalize: Normalize the white space of an xml reply, like
+                   dev.rpc(normalize=True) does.
+        huge_tree: Parse replies with very deep trees and very long text.
+
+    Yields:
+        The output, as text, a chunk at a time.
+
+    Raises:
+        ReplyStreamError: When the reply holds an rpc-error whose severity
+                          is error, or isn't a well formed XML document.
+                          The chunks already yielded are not withdrawn.
+    """
+    target = _ReplyTarget(format, normalize)
+    parser = etree.XMLParser(target=target, huge_tree=huge_tree)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if target.errors:
+                break
+            if target.chunks:
+                for output in target.chunks:
+                    yield output
+                target.chunks = []
+        if not target.errors:
+            parser.close()
+    except etree.XMLSyntaxError as ex:
+        raise ReplyStreamError('Unable to parse the reply: %s' % (str(ex)))
+    if target.errors:
+        raise ReplyStreamError('; '.join(target.errors))
+    for output in target.chunks:
+        yield output
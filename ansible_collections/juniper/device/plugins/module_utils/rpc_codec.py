@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Wire encoding of RPCs and RPC replies exchanged with the pyez connection.
+
+The persistent connection plugin and the modules talk JSON-RPC over a Unix
+socket. RPCs travel as their canonical XML text and replies travel either as
+XML text (xml and text formats) or as the native object returned by PyEZ
+(json format, or True for an empty <ok/> reply). Each side parses the XML
+exactly once.
+
+Replies larger than a threshold are written by the connection to a private
+temporary file instead, and only the path, size and digest of the file
+travel over the socket. The module memory-maps and parses the file, then
+removes it. A reply streamed to the destination of the output (see
+reply_stream) is always written unparsed to such a file, which the module
+reads a chunk at a time.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import mmap
+import os
+import tempfile
+
+try:
+    from lxml import etree
+    HAS_LXML_ETREE = True
+except ImportError:
+    HAS_LXML_ETREE = False
+
+
+# The key which identifies a reply that was written to a file.
+REPLY_FILE_KEY = '__juniper_device_reply_file__'
+
+
+def _to_bytes(payload):
+    if isinstance(payload, bytes):
+        return payload
+    return payload.encode('utf-8', 'surrogateescape')
+
+
+def encode_rpc(rpc):
+    """Return the wire form of the rpc etree Element."""
+    return etree.tostring(rpc, encoding='unicode')
+
+
+def decode_rpc(payload):
+    """Return the etree Element for an RPC received over the wire.
+
+    Older releases of the modules sent the RPC as an xmltodict structure.
+    That form is still accepted, but is no longer produced.
+    """
+    if isinstance(payload, dict):
+        import xmltodict
+        payload = xmltodict.unparse(payload)
+    parser = etree.XMLParser(ns_clean=True, recover=True, encoding='utf-8')
+    return etree.fromstring(_to_bytes(payload), parser=parser)
+
+
+def encode_reply(resp, format):
+    """Return the wire form of the reply returned by dev.rpc()."""
+    if format == 'json' or resp is True:
+        return resp
+    return etree.tostring(resp, encoding='unicode')
+
+
+def spill_reply(response, threshold):
+    """Write response to a file if it is larger than threshold bytes.
+
+    Args:
+        response: The wire form of a reply, as returned by encode_reply().
+        threshold: The size, in bytes, above which the reply is written to a
+                   file. 0 or None means never.
+
+    Returns:
+        response unchanged, or a dict with the REPLY_FILE_KEY, size and sha256
+        keys describing the file which holds the reply.
+    """
+    if (not threshold or not isinstance(response, str) or
+            len(response) <= threshold):
+        return response
+    data = response.encode('utf-8', 'surrogateescape')
+    if len(data) <= threshold:
+        return response
+    return write_reply_file([data])
+
+
+def write_reply_file(chunks):
+    """Write the reply read from chunks to a private temporary file.
+
+    Args:
+        chunks: An iterable of the text, or bytes, of the reply.
+
+    Returns:
+        A dict with the REPLY_FILE_KEY, size and sha256 keys describing the
+        file which holds the reply.
+    """
+    size = 0
+    digest = hashlib.sha256()
+    # mkstemp() creates the file readable and writable only by its owner.
+    (fd, path) = tempfile.mkstemp(prefix='juniper-device-reply-',
+                                  suffix='.xml')
+    with os.fdopen(fd, 'wb') as reply_file:
+        for chunk in chunks:
+            data = _to_bytes(chunk)
+            reply_file.write(data)
+            digest.update(data)
+            size += len(data)
+    return {REPLY_FILE_KEY: path,
+            'size': size,
+            'sha256': digest.hexdigest()}
+
+
+def is_reply_file(payload):
+    """Return True if payload describes a reply written by spill_reply()."""
+    return isinstance(payload, dict) and REPLY_FILE_KEY in payload
+
+
+def _decode_reply_file(payload, huge_tree):
+    path = payload[REPLY_FILE_KEY]
+    try:
+        with open(path, 'rb') as reply_file:
+            reply_map = mmap.mmap(reply_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            try:
+                if (len(reply_map) != payload['size'] or
+                        hashlib.sha256(reply_map).hexdigest() !=
+                        payload['sha256']):
+                    raise ValueError('The reply file %s does not match its '
+                                     'size and digest.' % (path))
+                parser = etree.XMLParser(huge_tree=huge_tree)
+                return etree.fromstring(reply_map, parser=parser)
+            finally:
+                reply_map.close()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def iter_reply_file(payload, size=65536):
+    """Yield the content of a reply file in chunks of size bytes.
+
+    The file is checked against its size and digest before the first chunk
+    is yielded, and removed once it is read.
+
+    Fails:
+        - ValueError if the reply file doesn't match its size and digest.
+    """
+    path = payload[REPLY_FILE_KEY]
+    try:
+        with open(path, 'rb') as reply_file:
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: reply_file.read(size), b''):
+                digest.update(chunk)
+            if (reply_file.tell() != payload['size'] or
+                    digest.hexdigest() != payload['sha256']):
+                raise ValueError('The reply file %s does not match its '
+                                 'size and digest.' % (path))
+            reply_file.seek(0)
+            for chunk in iter(lambda: reply_file.read(size), b''):
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def decode_reply(payload, format, huge_tree=False):
+    """Return the reply, as returned by dev.rpc(), from its wire form.
+
+    Fails:
+        - ValueError if a reply file doesn't match its size and digest.
+    """
+    if format != 'json' and is_reply_file(payload):
+        return _decode_reply_file(payload, huge_tree)
+    if format == 'json' or payload is True:
+        return payload
+    parser = etree.XMLParser(huge_tree=huge_tree)
+    return etree.fromstring(_to_bytes(payload), parser=parser)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Loading of PyEZ Table/View definitions and conversion of their items
+into plain Python data.
+
+Shared by the table module and the pyez connection plugin, which retrieves
+tables on behalf of the module over a persistent connection.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import copy
+
+try:
+    from jnpr.junos.factory.factory_loader import FactoryLoader
+    from jnpr.junos.factory.table import Table
+    HAS_PYEZ_TABLE = True
+except ImportError:
+    HAS_PYEZ_TABLE = False
+
+# Known response types
+RESPONSE_CHOICES = ['list_of_dicts', 'juniper_items']
+
+
+def load_tables(table_view):
+    """Return the tables and views defined by table_view, by name.
+
+    FactoryLoader().load() removes keys, such as the item of the nested
+    tables, from the definitions it loads, so it loads a copy of them and
+    table_view can be loaded again, or sent to the connection.
+    """
+    return FactoryLoader().load(copy.deepcopy(table_view))
+
+
+def expand_items(data):
+    """Recursively expand any table items
+    """
+    resources = []
+    # data.items() is a list of tuples
+    for table_key, table_fields in data.items():
+        # sample:
+        # ('fxp0', [('neighbor_interface', '1'), ('local_interface', 'fxp0'),
+        # ('neighbor', 'vmx2')]
+        # table_key - element 0 is the key from the Table - not using at all
+        # table_fields - element 1 is also a list of tuples
+        temp = []
+        for key, value in table_fields:
+            # calling it normalized value because YOU/WE created the keys
+            if value and isinstance(value, Table):
+                value = expand_items(value)
+            temp.append((key, value))
+        resources.append((table_key, temp))
+    return resources
+
+
+def juniper_items_to_list_of_dicts(data):
+    """Recursively convert Juniper PyEZ Table/View items to list of dicts.
+    """
+    resources = []
+    # data.items() is a list of tuples
+    for table_key, table_fields in data.items():
+        # sample:
+        # ('fxp0', [('neighbor_interface', '1'), ('local_interface', 'fxp0'),
+        # ('neighbor', 'vmx2')]
+        # table_key - element 0 is the key from the Table - not using at all
+        # table_fields - element 1 is also a list of tuples
+        temp = {}
+        for key, value in table_fields:
+            if isinstance(value, Table):
+                value = juniper_items_to_list_of_dicts(value)
+            temp[key] = value
+        resources.append(temp)
+    return resources
+
+
+def convert_items(data, response_type):
+    """Convert the items of a retrieved table according to response_type.
+    """
+    if response_type == 'list_of_dicts':
+        return juniper_items_to_list_of_dicts(data)
+    return expand_items(data)
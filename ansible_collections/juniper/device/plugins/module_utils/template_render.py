@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Rendering of the configuration templates loaded by the config module.
+
+The templates are rendered like PyEZ renders the template_path argument of
+Config.load(): with a default Jinja2 environment whose loader looks for the
+template in the current directory, then in the templates directory of PyEZ.
+
+With a cache directory (the template_cache_dir option), two caches are
+kept in it:
+
+bytecode/
+    The compiled templates, by Jinja2's FileSystemBytecodeCache. Each
+    template, and each template it includes, imports or extends, is
+    compiled again only when its source changes.
+rendered/
+    The rendered outputs, one file per template and variables. An output
+    records the path, modification time and size of every template used to
+    render it and is only used while none of them has changed. The outputs
+    are written by the render_templates action, which renders the
+    templates of all the hosts in a pool of processes before the config
+    tasks run, and by the config module itself.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+
+try:
+    import jinja2
+    HAS_JINJA2 = True
+except ImportError:
+    HAS_JINJA2 = False
+
+try:
+    import jnpr.junos
+    PYEZ_TEMPLATES_DIR = os.path.join(os.path.dirname(jnpr.junos.__file__),
+                                      'templates')
+except ImportError:
+    PYEZ_TEMPLATES_DIR = None
+
+
+def format_by_extension(path):
+    """Return the configuration format of the template path.
+
+    This is how PyEZ determines the format of a template_path.
+
+    Raises:
+        ValueError: When the extension isn't a known format.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == '.xml':
+        return 'xml'
+    if ext in ['.conf', '.text', '.txt']:
+        return 'text'
+    if ext in ['.set']:
+        return 'set'
+    if ext in ['.json']:
+        return 'json'
+    raise ValueError("Unknown file contents from extension: %s" % ext)
+
+
+def vars_key(template_vars):
+    """Return the canonical JSON text of the template variables."""
+    return json.dumps(template_vars or {}, sort_keys=True, default=str)
+
+
+if HAS_JINJA2:
+    class _TemplateLoader(jinja2.BaseLoader):
+        """Load templates like PyEZ, and remember the files loaded.
+
+        self.sources maps the path of every file loaded to its [mtime,
+        size] when it was last loaded.
+        """
+
+        def __init__(self):
+            self.paths = ['.']
+            if PYEZ_TEMPLATES_DIR is not None:
+                self.paths.append(PYEZ_TEMPLATES_DIR)
+            self.sources = {}
+
+        def resolve(self, template):
+            """Return the path of the file of template, or None."""
+            for directory in self.paths:
+                path = os.path.join(directory, template)
+                if os.path.exists(path):
+                    return path
+            return None
+
+        def get_source(self, environment, template):
+            path = self.resolve(template)
+            if path is None:
+                raise jinja2.TemplateNotFound(template)
+            stat = os.stat(path)
+            with open(path) as template_file:
+                source = template_file.read()
+            self.sources[os.path.abspath(path)] = [stat.st_mtime,
+                                                   stat.st_size]
+            return (source, path,
+                    lambda: stat.st_mtime == os.path.getmtime(path))
+
+
+class TemplateRenderer(object):
+    """Render configuration templates, with optional persistent caches.
+
+    A renderer keeps its environment, and so the templates it compiled, for
+    its lifetime.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._loader = _TemplateLoader()
+        bytecode_cache = None
+        if cache_dir is not None:
+            bytecode_dir = os.path.join(cache_dir, 'bytecode')
+            _makedirs(bytecode_dir)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_dir)
+        self._environment = jinja2.Environment(loader=self._loader,
+                                               bytecode_cache=bytecode_cache)
+
+    def _rendered_path(self, template, template_vars):
+        path = self._loader.resolve(template)
+        if path is None or self.cache_dir is None:
+            return None
+        digest = hashlib.sha256()
+        digest.update(os.path.abspath(path).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(vars_key(template_vars).encode('utf-8'))
+        return os.path.join(self.cache_dir, 'rendered',
+                            digest.hexdigest() + '.json')
+
+    def cached(self, template, template_vars):
+        """Return the cached output of template, or None.
+
+        The output is only returned while none of the templates used to
+        render it has changed.
+        """
+        rendered_path = self._rendered_path(template, template_vars)
+        if rendered_path is None:
+            return None
+        try:
+            with open(rendered_path) as rendered_file:
+                entry = json.load(rendered_file)
+            for (path, (mtime, size)) in entry['sources'].items():
+                stat = os.stat(path)
+                if stat.st_mtime != mtime or stat.st_size != size:
+                    return None
+            return entry['output']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def render(self, template, template_vars=None):
+        """Return the output of template rendered with template_vars.
+
+        The output is read from, and written to, the rendered cache when
+        there is a cache directory.
+
+        Raises:
+            jinja2.TemplateError: When the template can't be loaded or
+                                  rendered.
+        """
+        output = self.cached(template, template_vars)
+        if output is not None:
+            return output
+        # The environment doesn't load again the templates it already holds,
+        # so the sources recorded with an output are all the files loaded by
+        # this renderer. That may list more than the include graph of the
+        # template, which only errs on the side of rendering again.
+        output = self._environment.get_template(template).render(
+            template_vars or {})
+        rendered_path = self._rendered_path(template, template_vars)
+        if rendered_path is not None:
+            self._save(rendered_path, output)
+        return output
+
+    def _save(self, rendered_path, output):
+        sources = dict(self._loader.sources)
+        directory = os.path.dirname(rendered_path)
+        _makedirs(directory)
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as rendered_file:
+                json.dump({'sources': sources, 'output': output},
+                          rendered_file)
+            os.rename(tmp_path, rendered_path)
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+# The renderer of each process of the render_all() pool. A forked process
+# inherits the renderer of its parent, which may use another cache_dir.
+_pool_renderer = None
+
+
+def _render_in_pool(cache_dir, template, template_vars):
+    global _pool_renderer
+    if _pool_renderer is None or _pool_renderer.cache_dir != cache_dir:
+        _pool_renderer = TemplateRenderer(cache_dir)
+    try:
+        if _pool_renderer.cached(template, template_vars) is not None:
+            return ('cached', None)
+        _pool_renderer.render(template, template_vars)
+        return ('rendered', None)
+    except Exception as ex:
+        return ('failed', '%s: %s' % (type(ex).__name__, str(ex)))
+
+
+def render_all(cache_dir, template, vars_by_host, workers=None):
+    """Render template with the variables of each host into cache_dir.
+
+    The templates are rendered by a pool of worker processes, each with its
+    own renderer, so a template is compiled, or its bytecode loaded, once
+    per process.
+
+    Args:
+        cache_dir - The cache directory.
+        template - The path of the Jinja2 template.
+        vars_by_host - A dict of the variables of each host.
+        workers - The number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        A dict of (status, error) tuples by host. The status is 'cached',
+        'rendered' or 'failed'.
+    """
+    hosts = sorted(vars_by_host)
+    workers = min(workers or os.cpu_count() or 1, len(hosts))
+    if workers <= 1:
+        return dict((host, _render_in_pool(cache_dir, template,
+                                           vars_by_host[host]))
+                    for host in hosts)
+    # Imported here, as module_utils must also import on Python 2.
+    from concurrent.futures import ProcessPoolExecutor
+    kwargs = {'max_workers': workers}
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # The workers inherit the loaded collection, whatever the default
+        # start method of the platform.
+        kwargs['mp_context'] = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(**kwargs) as pool:
+        futures = dict((host, pool.submit(_render_in_pool, cache_dir,
+                                          template, vars_by_host[host]))
+                       for host in hosts)
+        return dict((host, future.result())
+                    for (host, future) in futures.items())
+
+
+def _makedirs(directory):
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Conversion of lxml trees into plain dicts, lists and strings.
+
+etree_to_dict() gives the same structure as jxmlease.parse_etree(), as it
+is serialized to JSON in the module results, without building
+XMLDictNode objects:
+
+- The root element is the only key of the returned dict.
+- An element with child elements is a dict keyed by the child tags, in
+  document order. The tags of repeated children map to a list.
+- An element without child elements is its text, including the text
+  after its comments and processing instructions, with the leading and
+  trailing whitespace removed.
+- Tags in the default namespace lose it. Tags with a prefix are keyed
+  prefix:tag.
+- Attributes, comments and the text between child elements are dropped.
+
+The tree is walked iteratively with an explicit stack, so deep trees don't
+hit the recursion limit.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+
+def _key(element):
+    tag = element.tag
+    if tag[0] != '{':
+        return tag
+    tag = tag[tag.index('}') + 1:]
+    prefix = element.prefix
+    if prefix:
+        return prefix + ':' + tag
+    return tag
+
+
+def etree_to_dict(root):
+    """Return the plain Python data of the lxml element root.
+
+    Args:
+        root: An lxml.etree._Element.
+
+    Returns:
+        A dict with the single key of root's tag.
+    """
+    result = {}
+    stack = [(root, result)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        (element, parent) = pop()
+        children = [child for child in element if isinstance(child.tag, str)]
+        if children:
+            value = {}
+            for child in reversed(children):
+                push((child, value))
+        elif len(element):
+            # Only comments or processing instructions.
+            value = ''.join([element.text or ''] +
+                            [child.tail or '' for child in element]).strip()
+        else:
+            value = (element.text or '').strip()
+        key = _key(element)
+        if key not in parent:
+            parent[key] = value
+        else:
+            existing = parent[key]
+            if isinstance(existing, list):
+                existing.append(value)
+            else:
+                parent[key] = [existing, value]
+    return result
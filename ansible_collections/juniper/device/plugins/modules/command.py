@@ -42,6 +42,7 @@ DOCUMENTATION = '''
 extends_documentation_fragment: 
   - juniper_junos_common.connection_documentation
   - juniper_junos_common.logging_documentation
+  - juniper_junos_common.output_documentation
 module: command
 author: "Juniper Networks - Stacy Smith (@stacywsmith)"
 short_description: Execute one or more CLI commands on a Junos device
@@ -131,6 +132,28 @@ options:
       - format
       - display
       - output
+  output_mode:
+    description:
+      - Selects the keys returned for the command output when I(return_output)
+        is C(true).
+      - C(full) returns all of the output keys.
+      - C(lines_only) only returns the output as a list of lines.
+      - C(parsed_only) only returns the parsed output, or the output as a
+        single string when it isn't parsed (C(text) format).
+      - C(digest_only) only returns the size in bytes and the SHA-256 digest
+        of the output.
+      - C(file_only) saves the output as specified by the I(dest) or
+        I(dest_dir) option, which is required, and only returns the location
+        of the saved output.
+    required: false
+    default: full
+    type: str
+    choices:
+      - full
+      - lines_only
+      - parsed_only
+      - digest_only
+      - file_only
   return_output:
     description:
       - Indicates if the output of the command should be returned in the
@@ -141,6 +164,18 @@ options:
     required: false
     default: true
     type: bool
+  stream_output:
+    description:
+      - Writes the output of each command to the file specified by the I(dest) or
+        I(dest_dir) option, which is required, while the reply is received,
+        instead of building the whole reply in memory first. The memory used
+        stays close to the size of the reply, however large it is.
+      - Only the location of the saved output is returned, as with an
+        I(output_mode) of C(file_only).
+      - An rpc-error with a severity of warning in the reply is ignored.
+    required: false
+    default: false
+    type: bool
 '''
 
 EXAMPLES = '''
@@ -242,10 +277,10 @@ msg:
 parsed_output:
   description:
     - The command reply from the Junos device parsed into a JSON data structure.
-      For XML replies, the response is parsed into JSON using the
-      U(jxmlease|https://github.com/Juniper/jxmlease)
-      library. For JSON the response is parsed using the Python
-      U(json|https://docs.python.org/2/library/json.html) library.
+      For XML replies, the response is parsed into JSON by the engine
+      selected by the I(xml_parser) option. For JSON the response is parsed
+      using the Python U(json|https://docs.python.org/2/library/json.html)
+      library.
     - When Ansible converts the jxmlease or native Python data structure
       into JSON, it does not guarantee that the order of dictionary/object keys
       are maintained.
@@ -267,6 +302,14 @@ results:
       results of individual commands.
   returned: when the I(commands) option is a list value.
   type: list of dict
+rpc_cache:
+  description:
+    - The number of responses answered from (I(hits)) and added to
+      (I(misses)) the response cache of the C(juniper.device.pyez) persistent
+      connection. See the I(pyez_rpc_cache_size) connection option.
+  returned: when the response cache of the persistent connection is enabled
+            and one of the commands is cacheable.
+  type: dict
 stdout:
   description:
     - The command reply from the Junos device as a single multi-line string.
@@ -277,6 +320,22 @@ stdout_lines:
     - The command reply from the Junos device as a list of single-line strings.
   returned: when command executed successfully and I(return_output) is C(true).
   type: list of str
+stdout_file:
+  description:
+    - The location of the saved command reply.
+  returned: when command executed successfully and I(output_mode) is C(file_only)
+            or I(stream_output) is C(true).
+  type: str
+stdout_sha256:
+  description:
+    - The SHA-256 digest of the command reply.
+  returned: when command executed successfully and I(output_mode) is C(digest_only).
+  type: str
+stdout_size:
+  description:
+    - The size, in bytes, of the command reply.
+  returned: when command executed successfully and I(output_mode) is C(digest_only).
+  type: int
 '''
 
 import sys
@@ -314,9 +373,17 @@ def main():
             ignore_warning=dict(required=False,
                                 type='list',
                                 default=None),
+            output_mode=dict(required=False,
+                             type='str',
+                             choices=juniper_junos_common.OUTPUT_MODE_CHOICES,
+                             default='full'),
             return_output=dict(required=False,
                                type='bool',
-                               default=True)
+                               default=True),
+            stream_output=dict(required=False,
+                               type='bool',
+                               default=False),
+            **juniper_junos_common.output_spec
         ),
         # Since this module doesn't change the device's configuration, there is
         # no additional work required to support check mode. It's inherently
@@ -383,8 +450,25 @@ def main():
     elif len(formats) == 1 and len(commands) > 1:
         formats = formats * len(commands)
 
-    results = list()
+    rpcs = list()
     for (command, format) in zip(commands, formats):
+        rpc = junos_module.etree.Element('command', format=format)
+        rpc.text = command
+        rpcs.append(rpc)
+
+    # Over a persistent connection, execute all of the commands in a single
+    # exchange with the connection.
+    # Streamed outputs are written to their files while the replies are
+    # received, one command at a time.
+    stream_output = junos_module.params.get('stream_output')
+    batch_responses = None
+    if junos_module.conn_type != "local" and not stream_output:
+        batch_responses = junos_module.get_rpc_batch(list(zip(rpcs, formats)),
+                                                     ignore_warning=ignore_warning)
+
+    results = list()
+    for (index, (command, format, rpc)) in enumerate(zip(commands, formats,
+                                                         rpcs)):
         # Set initial result values. Assume failure until we know it's success.
         result = {'msg': '',
                   'command': command,
@@ -393,25 +477,34 @@ def main():
                   'failed': True}
 
         # Execute the CLI command
+        error = None
         try:
             junos_module.logger.debug('Executing command "%s".',
                                       command)
-            rpc = junos_module.etree.Element('command', format=format)
-            rpc.text = command
-            if junos_module.conn_type == "local":
-                resp = junos_module.dev.rpc(rpc, ignore_warning=ignore_warning, normalize=bool(format == 'xml'))
+            if stream_output:
+                (location, error) = junos_module.stream_rpc_output(
+                    command, format, rpc, normalize=bool(format == 'xml'))
+            elif batch_responses is not None:
+                (resp, error) = batch_responses[index]
             else:
-                resp = junos_module.get_rpc(rpc,
-                                   ignore_warning=ignore_warning, format=format)
-            result['msg'] = 'The command executed successfully.'
-            junos_module.logger.debug('Command "%s" executed successfully.',
-                                      command)
+                resp = junos_module.dev.rpc(rpc, ignore_warning=ignore_warning, normalize=bool(format == 'xml'))
         except (junos_module.pyez_exception.ConnectError,
                 junos_module.pyez_exception.RpcError) as ex:
+            error = str(ex)
+        if error is not None:
             junos_module.logger.debug('Unable to execute "%s". Error: %s',
-                                      command, str(ex))
+                                      command, error)
             result['msg'] = 'Unable to execute the command: %s. Error: %s' % \
-                            (command, str(ex))
+                            (command, error)
+            results.append(result)
+            continue
+        result['msg'] = 'The command executed successfully.'
+        junos_module.logger.debug('Command "%s" executed successfully.',
+                                  command)
+        if stream_output:
+            if junos_module.params['return_output'] is True:
+                result.update(junos_module.output_keys(None, None, location))
+            result['failed'] = False
             results.append(result)
             continue
 
@@ -440,7 +533,7 @@ def main():
                 text_output = junos_module.etree.tostring(resp,
                                                           pretty_print=True,
                                                           encoding=encode)
-                parsed_output = junos_module.jxmlease.parse_etree(resp)
+                parsed_output = junos_module.parse_xml(resp)
                 junos_module.logger.debug('XML output set.')
             elif format == 'json':
                 text_output = str(resp)
@@ -458,15 +551,12 @@ def main():
                                       type(resp))
             continue
 
+        # Save the output
+        location = junos_module.save_text_output(command, format, text_output)
         # Set the output keys
         if junos_module.params['return_output'] is True:
-            if text_output is not None:
-                result['stdout'] = text_output
-                result['stdout_lines'] = text_output.splitlines()
-            if parsed_output is not None:
-                result['parsed_output'] = parsed_output
-        # Save the output
-        junos_module.save_text_output(command, format, text_output)
+            result.update(junos_module.output_keys(text_output, parsed_output,
+                                                   location))
         # This command succeeded.
         result['failed'] = False
         # Append to the list of results
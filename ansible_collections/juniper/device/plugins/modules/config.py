@@ -42,6 +42,7 @@ DOCUMENTATION = '''
 extends_documentation_fragment: 
   - juniper_junos_common.connection_documentation
   - juniper_junos_common.logging_documentation
+  - juniper_junos_common.output_documentation
 module: config
 author: "Juniper Networks - Stacy Smith (@stacywsmith)"
 short_description: Manipulate the configuration of a Junos device
@@ -253,6 +254,40 @@ options:
     type: int
     aliases:
       - confirm
+  deferred_commit:
+    description:
+      - Shares one configuration session, and one commit, between the config
+        tasks of a host. Requires the C(juniper.device.pyez) connection, or
+        the connection hub, whose persistent connection keeps the session
+        open between the tasks. The hub doesn't close an idle connection
+        while its session is open.
+      - C(defer) opens the session, in the I(config_mode), if it isn't open
+        yet, and loads the I(src), I(lines), I(template) or I(url) into it.
+        The candidate configuration is neither checked nor committed, and the
+        session remains open. With I(diff), the differences made by this
+        task's load are returned, computed from the candidate configuration
+        text retrieved before and after the load.
+      - C(flush) loads the content, if any, into the session like C(defer),
+        then checks, diffs and commits all the loads of the session once,
+        according to the I(check), I(diff) and I(commit) options, and closes
+        the session. The diff returned is the one of all the loads. Nothing
+        is done when no session is open.
+      - C(discard) rolls back the loads of the session and closes it.
+      - While the session is open, a config task without this option fails
+        rather than committing the loads of the session. A failed
+        C(defer) or C(flush) task discards the loads of the session.
+      - The pyez_deferred_commit_on_close option of the connection decides
+        whether loads which were not flushed are committed or discarded when
+        the connection closes, at the end of the playbook.
+      - Not valid with the I(rollback), I(retrieve), I(confirmed) or
+        I(state_dir) options.
+    required: false
+    default: none
+    type: str
+    choices:
+      - defer
+      - flush
+      - discard
   dest:
     description:
       - The path to a file, on the local Ansible control machine, where the
@@ -464,6 +499,49 @@ options:
       - override
       - overwrite
     type: str
+  load_chunk_retries:
+    description:
+      - The number of times a chunk whose load times out is loaded again when
+        I(load_chunk_size) is set. The chunks sent after it are loaded again
+        too, so the candidate configuration receives the statements in their
+        original order.
+      - Loading a chunk again is harmless with the C(merge), C(replace) and
+        C(set) actions, except for set commands such as C(rename), C(copy)
+        or C(insert) which don't give the same result twice.
+    required: false
+    default: 2
+    type: int
+  load_chunk_size:
+    description:
+      - When greater than 0, a configuration loaded with the I(src),
+        I(lines) or I(template) option is split into chunks of at most this
+        many bytes, which are loaded into the same candidate configuration
+        with one load-configuration rpc each. A very large configuration then
+        doesn't have to be sent, parsed and loaded by a single rpc, and a
+        timeout only costs the chunk which timed out.
+      - Set commands are split between lines. A text configuration is split
+        between statements. With the C(merge) action, a chunk may end inside
+        a hierarchy, which the next chunk opens again. With the C(replace)
+        action, the chunks only end between top-level statements, since a
+        C(replace:) tag applies to a whole hierarchy.
+      - Only valid when I(load) is C(merge), C(replace) or C(set) and the
+        configuration is in set or text format. Not used with I(url) or
+        I(deferred_commit).
+      - The progress of the chunks is returned in I(load_chunks).
+    required: false
+    default: 0
+    type: int
+  load_chunk_window:
+    description:
+      - The number of chunks sent on the NETCONF session before waiting for
+        their replies when I(load_chunk_size) is set. The device processes
+        the chunks in the order they were sent.
+      - Only used with the C(juniper.device.pyez) connection or the
+        connection hub. The chunks are sent one at a time with a local
+        connection.
+    required: false
+    default: 1
+    type: int
   options:
     description:
       - Additional options, specified as a dictionary of key/value pairs, used
@@ -473,6 +551,58 @@ options:
     required: false
     default: None
     type: dict
+  output_mode:
+    description:
+      - Selects the keys returned for the retrieved configuration output when I(return_output)
+        is C(true).
+      - C(full) returns all of the output keys.
+      - C(lines_only) only returns the output as a list of lines.
+      - C(parsed_only) only returns the parsed output, or the output as a
+        single string when it isn't parsed (C(text) format).
+      - C(digest_only) only returns the size in bytes and the SHA-256 digest
+        of the output.
+      - C(file_only) saves the output as specified by the I(dest) or
+        I(dest_dir) option, which is required, and only returns the location
+        of the saved output.
+    required: false
+    default: full
+    type: str
+    choices:
+      - full
+      - lines_only
+      - parsed_only
+      - digest_only
+      - file_only
+  patch_cache_dir:
+    description:
+      - The path of a directory, on the local Ansible control machine, where
+        I(patch_override) caches the committed configuration of each host.
+        The configuration is retrieved again only after another commit.
+      - Without it, I(patch_override) retrieves the committed configuration
+        every time.
+    required: false
+    default: none
+    type: path
+  patch_override:
+    description:
+      - With a I(load) of C(override), C(overwrite) or C(update), compare the
+        configuration with the committed configuration on the Ansible
+        control machine and only load the hierarchies which differ, with the
+        C(replace) action. The hierarchies which only exist in the committed
+        configuration are deleted with the C(delete:) tag, and those whose
+        statements differ are loaded whole with the C(replace:) tag. The
+        candidate configuration then ends up as it would have with the
+        I(load) action, while the device only parses and compares the patch.
+      - The configuration must be in text format and be loaded with the
+        I(src), I(lines) or I(template) option.
+      - Comments and annotations are ignored. Unlike an override, the patch
+        doesn't change the annotations of the committed configuration.
+      - The size of the patch is returned in I(patch).
+      - Not used with I(config_mode) C(ephemeral), or the I(deferred_commit)
+        or I(load_chunk_size) options.
+    required: false
+    default: false
+    type: bool
   retrieve:
     description:
       - The configuration database to be retrieved.
@@ -532,6 +662,38 @@ options:
     aliases:
       - source
       - file
+  state_dir:
+    description:
+      - The path of a directory, on the local Ansible control machine, where
+        the module records, per host, the digest of the content loaded with
+        the I(src), I(lines) or I(template) option and the last commit of the
+        device configuration at which that content was known to be loaded.
+      - When the same content is loaded again and the last commit of the
+        device is still the recorded one, the candidate configuration is not
+        opened, loaded, checked, diffed, committed or closed. Only the
+        commit information is retrieved, and the module returns with
+        I(changed) C(false).
+      - The content is recorded when it is committed, or when I(diff) finds
+        no differences.
+      - Not used with the I(rollback), I(url), I(retrieve) or I(confirmed)
+        options, or when I(config_mode) is C(ephemeral).
+    required: false
+    default: none
+    type: path
+  stream_output:
+    description:
+      - Writes the retrieved configuration to the file specified by the I(dest) or
+        I(dest_dir) option, which is required, while the reply is received,
+        instead of building the whole reply in memory first. The memory used
+        stays close to the size of the reply, however large it is.
+      - Only the location of the saved output is returned, as with an
+        I(output_mode) of C(file_only).
+      - An rpc-error with a severity of warning in the reply is ignored.
+      - Only valid when the I(retrieve) option is set and the I(model) option
+        is not set.
+    required: false
+    default: false
+    type: bool
   template:
     description:
       - The path to a Jinja2 template file, on the local Ansible control
@@ -546,6 +708,21 @@ options:
     type: path
     aliases:
       - template_path
+  template_cache_dir:
+    description:
+      - The path of a directory, on the local Ansible control machine, where
+        the compiled I(template), and the templates it includes, imports or
+        extends, are cached as Jinja2 bytecode, along with the rendered
+        configuration for each set of I(vars).
+      - A template is compiled again only when one of its files changes, and
+        a rendered configuration is only used while none of the files it was
+        rendered from has changed.
+      - The M(juniper.device.render_templates) module renders the
+        configurations of all the hosts in this directory, in parallel,
+        before the config tasks run.
+    required: false
+    default: none
+    type: path
   url:
     description:
       - A URL which specifies the configuration data to load on the target
@@ -730,6 +907,14 @@ EXAMPLES = '''
       ansible.builtin.debug:
         var: response
 
+    - name: Merge a very large prefix-list file in pipelined 1 MB chunks
+      juniper.device.config:
+        load: 'merge'
+        src: "prefix-lists.conf"
+        load_chunk_size: 1048576
+        load_chunk_window: 4
+      register: response
+
     - name: fetch config from the device with filter and login credentials
       juniper.device.config:
         host: "10.x.x.x"
@@ -745,6 +930,24 @@ EXAMPLES = '''
         filter: <configuration><groups><name>re0</name></groups></configuration>
         return_output: True
       register: config_output
+
+- name: 'Commit the fragments of several tasks at once'
+  hosts: junos
+  connection: juniper.device.pyez
+  gather_facts: false
+
+  tasks:
+    - name: Load each fragment into the deferred configuration session
+      juniper.device.config:
+        load: 'merge'
+        src: "{{ item }}"
+        deferred_commit: defer
+      loop: "{{ config_fragments }}"
+
+    - name: Check, diff and commit all the fragments once
+      juniper.device.config:
+        deferred_commit: flush
+        comment: "Fragments of {{ inventory_hostname }}"
 '''
 
 RETURN = '''
@@ -769,8 +972,8 @@ config_lines:
 config_parsed:
   description:
     - The retrieved configuration parsed into a JSON datastructure.
-      For XML replies, the response is parsed into JSON using the
-      jxmlease library. For JSON the response is parsed using the
+      For XML replies, the response is parsed into JSON by the engine
+      selected by the I(xml_parser) option. For JSON the response is parsed using the
       Python json library.
     - When Ansible converts the jxmlease or native Python data
       structure into JSON, it does not guarantee that the order of
@@ -778,12 +981,37 @@ config_parsed:
   returned: when I(retrieved) is not C(none), the I(format) option is C(xml) or
             C(json) and I(return_output) is C(true).
   type: dict
+config_file:
+  description:
+    - The location of the saved retrieved configuration.
+  returned: when I(retrieved) is not C(none) and I(output_mode) is C(file_only)
+            or I(stream_output) is C(true).
+  type: str
+config_sha256:
+  description:
+    - The SHA-256 digest of the retrieved configuration.
+  returned: when I(retrieved) is not C(none) and I(output_mode) is C(digest_only).
+  type: str
+config_size:
+  description:
+    - The size, in bytes, of the retrieved configuration.
+  returned: when I(retrieved) is not C(none) and I(output_mode) is C(digest_only).
+  type: int
+deferred_loads:
+  description:
+    - The number of loads pending in the deferred configuration session after
+      a C(defer) task, or flushed or discarded by a C(flush) or C(discard)
+      task.
+  returned: when I(deferred_commit) is not C(none).
+  type: int
 diff:
   description: 
     - The configuration differences between the previous and new
       configurations. The value is a dict that contains a single key named
       "prepared". Value associated with that key is a single multi-line string
       in "diff" format.
+    - With I(deferred_commit) C(defer), the differences made by the task's
+      load, as a unified diff of the candidate configuration text.
   returned: when I(load)  or I(rollback) is specified, I(diff) is C(true), and
             I(return_output) is C(true).
   type: dict
@@ -795,6 +1023,15 @@ diff_lines:
   returned: when I(load)  or I(rollback) is specified, I(diff) is C(true), and
             I(return_output) is C(true).
   type: list
+load_chunks:
+  description:
+    - The progress of each chunk when I(load_chunk_size) is set, as a list of
+      dicts with the chunk number, its size in bytes, the number of attempts
+      to load it and the seconds elapsed since the first chunk was sent when
+      it was loaded, or C(null) if it wasn't.
+  returned: when I(load) is not C(none) and I(load_chunk_size) is set, also
+            on failure.
+  type: list
 failed:
   description: 
     - Indicates if the task failed.
@@ -810,6 +1047,15 @@ msg:
     - A human-readable message indicating the result.
   returned: always
   type: str
+patch:
+  description:
+    - The result of I(patch_override): the C(bytes) of the configuration, the
+      C(patch_bytes) of the patch loaded, which are 0 when the configuration
+      is already committed, the number of hierarchies C(added), C(deleted)
+      and C(replaced) and of top-level C(statements) changed, and whether the
+      committed configuration was C(cached).
+  returned: when I(patch_override) is C(true) and I(load) is not C(none).
+  type: dict
 '''
 
 
@@ -824,8 +1070,86 @@ Reference for the issue: https://groups.google.com/forum/#!topic/ansible-project
 # Ansiballz packages module_utils into ansible.module_utils
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.juniper.device.plugins.module_utils import juniper_junos_common
+from ansible_collections.juniper.device.plugins.module_utils import config_chunks
+from ansible_collections.juniper.device.plugins.module_utils import config_state
 from ansible_collections.juniper.device.plugins.module_utils import configuration as cfg
 
+def _report_diff(junos_module, results, diff, return_output):
+    """Add and save a configuration diff like Step 4 of main()."""
+    if diff is not None:
+        results['changed'] = True
+        if return_output is True or junos_module._diff:
+            results['diff'] = {'prepared': diff}
+            results['diff_lines'] = diff.splitlines()
+        # Save the diff output
+        junos_module.save_text_output('diff', 'diff', diff)
+    else:
+        results['changed'] = False
+
+
+def run_deferred_commit(junos_module, results, deferred_commit, load=None,
+                        src=None, lines=None, template=None, vars=None,
+                        url=None, format=None, config_mode=None,
+                        ephemeral_instance=None, ignore_warning=None,
+                        check=True, diff=True, commit=True,
+                        commit_empty_changes=False, check_commit_wait=None,
+                        **commit_args):
+    """Load into, flush or discard the deferred configuration session.
+
+    Exits the module with results.
+    """
+    return_output = junos_module.params.get('return_output')
+    diff = (diff is True or junos_module._diff) and config_mode != 'ephemeral'
+    if deferred_commit == 'discard':
+        loads = junos_module.discard_deferred_configuration()
+        results['deferred_loads'] = loads
+        results['changed'] = loads > 0
+        results['msg'] += 'discarded (%d deferred loads).' % (loads)
+        results['failed'] = False
+        junos_module.exit_json(**results)
+
+    if load is not None:
+        loaded = junos_module.deferred_load_configuration(
+            action=load, mode=config_mode, lines=lines, src=src,
+            template=template, vars=vars, url=url,
+            ignore_warning=ignore_warning, format=format,
+            ephemeral_instance=ephemeral_instance,
+            diff=diff and deferred_commit == 'defer')
+        if src is not None:
+            results['file'] = src
+        results['deferred_loads'] = loaded['loads']
+        results['msg'] += 'loaded'
+        results['changed'] = True
+        if deferred_commit == 'defer':
+            if diff:
+                _report_diff(junos_module, results, loaded['diff'],
+                             return_output)
+                results['msg'] += ', diffed'
+            results['msg'] += ', commit deferred.'
+            results['failed'] = False
+            junos_module.exit_json(**results)
+        results['msg'] += ', '
+
+    flushed = junos_module.flush_deferred_configuration(
+        check=check is True, diff=diff,
+        commit=commit is True and not junos_module.check_mode,
+        commit_empty_changes=commit_empty_changes is True,
+        check_commit_wait=check_commit_wait, ignore_warning=ignore_warning, **commit_args)
+    results['deferred_loads'] = flushed['loads']
+    if flushed['loads'] == 0:
+        results['msg'] += 'left unchanged. No deferred loads to flush.'
+    else:
+        results['changed'] = flushed['changed']
+        if diff:
+            _report_diff(junos_module, results, flushed['diff'],
+                         return_output)
+        results['msg'] += ('flushed (%d deferred loads)' % flushed['loads'] +
+                           (', committed' if flushed['committed'] else '') +
+                           ', closed.')
+    results['failed'] = False
+    junos_module.exit_json(**results)
+
+
 def main():
     # Choices which are defined in the common module.
     config_format_choices = juniper_junos_common.CONFIG_FORMAT_CHOICES
@@ -850,6 +1174,10 @@ def main():
             ephemeral_instance=dict(type='str',
                                     required=False,
                                     default=None),
+            deferred_commit=dict(type='str',
+                                 required=False,
+                                 choices=['defer', 'flush', 'discard'],
+                                 default=None),
             rollback=dict(type='str',
                           required=False,
                           default=None),
@@ -857,6 +1185,15 @@ def main():
                       type='str',
                       required=False,
                       default=None),
+            load_chunk_size=dict(type='int',
+                                 required=False,
+                                 default=0),
+            load_chunk_retries=dict(type='int',
+                                    required=False,
+                                    default=2),
+            load_chunk_window=dict(type='int',
+                                   required=False,
+                                   default=1),
             src=dict(type='path',
                      required=False,
                      aliases=['source', 'file'],
@@ -868,6 +1205,9 @@ def main():
                           required=False,
                           aliases=['template_path'],
                           default=None),
+            template_cache_dir=dict(type='path',
+                                    required=False,
+                                    default=None),
             vars=dict(type='dict',
                       required=False,
                       aliases=['template_vars'],
@@ -905,9 +1245,25 @@ def main():
                           aliases=['destination_dir', 'destdir', 'savedir',
                                    'save_dir'],
                           default=None),
+            output_mode=dict(required=False,
+                             type='str',
+                             choices=juniper_junos_common.OUTPUT_MODE_CHOICES,
+                             default='full'),
             return_output=dict(required=False,
                                type='bool',
                                default=True),
+            stream_output=dict(required=False,
+                               type='bool',
+                               default=False),
+            state_dir=dict(required=False,
+                           type='path',
+                           default=None),
+            patch_override=dict(required=False,
+                                type='bool',
+                                default=False),
+            patch_cache_dir=dict(required=False,
+                                 type='path',
+                                 default=None),
             retrieve=dict(choices=config_database_choices,
                           type='str',
                           required=False,
@@ -950,7 +1306,8 @@ def main():
                          default=None),
             check_commit_wait=dict(required=False,
                                    type='int',
-                                   default=None)
+                                   default=None),
+            **juniper_junos_common.output_spec
         ),
         # Mutually exclusive options.
         mutually_exclusive=[['load', 'rollback'],
@@ -971,12 +1328,15 @@ def main():
     # Straight from params
     config_mode = junos_module.params.get('config_mode')
     ephemeral_instance = junos_module.params.get('ephemeral_instance')
+    deferred_commit = junos_module.params.get('deferred_commit')
 
     # Parse rollback value
     rollback = junos_module.parse_rollback_option()
 
     # Straight from params
     load = junos_module.params.get('load')
+    load_chunk_size = junos_module.params.get('load_chunk_size')
+    patch_override = junos_module.params.get('patch_override')
     src = junos_module.params.get('src')
     lines = junos_module.params.get('lines')
     template = junos_module.params.get('template')
@@ -1000,6 +1360,7 @@ def main():
     confirmed = junos_module.params.get('confirmed')
     timeout = junos_module.params.get('timeout')
     comment = junos_module.params.get('comment')
+    state_dir = junos_module.params.get('state_dir')
     check_commit_wait = junos_module.params.get('check_commit_wait')
     model = junos_module.params.get('model')
     remove_ns = junos_module.params.get('remove_ns')
@@ -1068,6 +1429,14 @@ def main():
                                        "Must specify the 'retrieve' option."
                                        % (dest))
 
+    # stream_output is valid if retrieve is not None and model is None
+    if junos_module.params.get('stream_output') is True:
+        if retrieve is None or model is not None:
+            junos_module.fail_json(msg="The stream_output option is only "
+                                       "valid when the 'retrieve' option is "
+                                       "specified and the 'model' option is "
+                                       "not specified.")
+
     # diffs_file is valid if diff is True
     if diffs_file is not None:
         if diff is False:
@@ -1118,11 +1487,102 @@ def main():
                                        "must have a positive integer value." %
                                        (check_commit_wait))
 
+    # load_chunk_size splits a set or text configuration loaded with merge,
+    # replace or set
+    if load_chunk_size:
+        if load_chunk_size < 0:
+            junos_module.fail_json(msg="The load_chunk_size option (%s) must "
+                                       "not be negative." % (load_chunk_size))
+        if load not in config_chunks.CHUNK_ACTIONS:
+            junos_module.fail_json(msg="The load_chunk_size option requires "
+                                       "the load option to be one of: %s." %
+                                       (', '.join(config_chunks.CHUNK_ACTIONS)))
+        for option in ['url', 'deferred_commit']:
+            if junos_module.params.get(option) is not None:
+                junos_module.fail_json(msg="The %s option is not valid with "
+                                           "the load_chunk_size option." %
+                                           (option))
+        if format is not None and format not in config_chunks.CHUNK_FORMATS:
+            junos_module.fail_json(msg="The load_chunk_size option is not "
+                                       "valid with the %s format." % (format))
+
+    # patch_override loads the difference with the committed configuration
+    if patch_override:
+        if load not in ['override', 'overwrite', 'update']:
+            junos_module.fail_json(msg="The patch_override option requires "
+                                       "the load option to be override, "
+                                       "overwrite or update.")
+        if src is None and lines is None and template is None:
+            junos_module.fail_json(msg="The patch_override option requires "
+                                       "the src, lines or template option.")
+        for option in ['deferred_commit', 'load_chunk_size']:
+            if junos_module.params.get(option):
+                junos_module.fail_json(msg="The %s option is not valid with "
+                                           "the patch_override option." %
+                                           (option))
+        if config_mode == 'ephemeral':
+            junos_module.fail_json(msg="The patch_override option is not "
+                                       "valid with the ephemeral "
+                                       "config_mode.")
+
+    # deferred_commit shares the session of the persistent connection
+    if deferred_commit is not None:
+        for option in ['rollback', 'retrieve', 'confirmed', 'state_dir']:
+            if junos_module.params.get(option) is not None:
+                junos_module.fail_json(msg="The %s option is not valid with "
+                                           "the deferred_commit option." %
+                                           (option))
+        if deferred_commit == 'defer' and load is None:
+            junos_module.fail_json(msg="The deferred_commit option is defer, "
+                                       "but the load option is not "
+                                       "specified.")
+        if deferred_commit == 'discard' and load is not None:
+            junos_module.fail_json(msg="The deferred_commit option is "
+                                       "discard, but the load option is "
+                                       "specified.")
+
     # Initialize the results. Assume failure until we know it's success.
     results = {'msg': 'Configuration has been: ',
                'changed': False,
                'failed': True}
 
+    if deferred_commit is not None:
+        run_deferred_commit(junos_module, results, deferred_commit, load=load,
+                            src=src, lines=lines, template=template,
+                            vars=vars, url=url, format=format,
+                            config_mode=config_mode,
+                            ephemeral_instance=ephemeral_instance,
+                            ignore_warning=ignore_warning, check=check,
+                            diff=diff, commit=commit,
+                            commit_empty_changes=commit_empty_changes,
+                            check_commit_wait=check_commit_wait,
+                            comment=comment, timeout=timeout,
+                            full=commit_full, sync=commit_sync,
+                            force_sync=commit_force_sync)
+
+    # With state_dir, skip loading content which is already loaded at the
+    # last commit of the device.
+    state_store = None
+    if (state_dir is not None and load is not None and rollback is None and
+            url is None and retrieve is None and confirmed is None and
+            config_mode != 'ephemeral'):
+        content = junos_module.load_content(lines=lines, src=src,
+                                            template=template, vars=vars)
+        if content is not None:
+            state_store = config_state.ConfigStateStore(
+                state_dir, junos_module.inventory_hostname)
+            state_digest = config_state.content_digest(load, format, content)
+            commit_id = junos_module.get_commit_id()
+            if (commit_id is not None and
+                    state_store.lookup(state_digest) == commit_id):
+                junos_module.logger.debug("The content was loaded at the "
+                                          "last commit (%s). Skipping the "
+                                          "load.", commit_id)
+                results['msg'] += ('left unchanged. The same content was '
+                                   'loaded at the last commit.')
+                results['failed'] = False
+                junos_module.exit_json(**results)
+
     junos_module.logger.debug("Step 1 - Open a candidate configuration "
                               "database.")
     junos_module.open_configuration(mode=config_mode, ignore_warning=ignore_warning,
@@ -1138,7 +1598,33 @@ def main():
         results['changed'] = True
         results['msg'] += ', rolled back'
     elif load is not None:
-        if src is not None:
+        if patch_override:
+            results['patch'] = junos_module.load_configuration_patch(
+                lines=lines,
+                src=src,
+                template=template,
+                vars=vars,
+                ignore_warning=ignore_warning,
+                format=format,
+                cache_dir=junos_module.params.get('patch_cache_dir'))
+            if src is not None:
+                results['file'] = src
+        elif load_chunk_size and (src is not None or lines is not None or
+                                template is not None):
+            results['load_chunks'] = junos_module.load_configuration_chunks(
+                action=load,
+                chunk_size=load_chunk_size,
+                lines=lines,
+                src=src,
+                template=template,
+                vars=vars,
+                ignore_warning=ignore_warning,
+                format=format,
+                window=junos_module.params.get('load_chunk_window'),
+                retries=junos_module.params.get('load_chunk_retries'))
+            if src is not None:
+                results['file'] = src
+        elif src is not None:
             junos_module.load_configuration(action=load,
                                             src=src,
                                             ignore_warning=ignore_warning,
@@ -1166,8 +1652,10 @@ def main():
                                        "'url' option was set." %
                                        (load))
         # Assume configuration changed in case we don't perform a diff later.
-        # If diff is set, we'll check for actual differences later.
-        results['changed'] = True
+        # If diff is set, we'll check for actual differences later. An empty
+        # patch is known not to change anything.
+        if not patch_override or results['patch']['patch_bytes'] > 0:
+            results['changed'] = True
         results['msg'] += ', loaded'
 
     junos_module.logger.debug("Step 3 - Check the validity of the candidate "
@@ -1179,17 +1667,11 @@ def main():
     junos_module.logger.debug("Step 4 - Determine differences between the "
                               "candidate and committed configuration "
                               "databases.")
+    diffed = False
     if diff is True or junos_module._diff:
+        diffed = True
         diff = junos_module.diff_configuration(ignore_warning)
-        if diff is not None:
-            results['changed'] = True
-            if return_output is True or junos_module._diff:
-                results['diff'] = {'prepared': diff}
-                results['diff_lines'] = diff.splitlines()
-            # Save the diff output
-            junos_module.save_text_output('diff', 'diff', diff)
-        else:
-            results['changed'] = False
+        _report_diff(junos_module, results, diff, return_output)
         results['msg'] += ', diffed'
 
     junos_module.logger.debug("Step 5 - Retrieve the configuration database "
@@ -1197,26 +1679,37 @@ def main():
     if retrieve is not None:
         if format is None:
             format = 'text'
-        (config, config_parsed) = junos_module.get_configuration(
+        format_extension = 'config' if format == 'text' else format
+        if junos_module.params.get('stream_output') is True:
+            # The configuration is saved while it is received.
+            (config, config_parsed) = (None, None)
+            location = junos_module.stream_configuration(
+                                      'config', format_extension,
                                       database=retrieve,
                                       format=format,
                                       options=options,
-                                      filter=filter,
-                                      model=model,
-                                      namespace=namespace,
-                                      remove_ns=remove_ns)
+                                      filter=filter)
+        else:
+            (config, config_parsed) = junos_module.get_configuration(
+                                          database=retrieve,
+                                          format=format,
+                                          options=options,
+                                          filter=filter,
+                                          model=model,
+                                          namespace=namespace,
+                                          remove_ns=remove_ns)
+            # Save the output
+            location = junos_module.save_text_output('config',
+                                                     format_extension,
+                                                     config)
         if return_output is True:
-            if config is not None:
-                results['config'] = config
-                results['config_lines'] = config.splitlines()
-            if config_parsed is not None:
-                results['config_parsed'] = config_parsed
-        # Save the output
-        format_extension = 'config' if format == 'text' else format
-        junos_module.save_text_output('config', format_extension, config)
+            results.update(junos_module.output_keys(
+                config, config_parsed, location, text_key='config',
+                lines_key='config_lines', parsed_key='config_parsed'))
         results['msg'] += ', retrieved'
 
     junos_module.logger.debug("Step 6 - Commit the configuration changes.")
+    committed = False
     if commit is True and not junos_module.check_mode:
         # Perform the commit if:
         # 1) commit_empty_changes is True
@@ -1235,6 +1728,7 @@ def main():
                                               full=commit_full,
                                               sync=commit_sync,
                                               force_sync=commit_force_sync)
+            committed = True
             results['msg'] += ', committed'
         else:
             junos_module.logger.debug("Skipping commit. Nothing changed.")
@@ -1244,6 +1738,18 @@ def main():
     junos_module.close_configuration()
     results['msg'] += ', closed.'
 
+    # Record the commit at which the content is known to be loaded.
+    if state_store is not None and (committed or
+                                    (diffed and results['changed'] is False)):
+        if committed:
+            commit_id = junos_module.get_commit_id()
+        if commit_id is not None:
+            try:
+                state_store.record(state_digest, commit_id)
+            except (IOError, OSError) as ex:
+                junos_module.warn('Unable to record the loaded content in '
+                                  '%s: %s' % (state_store.path, str(ex)))
+
     # If we made it this far, everything was successful.
     results['failed'] = False
 
@@ -0,0 +1,339 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+from __future__ import absolute_import, division, print_function
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'supported_by': 'community',
+                    'status': ['stableinterface']}
+
+DOCUMENTATION = '''
+---
+extends_documentation_fragment:
+  - juniper_junos_common.connection_documentation
+  - juniper_junos_common.logging_documentation
+module: ephemeral
+author: "Juniper Networks"
+short_description: Program a Junos ephemeral database instance at a high rate
+description:
+  - Loads updates into an ephemeral database instance and commits them in
+    batches. The updates which arrive within the coalescing I(window) of the
+    first one, up to I(max_batch) updates, are committed together, and the
+    consecutive C(set) or C(text) updates of a batch are sent in a single
+    load.
+  - With the C(juniper.device.pyez) connection, or the connection hub, the
+    instance stays open on a dedicated NETCONF session of the persistent
+    connection, and the task returns as soon as its updates are queued,
+    unless I(wait), I(flush) or I(close) is set. The updates of successive
+    tasks then share the batches. The queued updates are applied, and the
+    instance is closed, when the connection is closed.
+  - Without a persistent connection, the instance is opened, the updates
+    are applied in batches, and the instance is closed, by each task.
+  - A failed batch is discarded, then its halves are applied again on their
+    own, down to the single updates, so only the updates which fail are
+    discarded. Their errors are reported by the first task which waits for
+    its updates, or flushes the instance.
+options:
+  close:
+    description:
+      - Flushes the instance, like I(flush), then closes it.
+    required: false
+    default: false
+    type: bool
+  flush:
+    description:
+      - Waits until all the updates queued for the instance, by this task and
+        the previous ones, are committed. Returns the statistics of the
+        updates since the previous flush, including the updates per second
+        achieved. Fails if any of them failed.
+    required: false
+    default: false
+    type: bool
+  format:
+    description:
+      - The format of the updates. When not specified, PyEZ determines the
+        format of each update from its content, and the updates are not
+        joined.
+    required: false
+    default: none
+    type: str
+    choices:
+      - set
+      - text
+      - xml
+      - json
+  ignore_warning:
+    description:
+      - A boolean, string or list of strings. If the value is C(true),
+        ignore all warnings regardless of the warning message. If the value
+        is a string, it will ignore warning(s) if the message of each warning
+        matches the string. If the value is a list of strings, ignore
+        warning(s) if the message of each warning matches at least one of the
+        strings in the list. The value of the I(ignore_warning) option is
+        applied to the open, load and commit operations of the instance.
+      - With a persistent connection, only the value of the task which opens
+        the instance is used.
+    required: false
+    default: none
+    type: bool, str, or list of str
+  instance:
+    description:
+      - The name of the ephemeral instance. The default ephemeral instance is
+        used when not specified.
+    required: false
+    default: none
+    type: str
+    aliases:
+      - ephemeral_instance
+  load:
+    description:
+      - The load action of the updates.
+    required: false
+    default: merge
+    type: str
+    choices:
+      - merge
+      - replace
+      - set
+      - update
+  max_batch:
+    description:
+      - The maximum number of updates committed together.
+    required: false
+    default: 500
+    type: int
+  updates:
+    description:
+      - The updates to load. Each update is a string, or a list of lines, in
+        the I(format) format.
+    required: false
+    default: []
+    type: list
+  wait:
+    description:
+      - Waits until the updates of this task are committed, and fails if any
+        of them failed.
+    required: false
+    default: false
+    type: bool
+  window:
+    description:
+      - The coalescing window, in seconds. A batch is committed when this
+        time has passed since its first update was queued, or when it has
+        I(max_batch) updates.
+    required: false
+    default: 0.05
+    type: float
+'''
+
+EXAMPLES = '''
+---
+- name: 'Program static routes in an ephemeral instance'
+  hosts: junos
+  connection: juniper.device.pyez
+  gather_facts: false
+
+  tasks:
+    - name: Queue the routes of each prefix list
+      juniper.device.ephemeral:
+        instance: "routes"
+        load: set
+        updates: "{{ item.set_lines }}"
+      loop: "{{ route_updates }}"
+
+    - name: Wait for all the routes to be committed
+      juniper.device.ephemeral:
+        instance: "routes"
+        flush: true
+      register: response
+
+    - name: Print the achieved rate
+      ansible.builtin.debug:
+        var: response.stats.updates_per_second
+'''
+
+RETURN = '''
+changed:
+  description:
+    - Indicates if updates were queued or applied.
+  returned: always
+  type: bool
+errors:
+  description:
+    - The errors of the failed batches with updates of this task, or of any
+      batch since the previous flush when I(flush) or I(close) is set.
+  returned: when I(wait), I(flush) or I(close) is set, or without a
+            persistent connection.
+  type: list
+failed:
+  description:
+    - Indicates if the task failed.
+  returned: always
+  type: bool
+msg:
+  description:
+    - A human-readable message indicating the result.
+  returned: always
+  type: str
+queued:
+  description:
+    - The number of updates of this task.
+  returned: always
+  type: int
+stats:
+  description:
+    - The statistics of the updates applied since the previous flush. The
+      keys are C(updates) (applied), C(failed), C(batches) (commits),
+      C(loads) (load-configuration RPCs), C(elapsed) (seconds from the
+      first update queued to the last commit), C(updates_per_second)
+      and C(errors).
+  returned: when I(flush) or I(close) is set, or without a persistent
+            connection.
+  type: dict
+'''
+
+"""From Ansible 2.1, Ansible uses Ansiballz framework for assembling modules
+But custom module_utils directory is supported from Ansible 2.3
+Reference for the issue: https://groups.google.com/forum/#!topic/ansible-project/J8FL7Z1J1Mw """
+
+# Ansiballz packages module_utils into ansible.module_utils
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.juniper.device.plugins.module_utils import juniper_junos_common
+from ansible_collections.juniper.device.plugins.module_utils import ephemeral_engine
+
+
+def main():
+
+    # The argument spec for the module.
+    junos_module = juniper_junos_common.JuniperJunosModule(
+        argument_spec=dict(
+            instance=dict(type='str',
+                          required=False,
+                          aliases=['ephemeral_instance'],
+                          default=None),
+            updates=dict(type='list',
+                         required=False,
+                         default=[]),
+            load=dict(type='str',
+                      required=False,
+                      choices=ephemeral_engine.EPHEMERAL_LOAD_CHOICES,
+                      default='merge'),
+            format=dict(type='str',
+                        required=False,
+                        choices=['set', 'text', 'xml', 'json'],
+                        default=None),
+            window=dict(type='float',
+                        required=False,
+                        default=ephemeral_engine.DEFAULT_WINDOW),
+            max_batch=dict(type='int',
+                           required=False,
+                           default=ephemeral_engine.DEFAULT_MAX_BATCH),
+            wait=dict(type='bool',
+                      required=False,
+                      default=False),
+            flush=dict(type='bool',
+                       required=False,
+                       default=False),
+            close=dict(type='bool',
+                       required=False,
+                       default=False),
+            ignore_warning=dict(required=False,
+                                type='list',
+                                default=None),
+        ),
+        supports_check_mode=False,
+    )
+
+    # We're going to be using params a lot
+    params = junos_module.params
+    ignore_warning = junos_module.parse_ignore_warning_option()
+
+    if params['window'] < 0:
+        junos_module.fail_json(msg="The window option (%s) must not be "
+                                   "negative." % (params['window']))
+    if params['max_batch'] < 1:
+        junos_module.fail_json(msg="The max_batch option (%s) must have a "
+                                   "positive integer value." %
+                                   (params['max_batch']))
+
+    updates = []
+    for update in params['updates']:
+        if isinstance(update, list):
+            update = '\n'.join(line.rstrip('\n') for line in update)
+        elif not isinstance(update, str):
+            junos_module.fail_json(msg="Each update must be a string or a "
+                                       "list of lines: %s" % (update))
+        updates.append((update, params['format'], params['load']))
+
+    result = junos_module.ephemeral_updates(
+        updates, instance=params['instance'], window=params['window'],
+        max_batch=params['max_batch'], wait=params['wait'],
+        flush=params['flush'], close=params['close'],
+        ignore_warning=ignore_warning)
+
+    # Set initial results values.
+    results = {'changed': len(updates) > 0, 'failed': False,
+               'queued': result['queued']}
+    if 'errors' in result:
+        results['errors'] = result['errors']
+    if 'stats' in result:
+        # The errors of every batch since the previous flush
+        results['errors'] = result['stats']['errors']
+        results['stats'] = result['stats']
+        results['changed'] = results['changed'] or result['stats']['updates'] > 0
+
+    if 'stats' in result:
+        stats = result['stats']
+        results['msg'] = ('%d ephemeral updates applied in %d batches, %d '
+                          'failed' % (stats['updates'], stats['batches'],
+                                      stats['failed']))
+        if stats['updates_per_second'] is not None:
+            results['msg'] += (', %s updates per second' %
+                               stats['updates_per_second'])
+        results['msg'] += '.'
+    elif 'errors' in result:
+        results['msg'] = '%d ephemeral updates committed.' % len(updates)
+    else:
+        results['msg'] = '%d ephemeral updates queued.' % len(updates)
+
+    if results.get('errors'):
+        results['msg'] = ('Ephemeral updates failed: %s' %
+                          '; '.join(results['errors']))
+        junos_module.fail_json(**results)
+
+    # Return results.
+    junos_module.exit_json(**results)
+
+
+if __name__ == '__main__':
+    main()
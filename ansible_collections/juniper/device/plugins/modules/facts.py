@@ -42,6 +42,7 @@ DOCUMENTATION = '''
 extends_documentation_fragment: 
   - juniper_junos_common.connection_documentation
   - juniper_junos_common.logging_documentation
+  - juniper_junos_common.output_documentation
 module: facts
 author: "Juniper Networks - Stacy Smith (@stacywsmith)"
 short_description: Retrieve facts from a Junos device
@@ -189,7 +190,6 @@ Reference for the issue: https://groups.google.com/forum/#!topic/ansible-project
 # Ansiballz packages module_utils into ansible.module_utils
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.juniper.device.plugins.module_utils import juniper_junos_common
-from ansible.module_utils._text import to_bytes
 from ansible_collections.juniper.device.plugins.module_utils import configuration as cfg
 
 def get_facts_dict(junos_module):
@@ -248,22 +248,16 @@ def save_facts(junos_module, facts):
         facts: The facts dict returned by get_facts_dict().
 
     Raises:
-        IOError: Calls junos_module.fail_json if unable to open the facts
-                 file for writing.
+        IOError: Calls junos_module.fail_json if unable to write the facts
+                 file.
     """
     if junos_module.params.get('savedir') is not None:
         save_dir = junos_module.params.get('savedir')
         file_name = '%s-facts.json' % (facts['hostname'])
         file_path = os.path.normpath(os.path.join(save_dir, file_name))
         junos_module.logger.debug("Saving facts to: %s.", file_path)
-        try:
-            # TODO: Verify does this work with Python3
-            with open(file_path, 'w') as fact_file:
-                json.dump(facts, fact_file)
-            junos_module.logger.debug("Facts saved to: %s.", file_path)
-        except IOError:
-            junos_module.fail_json(msg="Unable to save facts. Failed to open "
-                                       "the %s file." % (file_path))
+        junos_module.write_output(file_path, json.dumps(facts))
+        junos_module.logger.debug("Facts saved to: %s.", file_path)
 
 
 def save_inventory(junos_module, inventory):
@@ -279,8 +273,8 @@ def save_inventory(junos_module, inventory):
         inventory: The XML string of inventory to save.
 
     Raises:
-        IOError: Calls junos_module.fail_json if unable to open the inventory
-                 file for writing.
+        IOError: Calls junos_module.fail_json if unable to write the
+                 inventory file.
     """
     if junos_module.conn_type == "local" :
         dev = junos_module.dev
@@ -292,13 +286,8 @@ def save_inventory(junos_module, inventory):
         save_dir = junos_module.params.get('savedir')
         file_path = os.path.normpath(os.path.join(save_dir, file_name))
         junos_module.logger.debug("Saving inventory to: %s.", file_path)
-        try:
-            with open(file_path, 'wb') as fact_file:
-                fact_file.write(to_bytes(inventory, encoding='utf-8'))
-            junos_module.logger.debug("Inventory saved to: %s.", file_path)
-        except IOError:
-            junos_module.fail_json(msg="Unable to save inventory. Failed to "
-                                       "open the %s file." % (file_path))
+        junos_module.write_output(file_path, inventory)
+        junos_module.logger.debug("Inventory saved to: %s.", file_path)
 
 
 def main():
@@ -312,6 +301,7 @@ def main():
                                required=False,
                                default=None),
             savedir=dict(type='path', required=False, default=None),
+            **juniper_junos_common.output_spec
         ),
         # Since this module doesn't change the device's configuration, there is
         # no additional work required to support check mode. It's inherently
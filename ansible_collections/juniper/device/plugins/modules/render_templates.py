@@ -0,0 +1,162 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+from __future__ import absolute_import, division, print_function
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'supported_by': 'community',
+                    'status': ['stableinterface']}
+
+DOCUMENTATION = '''
+---
+module: render_templates
+author: "Juniper Networks"
+short_description: Render the configuration template of many hosts in advance
+description:
+  - Renders a Jinja2 configuration template with the variables of each host,
+    in a pool of processes on the local Ansible control machine, into the
+    directory used as the I(template_cache_dir) of the
+    M(juniper.device.config) module.
+  - The config tasks which then load the same I(template), with the same
+    I(vars) and I(template_cache_dir), use the rendered configuration
+    instead of rendering the template again.
+  - Run the task once for the play, with C(run_once), before the config
+    tasks.
+  - This module is executed on the controller by its action plugin. It
+    doesn't connect to the devices.
+options:
+  fail_on_error:
+    description:
+      - Fails the task when the template can't be rendered for one of the
+        hosts. Otherwise, the hosts are listed in the I(errors) return value
+        and their config tasks render the template again, and report the
+        error.
+    required: false
+    default: true
+    type: bool
+  hosts:
+    description:
+      - The hosts whose configurations are rendered.
+    required: false
+    default: the value of C(ansible_play_hosts)
+    type: list
+    elements: str
+  template:
+    description:
+      - The path to the Jinja2 template file, as given to the I(template)
+        option of the config tasks.
+    required: true
+    type: path
+  template_cache_dir:
+    description:
+      - The cache directory, as given to the I(template_cache_dir) option of
+        the config tasks.
+    required: true
+    type: path
+  vars_from:
+    description:
+      - The name of the host variable which holds the dictionary given to
+        the I(vars) option of the config tasks.
+      - The hosts without this variable are skipped.
+    required: true
+    type: str
+  workers:
+    description:
+      - The number of processes rendering the template.
+    required: false
+    default: the number of CPUs of the controller
+    type: int
+'''
+
+EXAMPLES = '''
+---
+- name: 'Render and load the configuration of all the devices'
+  hosts: junos
+  connection: local
+  gather_facts: false
+
+  tasks:
+    - name: Render the configurations
+      juniper.device.render_templates:
+        template: "junos.conf.j2"
+        vars_from: "junos_config_vars"
+        template_cache_dir: "/var/cache/junos_templates"
+      run_once: true
+
+    - name: Load the rendered configuration
+      juniper.device.config:
+        load: "merge"
+        template: "junos.conf.j2"
+        vars: "{{ junos_config_vars }}"
+        template_cache_dir: "/var/cache/junos_templates"
+        format: "text"
+'''
+
+RETURN = '''
+cached:
+  description:
+    - The hosts whose configuration was already rendered, from templates
+      which haven't changed since.
+  returned: always
+  type: list
+changed:
+  description:
+    - Always C(false). Only the cache directory is written.
+  returned: always
+  type: bool
+errors:
+  description:
+    - The error rendering the template, by host.
+  returned: always
+  type: dict
+msg:
+  description:
+    - A human-readable message summarizing the result.
+  returned: always
+  type: str
+rendered:
+  description:
+    - The hosts whose configuration was rendered.
+  returned: always
+  type: list
+skipped:
+  description:
+    - The hosts without the I(vars_from) variable.
+  returned: always
+  type: list
+template_cache_dir:
+  description:
+    - The cache directory.
+  returned: always
+  type: str
+'''
@@ -42,6 +42,7 @@ DOCUMENTATION = '''
 extends_documentation_fragment: 
   - juniper_junos_common.connection_documentation
   - juniper_junos_common.logging_documentation
+  - juniper_junos_common.output_documentation
 module: rpc
 author: "Juniper Networks - Stacy Smith (@stacywsmith)"
 short_description: Execute one or more NETCONF RPCs on a Junos device
@@ -173,6 +174,28 @@ options:
       - kwarg
       - args
       - arg
+  output_mode:
+    description:
+      - Selects the keys returned for the RPC output when I(return_output)
+        is C(true).
+      - C(full) returns all of the output keys.
+      - C(lines_only) only returns the output as a list of lines.
+      - C(parsed_only) only returns the parsed output, or the output as a
+        single string when it isn't parsed (C(text) format).
+      - C(digest_only) only returns the size in bytes and the SHA-256 digest
+        of the output.
+      - C(file_only) saves the output as specified by the I(dest) or
+        I(dest_dir) option, which is required, and only returns the location
+        of the saved output.
+    required: false
+    default: full
+    type: str
+    choices:
+      - full
+      - lines_only
+      - parsed_only
+      - digest_only
+      - file_only
   return_output:
     description:
       - Indicates if the output of the RPC should be returned in the
@@ -191,6 +214,18 @@ options:
     type: list
     aliases:
       - rpc
+  stream_output:
+    description:
+      - Writes the reply of each RPC to the file specified by the I(dest) or
+        I(dest_dir) option, which is required, while the reply is received,
+        instead of building the whole reply in memory first. The memory used
+        stays close to the size of the reply, however large it is.
+      - Only the location of the saved output is returned, as with an
+        I(output_mode) of C(file_only).
+      - An rpc-error with a severity of warning in the reply is ignored.
+    required: false
+    default: false
+    type: bool
 '''
 
 EXAMPLES = '''
@@ -305,10 +340,10 @@ msg:
 parsed_output:
   description:
     - The RPC reply from the Junos device parsed into a JSON datastructure.
-      For XML replies, the response is parsed into JSON using the
-      U(jxmlease|https://github.com/Juniper/jxmlease)
-      library. For JSON the response is parsed using the Python
-      U(json|https://docs.python.org/2/library/json.html) library.
+      For XML replies, the response is parsed into JSON by the engine
+      selected by the I(xml_parser) option. For JSON the response is parsed
+      using the Python U(json|https://docs.python.org/2/library/json.html)
+      library.
     - When Ansible converts the jxmlease or native Python data structure
       into JSON, it does not guarantee that the order of dictionary/object keys
       are maintained.
@@ -335,6 +370,14 @@ rpc:
     - The RPC which was executed from the list of RPCs in the I(rpcs) option.
   returned: always
   type: str
+rpc_cache:
+  description:
+    - The number of responses answered from (I(hits)) and added to
+      (I(misses)) the response cache of the C(juniper.device.pyez) persistent
+      connection. See the I(pyez_rpc_cache_size) connection option.
+  returned: when the response cache of the persistent connection is enabled
+            and one of the RPCs is cacheable.
+  type: dict
 stdout:
   description:
     - The RPC reply from the Junos device as a single multi-line string.
@@ -345,6 +388,22 @@ stdout_lines:
     - The RPC reply from the Junos device as a list of single-line strings.
   returned: when RPC executed successfully and I(return_output) is C(true).
   type: list of str
+stdout_file:
+  description:
+    - The location of the saved RPC reply.
+  returned: when RPC executed successfully and I(output_mode) is C(file_only)
+            or I(stream_output) is C(true).
+  type: str
+stdout_sha256:
+  description:
+    - The SHA-256 digest of the RPC reply.
+  returned: when RPC executed successfully and I(output_mode) is C(digest_only).
+  type: str
+stdout_size:
+  description:
+    - The size, in bytes, of the RPC reply.
+  returned: when RPC executed successfully and I(output_mode) is C(digest_only).
+  type: int
 '''
 
 import os.path
@@ -365,7 +424,9 @@ Reference for the issue: https://groups.google.com/forum/#!topic/ansible-project
 # Ansiballz packages module_utils into ansible.module_utils
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.juniper.device.plugins.module_utils import juniper_junos_common
+from ansible_collections.juniper.device.plugins.module_utils import reply_stream
 from ansible_collections.juniper.device.plugins.module_utils import configuration as cfg
+from ansible_collections.juniper.device.plugins.module_utils.logging_utils import LazyFormat
 
 def main():
     # Create the module instance.
@@ -402,9 +463,17 @@ def main():
             ignore_warning=dict(required=False,
                                 type='list',
                                 default=None),
+            output_mode=dict(required=False,
+                             type='str',
+                             choices=juniper_junos_common.OUTPUT_MODE_CHOICES,
+                             default='full'),
             return_output=dict(required=False,
                                type='bool',
-                               default=True)
+                               default=True),
+            stream_output=dict(required=False,
+                               type='bool',
+                               default=False),
+            **juniper_junos_common.output_spec
         ),
         # Since this module doesn't change the device's configuration, there is
         # no additional work required to support check mode. It's inherently
@@ -482,10 +551,52 @@ def main():
                                        "when the rpcs option value is a "
                                        "single 'get-config' RPC.")
 
+    # Replace underscores with dashes in RPC names.
+    rpc_strings = [rpc_string.replace('_', '-') for rpc_string in rpcs]
+
+    rpc_elements = list()
+    for (rpc_string, format, kwarg, attr) in zip(rpc_strings, formats, kwargs,
+                                                 attrs):
+        rpc = junos_module.etree.Element(rpc_string, format=format)
+        # The get-config RPC is executed with dev.rpc.get_config(), which
+        # handles the kwargs and attrs itself.
+        if rpc_string != 'get-config':
+            if kwarg is not None:
+                # Add kwarg
+                for (key, value) in iteritems(kwarg):
+                    # Replace underscores with dashes in key name.
+                    key = key.replace('_', '-')
+                    sub_element = junos_module.etree.SubElement(rpc, key)
+                    if not isinstance(value, bool):
+                        sub_element.text = value
+            if attr is not None:
+                # Add attr
+                for (key, value) in iteritems(attr):
+                    # Replace underscores with dashes in key name.
+                    key = key.replace('_', '-')
+                    rpc.set(key, value)
+        rpc_elements.append(rpc)
+
+    # Over a persistent connection, execute all of the RPCs, other than
+    # get-config, in a single exchange with the connection.
+    # Streamed outputs are written to their files while the replies are
+    # received, one RPC at a time.
+    stream_output = junos_module.params.get('stream_output')
+    batch_responses = {}
+    if junos_module.conn_type != "local" and not stream_output:
+        batch_indexes = [index for (index, rpc_string) in enumerate(rpc_strings)
+                         if rpc_string != 'get-config']
+        if len(batch_indexes) > 0:
+            batch = [(rpc_elements[index], formats[index])
+                     for index in batch_indexes]
+            batch_responses = dict(zip(batch_indexes,
+                                       junos_module.get_rpc_batch(
+                                           batch,
+                                           ignore_warning=ignore_warning)))
+
     results = list()
-    for (rpc_string, format, kwarg, attr) in zip(rpcs, formats, kwargs, attrs):
-        # Replace underscores with dashes in RPC name.
-        rpc_string = rpc_string.replace('_', '-')
+    for (index, (rpc_string, format, kwarg, attr, rpc)) in enumerate(
+            zip(rpc_strings, formats, kwargs, attrs, rpc_elements)):
         # Set initial result values. Assume failure until we know it's success.
         result = {'msg': '',
                   'rpc': rpc_string,
@@ -496,10 +607,10 @@ def main():
                   'failed': True}
 
         # Execute the RPC
+        error = None
         try:
             #for get-config in case of exception handling it will not display
             #filters and arguments. To be added in future.
-            rpc = junos_module.etree.Element(rpc_string, format=format)
             if rpc_string == 'get-config':
                 filter = junos_module.params.get('filter')
                 if attr is None:
@@ -511,58 +622,59 @@ def main():
                 junos_module.logger.debug('Executing "get-config" RPC. '
                                           'filter_xml=%s, options=%s, '
                                           'kwargs=%s',
-                                          filter, str(attr), str(kwarg))
+                                          filter, attr, kwarg)
                 # not adding ignore_warning as we don't expect to get rpc-error
                 # with severity warning during get_config
-                if junos_module.conn_type == "local":
+                if stream_output:
+                    (location, error) = junos_module.stream_rpc_output(
+                        rpc_string, format,
+                        reply_stream.get_configuration_rpc(attr, filter))
+                elif junos_module.conn_type == "local":
                     resp = junos_module.dev.rpc.get_config(filter_xml=filter,
                                                        options=attr, **kwarg)
                 else:
                     resp = junos_module.get_config(filter_xml=filter,
                                                        options=attr, **kwarg)
-                result['msg'] = 'The "get-config" RPC executed successfully.'
-                junos_module.logger.debug('The "get-config" RPC executed '
-                                          'successfully.')
             else:
-                if kwarg is not None:
-                    # Add kwarg
-                    for (key, value) in iteritems(kwarg):
-                        # Replace underscores with dashes in key name.
-                        key = key.replace('_', '-')
-                        sub_element = junos_module.etree.SubElement(rpc, key)
-                        if not isinstance(value, bool):
-                            sub_element.text = value
-                if attr is not None:
-                    # Add attr
-                    for (key, value) in iteritems(attr):
-                        # Replace underscores with dashes in key name.
-                        key = key.replace('_', '-')
-                        rpc.set(key, value)
                 junos_module.logger.debug('Executing RPC "%s".',
-                                          junos_module.etree.tostring(
-                                              rpc,
-                                              pretty_print=True))
-                if junos_module.conn_type == "local":
+                                          LazyFormat(junos_module.etree.tostring,
+                                                     rpc, pretty_print=True))
+                if stream_output:
+                    (location, error) = junos_module.stream_rpc_output(
+                        rpc_string, format, rpc,
+                        normalize=bool(format == 'xml'))
+                elif index in batch_responses:
+                    (resp, error) = batch_responses[index]
+                else:
                     resp = junos_module.dev.rpc(rpc,
                                        normalize=bool(format == 'xml'))
-                else:
-                    resp = junos_module.get_rpc(rpc,
-                                       ignore_warning=ignore_warning, format=format)
-                result['msg'] = 'The RPC executed successfully.'
-                junos_module.logger.debug('RPC "%s" executed successfully.',
-                                          junos_module.etree.tostring(
-                                              rpc,
-                                              pretty_print=True))
         except (junos_module.pyez_exception.ConnectError,
                 junos_module.pyez_exception.RpcError) as ex:
+            error = str(ex)
+        if error is not None:
             junos_module.logger.debug('Unable to execute RPC "%s". Error: %s',
-                                      junos_module.etree.tostring(
-                                          rpc,
-                                          pretty_print=True), str(ex))
+                                      LazyFormat(junos_module.etree.tostring,
+                                                 rpc, pretty_print=True),
+                                      error)
             result['msg'] = 'Unable to execute the RPC: %s. Error: %s' % \
                             (junos_module.etree.tostring(rpc,
                                                          pretty_print=True),
-                             str(ex))
+                             error)
+            results.append(result)
+            continue
+        if rpc_string == 'get-config':
+            result['msg'] = 'The "get-config" RPC executed successfully.'
+            junos_module.logger.debug('The "get-config" RPC executed '
+                                      'successfully.')
+        else:
+            result['msg'] = 'The RPC executed successfully.'
+            junos_module.logger.debug('RPC "%s" executed successfully.',
+                                      LazyFormat(junos_module.etree.tostring,
+                                                 rpc, pretty_print=True))
+        if stream_output:
+            if junos_module.params['return_output'] is True:
+                result.update(junos_module.output_keys(None, None, location))
+            result['failed'] = False
             results.append(result)
             continue
 
@@ -578,7 +690,7 @@ def main():
             elif format == 'xml':
                 text_output = junos_module.etree.tostring(resp,
                                                           pretty_print=True)
-                parsed_output = junos_module.jxmlease.parse_etree(resp)
+                parsed_output = junos_module.parse_xml(resp)
                 junos_module.logger.debug('XML output set.')
             elif format == 'json':
                 text_output = str(resp)
@@ -596,15 +708,12 @@ def main():
                                       type(resp))
             continue
 
+        # Save the output
+        location = junos_module.save_text_output(rpc_string, format, text_output)
         # Set the output keys
         if junos_module.params['return_output'] is True:
-            if text_output is not None:
-                result['stdout'] = text_output
-                result['stdout_lines'] = text_output.splitlines()
-            if parsed_output is not None:
-                result['parsed_output'] = parsed_output
-        # Save the output
-        junos_module.save_text_output(rpc_string, format, text_output)
+            result.update(junos_module.output_keys(text_output, parsed_output,
+                                                   location))
         # This command succeeded.
         result['failed'] = False
         # Append to the list of results
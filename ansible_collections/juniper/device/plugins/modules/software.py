@@ -704,7 +704,7 @@ def main():
             install_params.update(kwargs)
 
         junos_module.logger.debug("Install parameters are: %s",
-                                  str(install_params))
+                                  install_params)
         if junos_module.conn_type != "local":
             try:
                 results['msg'] = junos_module._pyez_conn.software_api(install_params)
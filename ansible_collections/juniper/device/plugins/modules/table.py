@@ -277,9 +277,6 @@ resource:
 # Standard library imports
 import os.path
 
-# Constants
-RESPONSE_CHOICES = ['list_of_dicts', 'juniper_items']
-
 
 """From Ansible 2.1, Ansible uses Ansiballz framework for assembling modules
 But custom module_utils directory is supported from Ansible 2.3
@@ -287,48 +284,13 @@ Reference for the issue: https://groups.google.com/forum/#!topic/ansible-project
 
 # Ansiballz packages module_utils into ansible.module_utils
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.connection import ConnectionError
 from ansible_collections.juniper.device.plugins.module_utils import juniper_junos_common
 from ansible_collections.juniper.device.plugins.module_utils import configuration as cfg
+from ansible_collections.juniper.device.plugins.module_utils import tables
 
-def expand_items(module, data):
-    """Recursively expand any table items
-    """
-    resources = []
-    # data.items() is a list of tuples
-    for table_key, table_fields in data.items():
-        # sample:
-        # ('fxp0', [('neighbor_interface', '1'), ('local_interface', 'fxp0'),
-        # ('neighbor', 'vmx2')]
-        # table_key - element 0 is the key from the Table - not using at all
-        # table_fields - element 1 is also a list of tuples
-        temp = []
-        for key, value in table_fields:
-            # calling it normalized value because YOU/WE created the keys
-            if value and isinstance(value, module.pyez_factory_table.Table):
-                value = expand_items(module, value)
-            temp.append((key, value))
-        resources.append((table_key, temp))
-    return resources
-
-
-def juniper_items_to_list_of_dicts(module, data):
-    """Recursively convert Juniper PyEZ Table/View items to list of dicts.
-    """
-    resources = []
-    # data.items() is a list of tuples
-    for table_key, table_fields in data.items():
-        # sample:
-        # ('fxp0', [('neighbor_interface', '1'), ('local_interface', 'fxp0'),
-        # ('neighbor', 'vmx2')]
-        # table_key - element 0 is the key from the Table - not using at all
-        # table_fields - element 1 is also a list of tuples
-        temp = {}
-        for key, value in table_fields:
-            if isinstance(value, module.pyez_factory_table.Table):
-                value = juniper_items_to_list_of_dicts(module, value)
-            temp[key] = value
-        resources.append(temp)
-    return resources
+# Constants
+RESPONSE_CHOICES = tables.RESPONSE_CHOICES
 
 
 def main():
@@ -420,28 +382,34 @@ def main():
     junos_module.logger.debug("Table: %s", table)
 
     try:
-        loader = \
-            junos_module.pyez_factory_loader.FactoryLoader().load(table_view)
+        loader = tables.load_tables(table_view)
         junos_module.logger.debug("Loader created successfully.")
     except Exception as ex:
         junos_module.fail_json(msg='Unable to create a table loader from the '
                                    '%s file. Error: %s' % (file_name, str(ex)))
+    data = None
+    resource = None
     try:
-        # there is a limitation of JSON for persistent connection.
-        # the connection passes information as JSON and can't use device object here.
-        # closing the persistent connection and creating a normal connection.
         if junos_module.conn_type != "local":
-            junos_module._pyez_conn.close()
-            junos_module.open()
-
-        data = loader[table](junos_module.dev)
-        junos_module.logger.debug("Table %s created successfully.", table)
-        if kwargs is None:
-            data.get()
+            # A PyEZ Device can't be passed over the persistent connection, so
+            # the connection retrieves and converts the table itself.
+            table_data = junos_module.get_table(table_view, table, kwargs,
+                                                response_type)
+            len_data = table_data['length']
+            resource = table_data['resource']
+            junos_module.logger.debug('Successfully retrieved %d items from '
+                                      '%s.', len_data, table)
+            results['msg'] = 'Successfully retrieved %d items from %s.' % \
+                             (len_data, table)
         else:
-            data.get(**kwargs)
-        junos_module.logger.debug("Data retrieved from %s successfully.",
-                                  table)
+            data = loader[table](junos_module.dev)
+            junos_module.logger.debug("Table %s created successfully.", table)
+            if kwargs is None:
+                data.get()
+            else:
+                data.get(**kwargs)
+            junos_module.logger.debug("Data retrieved from %s successfully.",
+                                      table)
     except KeyError:
         junos_module.fail_json(msg='Unable to find table %s in the '
                                    '%s file.' % (table, file_name))
@@ -449,6 +417,9 @@ def main():
             junos_module.pyez_exception.RpcError) as ex:
         junos_module.fail_json(msg='Unable to retrieve data from table %s. '
                                    'Error: %s' % (table, str(ex)))
+    except ConnectionError as ex:
+        # The connection already describes the failure.
+        junos_module.fail_json(msg=str(ex))
 
     if data is not None:
         try:
@@ -461,11 +432,9 @@ def main():
         results['msg'] = 'Successfully retrieved %d items from %s.' % \
                          (len_data, table)
 
-    if response_type == 'list_of_dicts':
-        junos_module.logger.debug('Converting data to list of dicts.')
-        resource = juniper_items_to_list_of_dicts(junos_module, data)
-    else:
-        resource = expand_items(junos_module, data)
+        if response_type == 'list_of_dicts':
+            junos_module.logger.debug('Converting data to list of dicts.')
+        resource = tables.convert_items(data, response_type)
 
     # If we made it this far, everything was successful.
     results['failed'] = False
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import threading
+import time
+
+import pytest
+from ansible.module_utils.connection import Connection, ConnectionError
+
+from ansible_collections.juniper.device.plugins.action.connection_hub import (
+    ConnectionHub,
+    serve,
+)
+from ansible_collections.juniper.device.plugins.module_utils.juniper_junos_common import (
+    HubConnection,
+)
+
+
+class FakeConnection(object):
+    """A Connection which may hold a pending deferred load."""
+
+    def __init__(self, device):
+        self.device = device
+        self.deferred = False
+        self.closed = False
+
+    def defer(self):
+        self.deferred = True
+
+    def flush(self):
+        self.deferred = False
+
+    def get_host(self, suffix):
+        return self.device['host'] + suffix
+
+    def has_pending_state(self):
+        return self.deferred
+
+    def close(self):
+        self.closed = True
+
+
+def make_hub(max_sessions=8, idle_timeout=300):
+    connections = []
+
+    def connect(device):
+        connections.append(FakeConnection(device))
+        return connections[-1]
+
+    return (ConnectionHub(max_sessions, idle_timeout, connect=connect),
+            connections)
+
+
+def test_one_session_per_device():
+    (hub, connections) = make_hub()
+    hub.device_call({'host': 'r1'}, 'defer', [], {})
+    hub.device_call({'host': 'r1'}, 'flush', [], {})
+    hub.device_call({'host': 'r2'}, 'flush', [], {})
+    assert [c.device for c in connections] == [{'host': 'r1'},
+                                               {'host': 'r2'}]
+
+
+def test_private_methods_are_refused():
+    (hub, connections) = make_hub()
+    try:
+        hub.device_call({'host': 'r1'}, '_close', [], {})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('_close was called')
+    assert connections == []
+
+
+def test_evicts_least_recently_used():
+    (hub, connections) = make_hub(max_sessions=1)
+    hub.device_call({'host': 'r1'}, 'flush', [], {})
+    hub.device_call({'host': 'r2'}, 'flush', [], {})
+    assert connections[0].closed
+    assert not connections[1].closed
+
+
+def test_eviction_keeps_pending_deferred_load():
+    (hub, connections) = make_hub(max_sessions=1)
+    hub.device_call({'host': 'r1'}, 'defer', [], {})
+    hub.device_call({'host': 'r2'}, 'flush', [], {})
+    hub.device_call({'host': 'r3'}, 'flush', [], {})
+    assert not connections[0].closed
+    assert connections[0].deferred
+    # The next call for r1 still finds its pending load.
+    hub.device_call({'host': 'r1'}, 'flush', [], {})
+    assert len(connections) == 3
+    assert not connections[0].deferred
+
+
+def test_expire_keeps_pending_deferred_load():
+    (hub, connections) = make_hub(idle_timeout=0)
+    hub.device_call({'host': 'r1'}, 'defer', [], {})
+    hub.device_call({'host': 'r2'}, 'flush', [], {})
+    assert hub.expire() == 1
+    assert not connections[0].closed
+    assert connections[1].closed
+    hub.device_call({'host': 'r1'}, 'flush', [], {})
+    assert hub.expire() == 0
+    assert connections[0].closed
+
+
+def test_close_closes_all_sessions():
+    (hub, connections) = make_hub()
+    hub.device_call({'host': 'r1'}, 'defer', [], {})
+    hub.close()
+    assert connections[0].closed
+
+
+def test_serve_until_idle(tmp_path):
+    (hub, connections) = make_hub(idle_timeout=1)
+    socket_path = str(tmp_path / 'hub.sock')
+    server = threading.Thread(target=serve, args=(socket_path, hub))
+    server.daemon = True
+    server.start()
+    deadline = time.time() + 10
+    while not os.path.exists(socket_path) and time.time() < deadline:
+        time.sleep(0.01)
+    connection = HubConnection(socket_path, {'host': 'r1'})
+    assert connection.get_host('.lab') == 'r1.lab'
+    # Only device_call() is served, not the methods of the hub itself.
+    for method in ('close', 'expire'):
+        with pytest.raises(ConnectionError, match='not found'):
+            getattr(Connection(socket_path), method)()
+    assert not connections[0].closed
+    # The hub closes the idle session, then exits.
+    server.join(10)
+    assert not server.is_alive()
+    assert connections[0].closed
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import types
+
+import ansible.module_utils.basic
+from ansible.module_utils.basic import AnsibleModule
+
+from ansible_collections.juniper.device.plugins.action.in_process import (
+    IN_PROCESS_ENV,
+    IN_PROCESS_VAR,
+    InProcess,
+)
+
+
+def echo_main():
+    module = AnsibleModule(argument_spec={'name': dict(type='str')})
+    if module.params['name'] == 'fail':
+        module.fail_json(msg='failed on request')
+    if module.params['name'] == 'raise':
+        raise RuntimeError('uncaught')
+    module.exit_json(changed=False, name=module.params['name'])
+
+
+ECHO_MODULE = types.SimpleNamespace(main=echo_main)
+
+
+def test_run_in_process_exit():
+    saved = ansible.module_utils.basic._ANSIBLE_ARGS
+    res = InProcess()._run_in_process(ECHO_MODULE, {'name': 'r1'})
+    assert res['rc'] == 0
+    assert json.loads(res['stdout'])['name'] == 'r1'
+    assert ansible.module_utils.basic._ANSIBLE_ARGS is saved
+
+
+def test_run_in_process_failures():
+    res = InProcess()._run_in_process(ECHO_MODULE, {'name': 'fail'})
+    assert res['rc'] == 1
+    assert json.loads(res['stdout'])['msg'] == 'failed on request'
+    res = InProcess()._run_in_process(ECHO_MODULE, {'name': 'raise'})
+    assert res['rc'] == 1
+    assert 'RuntimeError: uncaught' in res['stderr']
+
+
+def make_action(transport='local', become=False, environment=None):
+    action = InProcess()
+    action._connection = types.SimpleNamespace(transport=transport)
+    action._task = types.SimpleNamespace(become=become,
+                                         environment=environment)
+    return action
+
+
+def test_in_process_enabled(monkeypatch):
+    monkeypatch.delenv(IN_PROCESS_ENV, raising=False)
+    assert not make_action()._in_process_enabled({})
+    assert make_action()._in_process_enabled({IN_PROCESS_VAR: 'yes'})
+    assert make_action('juniper.device.pyez')._in_process_enabled(
+        {IN_PROCESS_VAR: True})
+    monkeypatch.setenv(IN_PROCESS_ENV, '1')
+    assert make_action()._in_process_enabled({})
+    assert not make_action()._in_process_enabled({IN_PROCESS_VAR: False})
+
+
+def test_in_process_disabled_for_other_tasks():
+    task_vars = {IN_PROCESS_VAR: True}
+    assert not make_action('ssh')._in_process_enabled(task_vars)
+    assert not make_action(become=True)._in_process_enabled(task_vars)
+    assert not make_action(environment=[{'A': '1'}])._in_process_enabled(
+        task_vars)
@@ -0,0 +1,598 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('ansible_collections.ansible.netcommon')
+
+import jnpr.junos.op
+import yaml
+from ansible.errors import AnsibleError
+from ansible.playbook.play_context import PlayContext
+from jnpr.junos import exception as pyez_exception
+from lxml import etree
+from ncclient.transport.errors import TransportError
+
+from ansible_collections.juniper.device.plugins.connection import pyez
+from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+from ansible_collections.juniper.device.plugins.module_utils import tables
+
+
+class FakeDevice(object):
+    """A PyEZ Device answering each rpc with <reply> naming the rpc."""
+
+    def __init__(self, hostname='r1'):
+        self.hostname = hostname
+        self.connected = True
+        self.timeout = 30
+        self.calls = []
+
+    def rpc(self, rpc_etree, normalize=False, ignore_warning=False):
+        self.calls.append(rpc_etree.tag)
+        if rpc_etree.tag == 'get-error':
+            raise pyez_exception.RpcError(cmd=rpc_etree)
+        reply = etree.Element('reply')
+        reply.text = '%s %d' % (rpc_etree.tag, len(self.calls))
+        return reply
+
+    def close(self):
+        self.connected = False
+
+
+def make_connection(**options):
+    """Return a connection, with the documented defaults, on a FakeDevice."""
+    conn = pyez.Connection(PlayContext(), None)
+    for (name, spec) in yaml.safe_load(pyez.DOCUMENTATION)['options'].items():
+        conn._options[name] = spec.get('default')
+    conn._options.update(options)
+    conn.dev = FakeDevice()
+    return conn
+
+
+def rpc_request(tag, format='xml'):
+    return {'rpc': rpc_codec.encode_rpc(etree.Element(tag)),
+            'format': format, 'ignore_warning': False}
+
+
+def reply_text(result):
+    return rpc_codec.decode_reply(result['response'], 'xml').text
+
+
+def test_rpc_batch_keeps_order_and_failures():
+    conn = make_connection()
+    results = conn.get_rpc_batch([rpc_request('get-a'),
+                                  rpc_request('get-error'),
+                                  rpc_request('get-b')])
+    assert [result['failed'] for result in results] == [False, True, False]
+    assert reply_text(results[0]) == 'get-a 1'
+    assert reply_text(results[2]) == 'get-b 3'
+    assert conn.dev.calls == ['get-a', 'get-error', 'get-b']
+
+
+def test_rpc_cache_hit_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pyez.time, 'time', lambda: now[0])
+    conn = make_connection(pyez_rpc_cache_size=8,
+                           pyez_rpc_cache_ttl={'get-a': 10})
+    results = conn.get_rpc_batch([rpc_request('get-a'), rpc_request('get-a'),
+                                  rpc_request('get-b')])
+    assert [result['cache'] for result in results] == ['miss', 'miss', None]
+    (result,) = conn.get_rpc_batch([rpc_request('get-a')])
+    assert result['cache'] == 'hit'
+    assert reply_text(result) == 'get-a 2'
+    now[0] += 10
+    (result,) = conn.get_rpc_batch([rpc_request('get-a')])
+    assert result['cache'] == 'miss'
+    assert conn.dev.calls == ['get-a', 'get-a', 'get-b', 'get-a']
+
+
+def test_rpc_cache_evicts_least_recently_used():
+    conn = make_connection(pyez_rpc_cache_size=2,
+                           pyez_rpc_cache_ttl={'get-a': 60, 'get-b': 60,
+                                               'get-c': 60})
+    conn.get_rpc_batch([rpc_request('get-a'), rpc_request('get-b')])
+    # get-a becomes the most recently used, so get-c evicts get-b.
+    conn.get_rpc_batch([rpc_request('get-a'), rpc_request('get-c')])
+    results = conn.get_rpc_batch([rpc_request('get-a'), rpc_request('get-b')])
+    assert [result['cache'] for result in results] == ['hit', 'miss']
+
+
+def test_rpc_cache_key_includes_format():
+    conn = make_connection(pyez_rpc_cache_size=8,
+                           pyez_rpc_cache_ttl={'get-a': 60})
+    conn.get_rpc_batch([rpc_request('get-a')])
+    (result,) = conn.get_rpc_batch([rpc_request('get-a', format='text')])
+    assert result['cache'] == 'miss'
+
+
+def test_clear_rpc_cache():
+    conn = make_connection(pyez_rpc_cache_size=8,
+                           pyez_rpc_cache_ttl={'get-a': 60})
+    conn.get_rpc_batch([rpc_request('get-a')])
+    conn.clear_rpc_cache()
+    (result,) = conn.get_rpc_batch([rpc_request('get-a')])
+    assert result['cache'] == 'miss'
+
+
+def test_large_replies_are_written_to_files():
+    conn = make_connection(pyez_reply_file_threshold=10)
+    (result,) = conn.get_rpc_batch([rpc_request('get-a')])
+    assert rpc_codec.is_reply_file(result['response'])
+    path = result['response'][rpc_codec.REPLY_FILE_KEY]
+    assert conn._reply_files == [path]
+    assert reply_text(result) == 'get-a 1'
+    # close() removes the files which the module didn't read.
+    (result,) = conn.get_rpc_batch([rpc_request('get-b')])
+    path = result['response'][rpc_codec.REPLY_FILE_KEY]
+    conn.close()
+    assert not os.path.exists(path)
+
+
+ROUTE_REPLY = '''<route-information>
+<route-table>
+<table-name>inet.0</table-name>
+<rt>
+<rt-destination>10.0.0.0/24</rt-destination>
+<rt-entry>
+<protocol-name>Direct</protocol-name>
+<age seconds="60">1:00</age>
+<nh><via>ge-0/0/0.0</via></nh>
+</rt-entry>
+</rt>
+</route-table>
+</route-information>'''
+
+
+class TableDevice(FakeDevice):
+    """A FakeDevice answering the rpc of a table with reply."""
+
+    _use_filter = False
+
+    def __init__(self, reply):
+        super(TableDevice, self).__init__()
+        self.rpc = self
+        self.reply = reply
+        self.transform = None
+
+    def __getattr__(self, name):
+        return lambda **rpc_args: etree.fromstring(self.reply)
+
+
+def test_get_table_after_the_module_loaded_the_definitions():
+    path = os.path.join(os.path.dirname(jnpr.junos.op.__file__), 'routes.yml')
+    with open(path) as table_file:
+        table_view = yaml.safe_load(table_file)
+    # The table module validates the definitions before sending them.
+    tables.load_tables(table_view)
+    conn = make_connection()
+    conn.dev = TableDevice(ROUTE_REPLY)
+    conn.queue_message = lambda level, msg: None
+    result = conn.get_table(table_view, 'RouteTable')
+    assert result == {'length': 1, 'resource': [
+        {'protocol': 'Direct', 'via': 'ge-0/0/0.0', 'age': 60,
+         'nexthop': None}]}
+
+
+class FakeRpcObject(object):
+    """The ncclient rpc object of an asynchronous rpc, never answered."""
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.event = threading.Event()
+
+
+class FakeManager(object):
+    """The ncclient Manager of a FakeDevice."""
+
+    def __init__(self, log):
+        self.async_mode = False
+        self.log = log
+
+    def rpc(self, rpc_etree):
+        assert self.async_mode
+        if rpc_etree.tag == 'get-closed':
+            raise TransportError('Not connected')
+        self.log.append(('send', rpc_etree.tag))
+        return FakeRpcObject(rpc_etree.tag)
+
+
+def make_pipelined_connection(log):
+    conn = make_connection(pyez_rpc_pipeline=True)
+    conn.dev._conn = FakeManager(log)
+
+    def pipelined_reply(dev, rpc_etree, rpc_obj, ignore_warning, format):
+        log.append(('wait', rpc_obj.tag))
+        if rpc_obj.tag == 'get-error':
+            raise pyez_exception.RpcError(cmd=rpc_etree)
+        reply = etree.Element('reply')
+        reply.text = rpc_obj.tag
+        return reply
+
+    conn._pipelined_reply = pipelined_reply
+    return conn
+
+
+def test_pipeline_sends_every_rpc_before_waiting():
+    log = []
+    conn = make_pipelined_connection(log)
+    results = conn.get_rpc_batch([rpc_request('get-a'),
+                                  rpc_request('get-error'),
+                                  rpc_request('get-closed'),
+                                  rpc_request('get-b')])
+    assert log == [('send', 'get-a'), ('send', 'get-error'),
+                   ('send', 'get-b'), ('wait', 'get-a'),
+                   ('wait', 'get-error'), ('wait', 'get-b')]
+    assert [result['failed'] for result in results] == [False, True, True,
+                                                        False]
+    assert reply_text(results[3]) == 'get-b'
+    assert conn.dev._conn.async_mode is False
+    assert conn.dev.calls == []
+
+
+def test_pipeline_on_closed_session():
+    log = []
+    conn = make_pipelined_connection(log)
+    conn.dev.connected = False
+    results = conn.get_rpc_batch([rpc_request('get-a'),
+                                  rpc_request('get-b')])
+    assert [result['failed'] for result in results] == [True, True]
+    assert results[0]['msg'] == 'ConnectClosedError(r1)'
+    assert log == []
+
+
+def test_pipelined_reply_timeout():
+    conn = make_connection()
+    conn.dev.timeout = 0.01
+    conn.dev._nc_transform = None
+    rpc_etree = etree.Element('get-a')
+    with pytest.raises(pyez_exception.RpcTimeoutError):
+        conn._pipelined_reply(conn.dev, rpc_etree, FakeRpcObject('get-a'),
+                              False, 'text')
+
+
+def make_pooled_connection(size):
+    conn = make_connection(pyez_session_pool_size=size)
+    conn.opened = []
+
+    def open_device():
+        conn.opened.append(FakeDevice('r1-%d' % (len(conn.opened) + 1)))
+        return conn.opened[-1]
+
+    conn._open_device = open_device
+    return conn
+
+
+def test_session_pool_spreads_read_only_rpcs():
+    conn = make_pooled_connection(3)
+    tags = ['get-%d' % index for index in range(7)]
+    results = conn.get_rpc_batch([rpc_request(tag) for tag in tags])
+    assert len(conn.opened) == 2
+    assert conn.dev.calls == ['get-0', 'get-3', 'get-6']
+    assert conn.opened[0].calls == ['get-1', 'get-4']
+    assert conn.opened[1].calls == ['get-2', 'get-5']
+    assert [reply_text(result).split()[0] for result in results] == tags
+
+
+def test_session_pool_keeps_other_rpcs_on_main_session():
+    conn = make_pooled_connection(3)
+    conn.get_rpc_batch([rpc_request('get-a'), rpc_request('load-b')])
+    assert conn.opened == []
+    assert conn.dev.calls == ['get-a', 'load-b']
+
+
+def test_session_pool_reopens_closed_sessions():
+    conn = make_pooled_connection(2)
+    conn.get_rpc_batch([rpc_request('get-a'), rpc_request('get-b')])
+    conn.opened[0].connected = False
+    conn.get_rpc_batch([rpc_request('get-a'), rpc_request('get-b')])
+    assert len(conn.opened) == 2
+    assert conn.opened[1].calls == ['get-b']
+    pool = list(conn.opened)
+    conn.close()
+    assert not any(dev.connected for dev in pool)
+    assert conn._session_pool == []
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        pass
+
+
+class FakeSCP(object):
+    """The PyEZ SCP context manager, with a client failing on demand."""
+
+    opened = []
+    failures = []
+
+    def __init__(self, dev, progress=False):
+        self.transport = FakeTransport()
+        self.transfers = []
+
+    def __enter__(self):
+        FakeSCP.opened.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.transport.active = False
+
+    def put(self, local_file, remote_file):
+        if FakeSCP.failures:
+            raise FakeSCP.failures.pop(0)
+        self.transfers.append(('put', local_file, remote_file))
+
+
+@pytest.fixture
+def fake_scp(monkeypatch):
+    monkeypatch.setattr(pyez, 'SCP', FakeSCP)
+    FakeSCP.opened = []
+    FakeSCP.failures = []
+    return FakeSCP
+
+
+def test_scp_transport_is_reused(fake_scp):
+    conn = make_connection()
+    conn.scp_file_copy_put('a.tgz', '/var/tmp/a.tgz')
+    conn.scp_file_copy_put('b.tgz', '/var/tmp/b.tgz')
+    assert len(fake_scp.opened) == 1
+    assert len(fake_scp.opened[0].transfers) == 2
+    conn.close()
+    assert not fake_scp.opened[0].transport.active
+
+
+def test_scp_retries_once_on_transport_error(fake_scp):
+    conn = make_connection()
+    fake_scp.failures = [pyez.SCPException('channel closed')]
+    conn.scp_file_copy_put('a.tgz', '/var/tmp/a.tgz')
+    assert len(fake_scp.opened) == 2
+    assert not fake_scp.opened[0].transport.active
+    assert fake_scp.opened[1].transfers == [('put', 'a.tgz',
+                                             '/var/tmp/a.tgz')]
+    fake_scp.failures = [EOFError(), pyez.SSHException('reset')]
+    with pytest.raises(AnsibleError):
+        conn.scp_file_copy_put('a.tgz', '/var/tmp/a.tgz')
+    assert len(fake_scp.opened) == 3
+
+
+def test_scp_fails_at_once_on_local_file_error(fake_scp):
+    conn = make_connection()
+    fake_scp.failures = [FileNotFoundError(2, 'No such file', 'a.tgz')]
+    with pytest.raises(AnsibleError, match='No such file'):
+        conn.scp_file_copy_put('a.tgz', '/var/tmp/a.tgz')
+    assert len(fake_scp.opened) == 1
+    assert fake_scp.opened[0].transport.active
+
+
+class FakeConfig(object):
+    """A PyEZ Config recording the configuration calls in dev.log."""
+
+    def __init__(self, dev, mode=None):
+        self.dev = dev
+        self.mode = mode
+        dev.log = getattr(dev, 'log', [])
+
+    def lock(self):
+        self.dev.log.append('lock')
+
+    def unlock(self):
+        self.dev.log.append('unlock')
+
+    def load(self, config, **load_args):
+        if 'bad' in config:
+            raise pyez_exception.ConfigLoadError(cmd=None, rsp=etree.fromstring(
+                '<rpc-error><error-message>syntax error</error-message>'
+                '</rpc-error>'))
+        self.dev.log.append(('load', config))
+
+    def commit_check(self):
+        self.dev.log.append('check')
+
+    def diff(self, rb_id=0, ignore_warning=False):
+        self.dev.log.append('diff')
+        return '+ loaded\n'
+
+    def commit(self, **commit_args):
+        self.dev.log.append('commit')
+
+    def rollback(self, rb_id=0):
+        self.dev.log.append('rollback')
+
+
+@pytest.fixture
+def deferred_conn(monkeypatch):
+    monkeypatch.setattr(pyez.jnpr.junos.utils.config, 'Config', FakeConfig)
+    return make_connection()
+
+
+def test_deferred_loads_share_one_commit(deferred_conn):
+    conn = deferred_conn
+    assert not conn.has_pending_state()
+    assert conn.deferred_load('set a', {}, 'exclusive')['loads'] == 1
+    assert conn.deferred_load('set b', {}, 'exclusive')['loads'] == 2
+    assert conn.has_pending_state()
+    result = conn.deferred_flush()
+    assert result == {'loads': 2, 'diff': '+ loaded\n', 'changed': True,
+                      'committed': True}
+    assert conn.dev.log == ['lock', ('load', 'set a'), ('load', 'set b'),
+                            'check', 'diff', 'commit', 'unlock']
+    assert not conn.has_pending_state()
+    assert conn.deferred_flush()['loads'] == 0
+
+
+def test_deferred_session_blocks_other_config_use(deferred_conn):
+    conn = deferred_conn
+    conn.deferred_load('set a', {}, 'exclusive')
+    with pytest.raises(AnsibleError, match='1 pending loads'):
+        conn.open_configuration('exclusive')
+    with pytest.raises(AnsibleError, match='exclusive mode, not in private'):
+        conn.deferred_load('set b', {}, 'private')
+
+
+def test_failed_deferred_load_discards_the_session(deferred_conn):
+    conn = deferred_conn
+    conn.deferred_load('set a', {}, 'exclusive')
+    with pytest.raises(AnsibleError, match='syntax error'):
+        conn.deferred_load('bad', {}, 'exclusive')
+    assert conn.dev.log[-2:] == ['rollback', 'unlock']
+    assert not conn.has_pending_state()
+
+
+@pytest.mark.parametrize('commit_on_close', [False, True])
+def test_pending_loads_on_close(deferred_conn, commit_on_close):
+    conn = deferred_conn
+    conn._options['pyez_deferred_commit_on_close'] = commit_on_close
+    conn.deferred_load('set a', {}, 'exclusive')
+    dev = conn.dev
+    conn.close()
+    if commit_on_close:
+        assert 'commit' in dev.log
+    else:
+        assert 'commit' not in dev.log
+        assert 'rollback' in dev.log
+    assert dev.log[-1] == 'unlock'
+
+
+class FakeEphemeralSession(object):
+    """An EphemeralSession recording its calls in dev.log."""
+
+    def __init__(self, dev, instance=None, ignore_warning=None,
+                 close_device=False):
+        self.dev = dev
+        self.close_device = close_device
+        dev.log = []
+
+    def open(self):
+        self.dev.log.append('open')
+
+    def load(self, content, format, action):
+        self.dev.log.append(('load', content))
+
+    def commit(self):
+        self.dev.log.append('commit')
+
+    def close(self):
+        self.dev.log.append('close')
+
+    def shutdown(self):
+        self.dev.log.append('shutdown')
+        if self.close_device:
+            self.dev.close()
+
+
+@pytest.fixture
+def ephemeral_conn(monkeypatch):
+    monkeypatch.setattr(pyez.ephemeral_engine, 'EphemeralSession',
+                        FakeEphemeralSession)
+    conn = make_connection(persistent_command_timeout=5)
+    conn.opened = []
+
+    def open_device():
+        conn.opened.append(FakeDevice('r1-ephemeral'))
+        return conn.opened[-1]
+
+    conn._open_device = open_device
+    return conn
+
+
+def test_ephemeral_engine_per_instance(ephemeral_conn):
+    conn = ephemeral_conn
+    result = conn.ephemeral_submit([['set a', 'set', 'merge']],
+                                   instance='i1', window=0, wait=True)
+    assert result == {'queued': 1, 'errors': []}
+    assert conn.has_pending_state()
+    conn.ephemeral_submit([['set b', 'set', 'merge']], instance='i1',
+                          window=0)
+    result = conn.ephemeral_submit([], instance='i1', close=True)
+    assert result['stats']['updates'] == 2
+    (dev,) = conn.opened
+    assert dev.log == ['open', ('load', 'set a'), 'commit',
+                       ('load', 'set b'), 'commit', 'shutdown']
+    assert not dev.connected
+    assert not conn.has_pending_state()
+
+
+def test_ephemeral_engines_are_closed_with_the_connection(ephemeral_conn):
+    conn = ephemeral_conn
+    conn.ephemeral_submit([['set a', 'set', 'merge']], instance='i1')
+    conn.ephemeral_submit([['set b', 'set', 'merge']], instance='i2')
+    conn.close()
+    assert len(conn.opened) == 2
+    for dev in conn.opened:
+        assert dev.log[-2:] == ['commit', 'shutdown']
+        assert not dev.connected
+
+
+class TimeoutDevice(FakeDevice):
+    """A FakeDevice whose rpcs time out for the listed rpc calls."""
+
+    def __init__(self, timeouts):
+        super(TimeoutDevice, self).__init__()
+        self.timeouts = timeouts
+
+    def rpc(self, rpc_etree, normalize=False, ignore_warning=False):
+        if len(self.calls) + 1 in self.timeouts:
+            self.calls.append(rpc_etree.tag)
+            raise pyez_exception.RpcTimeoutError(self, rpc_etree.tag, 30)
+        return super(TimeoutDevice, self).rpc(rpc_etree, normalize,
+                                              ignore_warning)
+
+
+def test_load_configuration_chunks_retries_timeouts():
+    conn = make_connection()
+    conn.dev = TimeoutDevice(timeouts=[2])
+    conn.queue_message = lambda level, msg: None
+    progress = conn.load_configuration_chunks(['set a', 'set b', 'set c'],
+                                              'set', 'merge', retries=1)
+    assert [item['attempts'] for item in progress] == [1, 2, 1]
+    assert conn.dev.calls == ['load-configuration'] * 4
+
+
+def test_load_configuration_chunks_failure():
+    conn = make_connection()
+    conn.dev = TimeoutDevice(timeouts=[2, 3])
+    conn.queue_message = lambda level, msg: None
+    with pytest.raises(AnsibleError, match='Chunk 2 of 3 failed'):
+        conn.load_configuration_chunks(['set a', 'set b', 'set c'],
+                                       'set', 'merge', retries=1)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    config_chunks,
+)
+
+SET_CONFIG = '''set interfaces ge-0/0/0 description one
+
+set interfaces ge-0/0/1 description two
+set interfaces ge-0/0/2 description three
+'''
+
+TEXT_CONFIG = '''policy-options {
+    prefix-list big {
+        10.0.0.0/24;
+        10.0.1.0/24;
+        10.0.2.0/24;
+        10.0.3.0/24;
+    }
+}
+system {
+    host-name r1;
+}
+'''
+
+
+def balanced(chunk):
+    return chunk.count('{') == chunk.count('}')
+
+
+def test_guess_format():
+    assert config_chunks.guess_format(SET_CONFIG) == 'set'
+    assert config_chunks.guess_format(TEXT_CONFIG) == 'text'
+    assert config_chunks.guess_format('<configuration/>') is None
+    assert config_chunks.guess_format('hello') is None
+
+
+def test_split_set_keeps_whole_lines():
+    chunks = config_chunks.split_set(SET_CONFIG, 80)
+    assert len(chunks) == 2
+    assert ''.join(chunks).splitlines() == [
+        line for line in SET_CONFIG.splitlines() if line]
+    assert all(chunk.endswith('\n') for chunk in chunks)
+
+
+def test_split_set_oversized_line():
+    chunks = config_chunks.split_set(SET_CONFIG, 10)
+    assert len(chunks) == 3
+
+
+def test_split_text_merge_reopens_hierarchies():
+    chunks = config_chunks.split_text(TEXT_CONFIG, 80)
+    assert len(chunks) > 2
+    assert all(balanced(chunk) for chunk in chunks)
+    reopened = [chunk for chunk in chunks[1:]
+                if chunk.startswith('policy-options {\nprefix-list big {\n')]
+    assert reopened
+    joined = ''.join(chunks)
+    for prefix in ('10.0.0.0/24;', '10.0.3.0/24;', 'host-name r1;'):
+        assert joined.count(prefix) == 1
+
+
+def test_split_text_replace_only_at_top_level():
+    chunks = config_chunks.split_text(TEXT_CONFIG, 80, max_depth=0)
+    assert len(chunks) == 2
+    assert chunks[0].startswith('policy-options {')
+    assert chunks[1].strip().startswith('system {')
+
+
+def test_split_text_fits_in_one_chunk():
+    chunks = config_chunks.split_text(TEXT_CONFIG, 10000)
+    assert chunks == [TEXT_CONFIG]
+
+
+def test_split_text_ignores_braces_in_strings_and_comments():
+    content = ('system {\n    /* { */\n    login {\n'
+               '        message "a } b";\n    }\n}\n')
+    chunks = config_chunks.split_text(content, 10000)
+    assert chunks == [content]
+
+
+def test_split_text_unclosed_hierarchy():
+    with pytest.raises(ValueError, match='1 unclosed'):
+        config_chunks.split_text('system {\n    host-name r1;\n', 100)
+
+
+def test_split_configuration():
+    assert (config_chunks.split_configuration(SET_CONFIG, None, 'set', 80) ==
+            config_chunks.split_set(SET_CONFIG, 80))
+    assert (config_chunks.split_configuration(TEXT_CONFIG, 'text',
+                                              'replace', 80) ==
+            config_chunks.split_text(TEXT_CONFIG, 80, max_depth=0))
+    with pytest.raises(ValueError, match='format'):
+        config_chunks.split_configuration(TEXT_CONFIG, None, 'merge', 80)
+    with pytest.raises(ValueError, match="can't be split"):
+        config_chunks.split_configuration('<configuration/>', 'xml',
+                                          'merge', 80)
+    with pytest.raises(ValueError, match="can't be split"):
+        config_chunks.split_configuration(TEXT_CONFIG, 'text',
+                                          'override', 80)
+
+
+@pytest.mark.parametrize('format, action, attributes, element', [
+    ('set', 'merge', {'action': 'set', 'format': 'text'},
+     'configuration-set'),
+    ('text', 'set', {'action': 'set', 'format': 'text'},
+     'configuration-set'),
+    ('text', 'merge', {'format': 'text'}, 'configuration-text'),
+    ('text', 'replace', {'action': 'replace', 'format': 'text'},
+     'configuration-text'),
+])
+def test_load_rpc(format, action, attributes, element):
+    assert config_chunks.load_attributes(format, action) == attributes
+    rpc = config_chunks.load_rpc('chunk', format, action)
+    assert rpc.tag == 'load-configuration'
+    assert dict(rpc.attrib) == attributes
+    assert rpc[0].tag == element
+    assert rpc[0].text == 'chunk'
+
+
+class FakeSend(object):
+    """Loads chunks, failing each index of failures once per listed time."""
+
+    def __init__(self, failures=None):
+        self.failures = list(failures or [])
+        self.calls = []
+
+    def __call__(self, indexes):
+        self.calls.append(list(indexes))
+        errors = []
+        for index in indexes:
+            if index in self.failures:
+                self.failures.remove(index)
+                errors.append(RuntimeError('timeout %d' % index))
+            else:
+                errors.append(None)
+        return errors
+
+
+def test_load_chunks_in_windows():
+    send = FakeSend()
+    progress = config_chunks.load_chunks(['a', 'bb', 'c', 'd', 'e'], send,
+                                         window=2)
+    assert send.calls == [[0, 1], [2, 3], [4]]
+    assert [item['chunk'] for item in progress] == [1, 2, 3, 4, 5]
+    assert progress[1]['bytes'] == 2
+    assert all(item['attempts'] == 1 for item in progress)
+    assert all(item['seconds'] is not None for item in progress)
+
+
+def test_load_chunks_goes_back_to_the_failed_chunk():
+    send = FakeSend(failures=[1])
+    messages = []
+    progress = config_chunks.load_chunks(
+        ['a', 'b', 'c', 'd'], send, window=3, retries=1,
+        retryable=lambda error: True, log=messages.append)
+    assert send.calls == [[0, 1, 2], [1, 2, 3]]
+    assert [item['attempts'] for item in progress] == [1, 2, 2, 1]
+    assert messages[0].startswith('Chunk 2 of 4 failed')
+    assert messages[-1] == 'Loaded 4 of 4 chunks.'
+
+
+def test_load_chunks_error_not_retryable():
+    send = FakeSend(failures=[1])
+    with pytest.raises(config_chunks.ChunkLoadError) as excinfo:
+        config_chunks.load_chunks(['a', 'b', 'c'], send, retries=3,
+                                  retryable=lambda error: False)
+    assert excinfo.value.chunk == 2
+    assert str(excinfo.value.error) == 'timeout 1'
+    assert excinfo.value.progress[0]['attempts'] == 1
+    assert str(excinfo.value).startswith('Chunk 2 of 3 failed (attempts: 1)')
+
+
+def test_load_chunks_retries_exhausted():
+    send = FakeSend(failures=[0, 0, 0])
+    with pytest.raises(config_chunks.ChunkLoadError) as excinfo:
+        config_chunks.load_chunks(['a', 'b'], send, retries=2,
+                                  retryable=lambda error: True)
+    assert excinfo.value.chunk == 1
+    assert excinfo.value.progress[0]['attempts'] == 3
+    assert send.calls == [[0], [0], [0]]
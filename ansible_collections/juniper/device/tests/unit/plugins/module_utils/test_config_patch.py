@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    config_patch,
+)
+
+COMMITTED = '''## Last commit: 2026-10-17 10:00:00 UTC by admin
+version 21.4R1;
+system {
+    host-name r1;
+    /* the servers */
+    ntp {
+        server 10.0.0.1;
+    }
+}
+interfaces {
+    ge-0/0/0 {
+        description "uplink";
+    }
+    ge-0/0/1 {
+        description old;
+    }
+}
+firewall {
+    filter f1 {
+        term a {
+            then accept;
+        }
+        term b {
+            then discard;
+        }
+    }
+}
+snmp {
+    community public;
+}
+'''
+
+
+def test_parse():
+    root = config_patch.parse(COMMITTED)
+    assert root.statements == [('version 21.4R1', 'version 21.4R1')]
+    assert root.order == ['system', 'interfaces', 'firewall', 'snmp']
+    interfaces = root.children['interfaces']
+    assert interfaces.children['ge-0/0/0'].statements == [
+        ('description uplink', 'description "uplink"')]
+
+
+def test_parse_tags_and_empty_hierarchies():
+    root = config_patch.parse('inactive: system {\n    services {\n    }\n}\n')
+    system = root.children['system']
+    assert system.key == 'system'
+    assert system.tags == ['inactive:']
+    assert system.statements == [('services', 'services')]
+    assert system.children == {}
+
+
+@pytest.mark.parametrize('content', ['system {\n', 'system }\n',
+                                     'system { host-name r1'])
+def test_parse_unbalanced(content):
+    with pytest.raises(ValueError):
+        config_patch.parse(content)
+
+
+def test_same_configuration():
+    desired = COMMITTED.replace('/* the servers */', '')
+    assert config_patch.minimal_patch(COMMITTED, desired) == (
+        '', {'added': 0, 'deleted': 0, 'replaced': 0, 'statements': 0})
+
+
+def test_minimal_patch():
+    desired = (COMMITTED.replace('description old;', 'description new;')
+               .replace('snmp {\n    community public;\n}\n',
+                        'routing-options {\n    autonomous-system 65000;\n}\n')
+               .replace('version 21.4R1;', 'version 22.1R1;'))
+    (patch, counts) = config_patch.minimal_patch(COMMITTED, desired)
+    assert patch == '''replace: version 22.1R1;
+delete: snmp;
+interfaces {
+    replace: ge-0/0/1 {
+        description new;
+    }
+}
+routing-options {
+    autonomous-system 65000;
+}
+'''
+    assert counts == {'added': 1, 'deleted': 1, 'replaced': 1,
+                      'statements': 1}
+
+
+def test_reordered_hierarchies_are_replaced():
+    desired = COMMITTED.replace(
+        '''        term a {
+            then accept;
+        }
+        term b {
+            then discard;
+        }''', '''        term b {
+            then discard;
+        }
+        term a {
+            then accept;
+        }''')
+    (patch, counts) = config_patch.minimal_patch(COMMITTED, desired)
+    assert patch.startswith('firewall {\n    replace: filter f1 {\n'
+                            '        term b {')
+    assert counts['replaced'] == 1
+
+
+def test_tagged_hierarchy_is_deleted_and_added():
+    desired = COMMITTED.replace('snmp {', 'inactive: snmp {')
+    (patch, counts) = config_patch.minimal_patch(COMMITTED, desired)
+    assert patch == ('delete: snmp;\ninactive: snmp {\n'
+                     '    community public;\n}\n')
+    assert counts == {'added': 1, 'deleted': 1, 'replaced': 0,
+                      'statements': 0}
+
+
+def test_leaf_list_is_replaced():
+    committed = 'apply-groups [ a b ];\n' + COMMITTED
+    desired = 'apply-groups [ a c ];\n' + COMMITTED
+    (patch, counts) = config_patch.minimal_patch(committed, desired)
+    assert patch == 'replace: apply-groups [ a c ];\n'
+    assert counts['statements'] == 1
+
+
+def test_added_top_level_statement():
+    desired = 'apply-groups base;\n' + COMMITTED
+    (patch, counts) = config_patch.minimal_patch(COMMITTED, desired)
+    assert patch == 'apply-groups base;\n'
+    assert counts['statements'] == 1
+
+
+def test_tagged_top_level_statement_is_deleted_and_added():
+    desired = COMMITTED.replace('version 21.4R1;', 'inactive: version 21.4R1;')
+    (patch, counts) = config_patch.minimal_patch(COMMITTED, desired)
+    assert patch == 'delete: version;\ninactive: version 21.4R1;\n'
+    assert counts['statements'] == 1
+
+
+def test_removed_top_level_statement():
+    desired = COMMITTED.replace('version 21.4R1;\n', '')
+    (patch, counts) = config_patch.minimal_patch(COMMITTED, desired)
+    assert patch == 'delete: version;\n'
+    assert counts['statements'] == 1
+
+
+def test_committed_config_cache(tmp_path):
+    cache = config_patch.CommittedConfigCache(str(tmp_path / 'cache'), 'r1')
+    assert cache.get('1') is None
+    cache.put('1', COMMITTED)
+    assert cache.get('1') == COMMITTED
+    assert cache.get('2') is None
+    cache.put('2', 'system;\n')
+    assert cache.get('1') is None
+    assert cache.get('2') == 'system;\n'
+    assert os.listdir(str(tmp_path / 'cache')) == ['r1.json']
+
+
+def test_committed_config_cache_corrupt_file(tmp_path):
+    cache = config_patch.CommittedConfigCache(str(tmp_path), 'r1')
+    with open(cache.path, 'w') as cache_file:
+        cache_file.write('{not json')
+    assert cache.get('1') is None
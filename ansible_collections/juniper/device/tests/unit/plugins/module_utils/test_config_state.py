@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    config_state,
+)
+
+
+def test_content_digest():
+    digest = config_state.content_digest('merge', 'set', u'set system')
+    assert digest == config_state.content_digest('merge', 'set', b'set system')
+    assert digest != config_state.content_digest('replace', 'set',
+                                                 u'set system')
+    assert digest != config_state.content_digest('merge', 'text',
+                                                 u'set system')
+
+
+def test_record_and_lookup(tmp_path):
+    state_dir = str(tmp_path / 'state')
+    store = config_state.ConfigStateStore(state_dir, 'r1')
+    assert store.lookup('a') is None
+    store.record('a', '1234')
+    assert store.lookup('a') == '1234'
+    # Another module run reads the file.
+    assert config_state.ConfigStateStore(state_dir, 'r1').lookup('a') == \
+        '1234'
+    assert config_state.ConfigStateStore(state_dir, 'r2').lookup('a') is None
+
+
+def test_unreadable_state_is_empty(tmp_path):
+    (tmp_path / 'r1.json').write_text('{not json')
+    store = config_state.ConfigStateStore(str(tmp_path), 'r1')
+    assert store.lookup('a') is None
+    store.record('a', '1234')
+    assert store.lookup('a') == '1234'
+
+
+def test_oldest_entries_are_dropped(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(config_state.time, 'time', lambda: now[0])
+    store = config_state.ConfigStateStore(str(tmp_path), 'r1')
+    for index in range(config_state.MAX_STATE_ENTRIES + 2):
+        now[0] += 1
+        store.record('digest %d' % index, str(index))
+    store = config_state.ConfigStateStore(str(tmp_path), 'r1')
+    assert store.lookup('digest 0') is None
+    assert store.lookup('digest 1') is None
+    assert store.lookup('digest 2') == '2'
+    assert len(store._load()) == config_state.MAX_STATE_ENTRIES
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['r1.json']
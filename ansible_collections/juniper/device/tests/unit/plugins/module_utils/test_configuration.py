@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    configuration as cfg,
+)
+
+
+@pytest.fixture
+def cache_file(monkeypatch, tmp_path):
+    path = str(tmp_path / 'compatibility.json')
+    monkeypatch.setattr(cfg, 'COMPATIBILITY_CACHE_FILE', path)
+    return path
+
+
+def test_lazy_imports():
+    import yaml
+    assert cfg.yaml is yaml
+    with pytest.raises(AttributeError):
+        cfg.no_such_library
+
+
+def test_libraries_are_not_imported_with_the_module_utils():
+    code = ('import json\n'
+            'import sys\n'
+            'from ansible_collections.juniper.device.plugins.module_utils '
+            'import juniper_junos_common\n'
+            'print(json.dumps([name for name in %r '
+            'if name in sys.modules]))\n' %
+            (['jxmlease', 'jnpr.jsnapy', 'jnpr.junos.op',
+              'ansible_collections.juniper.device.plugins.module_utils.'
+              'output_sink',
+              'ansible_collections.juniper.device.plugins.module_utils.'
+              'xml_dict'],))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    assert json.loads(output.decode()) == []
+
+
+def test_successful_check_is_cached(monkeypatch, cache_file):
+    assert cfg.check_sw_compatibility(cfg.MIN_PYEZ_VERSION,
+                                      cfg.MIN_LXML_ETREE_VERSION) == 'success'
+    with open(cache_file) as cache:
+        assert len(json.load(cache)) == 1
+
+    def check(*args):
+        raise AssertionError('The cached check was repeated.')
+
+    monkeypatch.setattr(cfg, '_check_sw_compatibility', check)
+    assert cfg.check_sw_compatibility(cfg.MIN_PYEZ_VERSION,
+                                      cfg.MIN_LXML_ETREE_VERSION) == 'success'
+    # Other minimum versions are checked again.
+    with pytest.raises(AssertionError):
+        cfg.check_sw_compatibility(cfg.MIN_PYEZ_VERSION,
+                                   cfg.MIN_LXML_ETREE_VERSION,
+                                   min_yaml_version=cfg.MIN_YAML_VERSION)
+
+
+def test_failed_check_is_not_cached(cache_file):
+    result = cfg.check_sw_compatibility('999.0', cfg.MIN_LXML_ETREE_VERSION)
+    assert result.startswith('junos-eznc (aka PyEZ) >= 999.0 is required')
+    assert not os.path.exists(cache_file)
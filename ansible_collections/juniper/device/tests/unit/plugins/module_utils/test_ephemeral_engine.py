@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    ephemeral_engine,
+)
+
+
+class FakeSession(object):
+    """An EphemeralSession recording its calls."""
+
+    def __init__(self, commit_event=None):
+        self.log = []
+        self.commit_event = commit_event
+
+    def open(self):
+        self.log.append('open')
+
+    def load(self, content, format, action):
+        if 'bad' in content:
+            raise RuntimeError('syntax error')
+        self.log.append(('load', content, format, action))
+
+    def commit(self):
+        if self.commit_event is not None:
+            self.commit_event.wait(5)
+        self.log.append('commit')
+
+    def close(self):
+        self.log.append('close')
+
+    def shutdown(self):
+        self.log.append('shutdown')
+
+
+def test_updates_are_batched_and_coalesced():
+    session = FakeSession()
+    engine = ephemeral_engine.EphemeralEngine(session, window=1,
+                                              max_batch=3)
+    engine.submit([('set a', 'set', 'merge'), ('set b', 'set', 'merge'),
+                   ('set c', 'set', 'merge')])
+    stats = engine.close(5)
+    assert stats['updates'] == 3
+    assert stats['batches'] == 1
+    assert stats['loads'] == 1
+    assert session.log == ['open', ('load', 'set a\nset b\nset c', 'set',
+                                    'merge'),
+                           'commit', 'shutdown']
+
+
+def test_failed_batch_is_reported_and_discarded():
+    session = FakeSession()
+    engine = ephemeral_engine.EphemeralEngine(session, window=0)
+    seq = engine.submit([('bad', 'set', 'merge')])
+    errors = engine.wait(seq, 5)
+    assert errors == ['Updates 1 to 1: syntax error']
+    seq = engine.submit([('set ok', 'set', 'merge')])
+    assert engine.wait(seq, 5, since=seq) == []
+    stats = engine.close(5)
+    assert stats['failed'] == 1
+    assert stats['updates'] == 1
+    assert session.log == ['open', 'close', 'open',
+                           ('load', 'set ok', 'set', 'merge'), 'commit',
+                           'shutdown']
+
+
+def test_failed_batch_is_split_to_the_failing_update():
+    session = FakeSession()
+    engine = ephemeral_engine.EphemeralEngine(session, window=1,
+                                              max_batch=4)
+    seq = engine.submit([('set a', 'set', 'merge'), ('set b', 'set', 'merge'),
+                         ('bad c', 'set', 'merge'), ('set d', 'set', 'merge')])
+    assert engine.wait(seq, 5) == ['Updates 3 to 3: syntax error']
+    stats = engine.close(5)
+    assert stats['updates'] == 3
+    assert stats['failed'] == 1
+    assert stats['batches'] == 2
+    assert [entry for entry in session.log if entry[0] == 'load'] == [
+        ('load', 'set a\nset b', 'set', 'merge'),
+        ('load', 'set d', 'set', 'merge')]
+    assert session.log.count('commit') == 2
+
+
+def test_failed_batch_is_not_split_when_the_instance_cannot_open():
+    session = FakeSession()
+
+    def fail_open():
+        session.log.append('open')
+        raise RuntimeError('no session')
+
+    session.open = fail_open
+    engine = ephemeral_engine.EphemeralEngine(session, window=1,
+                                              max_batch=2)
+    seq = engine.submit([('set a', 'set', 'merge'), ('set b', 'set', 'merge')])
+    assert engine.wait(seq, 5) == ['Updates 1 to 2: no session']
+    assert engine.close(5)['failed'] == 2
+    assert session.log == ['open', 'shutdown']
+
+
+def test_submit_after_close_fails():
+    session = FakeSession()
+    engine = ephemeral_engine.EphemeralEngine(session)
+    engine.close(5)
+    assert session.log == ['shutdown']
+    with pytest.raises(ephemeral_engine.EphemeralEngineError):
+        engine.submit([('set a', 'set', 'merge')])
+
+
+def test_close_timeout_leaves_shutdown_to_worker():
+    commit_event = threading.Event()
+    session = FakeSession(commit_event)
+    engine = ephemeral_engine.EphemeralEngine(session, window=0)
+    engine.submit([('set a', 'set', 'merge')])
+    with pytest.raises(ephemeral_engine.EphemeralEngineError):
+        engine.close(0.1)
+    # The batch being committed still owns the session.
+    assert 'shutdown' not in session.log
+    commit_event.set()
+    engine._thread.join(5)
+    assert session.log[-2:] == ['commit', 'shutdown']
+
+
+def test_coalesce():
+    assert ephemeral_engine._coalesce([
+        ('a', 'set', 'merge'), ('b', 'set', 'merge'), ('c', 'xml', 'merge'),
+        ('d', 'text', 'merge'), ('e', 'text', 'merge'),
+        ('f', 'text', 'replace')]) == [
+        ('a\nb', 'set', 'merge'), ('c', 'xml', 'merge'),
+        ('d\ne', 'text', 'merge'), ('f', 'text', 'replace')]
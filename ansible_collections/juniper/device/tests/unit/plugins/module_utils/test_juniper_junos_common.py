@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import contextlib
+import hashlib
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    configuration as cfg,
+)
+from ansible_collections.juniper.device.plugins.module_utils import (
+    juniper_junos_common,
+)
+
+try:
+    from ansible.module_utils.testing import patch_module_args
+except ImportError:
+    # ansible-core < 2.19
+    import json
+
+    from ansible.module_utils import basic
+    from ansible.module_utils.common.text.converters import to_bytes
+
+    @contextlib.contextmanager
+    def patch_module_args(args):
+        saved = basic._ANSIBLE_ARGS
+        basic._ANSIBLE_ARGS = to_bytes(json.dumps({'ANSIBLE_MODULE_ARGS':
+                                                   args}))
+        try:
+            yield
+        finally:
+            basic._ANSIBLE_ARGS = saved
+
+
+class FakeDevice(object):
+    """A PyEZ Device recording how it was created and used."""
+
+    created = []
+
+    def __init__(self, gather_facts=True, **connect_args):
+        self.gather_facts = gather_facts
+        self.connect_args = connect_args
+        self.connected = False
+        FakeDevice.created.append(self)
+
+    def open(self):
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+
+
+@pytest.fixture
+def make_module(monkeypatch, tmp_path):
+    """Return a function creating a local JuniperJunosModule."""
+    monkeypatch.setattr(cfg, 'COMPATIBILITY_CACHE_FILE',
+                        str(tmp_path / 'compatibility.json'))
+    monkeypatch.setattr(juniper_junos_common.jnpr.junos.device, 'Device',
+                        FakeDevice)
+    FakeDevice.created = []
+
+    def make(**kwargs):
+        args = {'host': 'r1', 'user': 'admin', '_connection': 'local',
+                '_module_name': 'juniper.device.test',
+                '_inventory_hostname': 'r1'}
+        # exit_json() needs the module args too.
+        stack.enter_context(patch_module_args(args))
+        return juniper_junos_common.JuniperJunosModule(argument_spec={},
+                                                       **kwargs)
+
+    with contextlib.ExitStack() as stack:
+        yield make
+
+
+def test_facts_are_not_gathered_when_opened(make_module):
+    module = make_module()
+    assert module.dev.gather_facts is False
+
+
+def test_device_is_opened_on_first_use(make_module):
+    module = make_module()
+    assert FakeDevice.created == []
+    dev = module.dev
+    assert dev.connected
+    assert dev.connect_args['host'] == 'r1'
+    assert module.dev is dev
+    assert len(FakeDevice.created) == 1
+
+
+def test_exit_without_device_use_never_connects(make_module):
+    module = make_module()
+    with pytest.raises(SystemExit):
+        module.exit_json(changed=False)
+    assert FakeDevice.created == []
+
+
+def test_exit_closes_the_opened_device(make_module):
+    module = make_module()
+    dev = module.dev
+    with pytest.raises(SystemExit):
+        module.exit_json(changed=False)
+    assert not dev.connected
+    assert module.dev is None
+
+
+@pytest.mark.parametrize('mode,keys', [
+    ('full', {'stdout': 'a\nb', 'stdout_lines': ['a', 'b'],
+              'parsed_output': {'a': 'b'}}),
+    ('lines_only', {'stdout_lines': ['a', 'b']}),
+    ('parsed_only', {'parsed_output': {'a': 'b'}}),
+    ('digest_only', {'stdout_size': 3,
+                     'stdout_sha256': hashlib.sha256(b'a\nb').hexdigest()}),
+    ('file_only', {'stdout_file': '/tmp/r1.xml'}),
+])
+def test_output_keys(make_module, mode, keys):
+    module = make_module()
+    module.params['output_mode'] = mode
+    assert module.output_keys('a\nb', {'a': 'b'}, '/tmp/r1.xml') == keys
+
+
+def test_parsed_only_without_parsed_output(make_module):
+    module = make_module()
+    module.params['output_mode'] = 'parsed_only'
+    assert module.output_keys('a\nb', None, None) == {'stdout': 'a\nb'}
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import logging
+import os
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    logging_utils,
+)
+
+
+def make_logger(name):
+    logger = logging.getLogger('juniper.device.test.%s' % name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def test_queued_file_log_writes_pending_records_on_stop(tmp_path):
+    logfile = str(tmp_path / 'r1.log')
+    file_log = logging_utils.QueuedFileLog(logfile, logging.INFO)
+    logger = make_logger('stop')
+    file_log.attach(logger)
+    for index in range(100):
+        logger.info('record %d', index)
+    logger.debug('not written')
+    file_log.stop()
+    file_log.stop()
+    logger.info('after stop')
+    with open(logfile) as log:
+        lines = log.read().splitlines()
+    assert len(lines) == 100
+    assert lines[0].endswith(' - juniper.device.test.stop - INFO - record 0')
+    assert lines[-1].endswith('record 99')
+    assert logger.handlers == []
+
+
+def test_queued_file_log_rotates(tmp_path):
+    logfile = str(tmp_path / 'r1.log')
+    file_log = logging_utils.QueuedFileLog(logfile, logging.INFO,
+                                           max_bytes=1000, backup_count=2)
+    logger = make_logger('rotate')
+    file_log.attach(logger)
+    for index in range(100):
+        logger.info('record %d', index)
+    file_log.stop()
+    assert sorted(os.listdir(str(tmp_path))) == ['r1.log', 'r1.log.1',
+                                                 'r1.log.2']
+    assert os.path.getsize(logfile) <= 1000
+
+
+def test_lazy_format_is_only_rendered_when_emitted(tmp_path):
+    calls = []
+
+    def render(rpc, pretty=False):
+        calls.append(rpc)
+        return '<%s/>' % rpc
+
+    logfile = str(tmp_path / 'r1.log')
+    file_log = logging_utils.QueuedFileLog(logfile, logging.DEBUG)
+    logger = make_logger('lazy')
+    file_log.attach(logger)
+    logger.setLevel(logging.INFO)
+    logger.debug('RPC: %s', logging_utils.LazyFormat(render, 'get-a'))
+    assert calls == []
+    logger.info('RPC: %s', logging_utils.LazyFormat(render, 'get-b',
+                                                    pretty=True))
+    file_log.stop()
+    assert calls == ['get-b']
+    with open(logfile) as log:
+        assert log.read().endswith(' - INFO - RPC: <get-b/>\n')
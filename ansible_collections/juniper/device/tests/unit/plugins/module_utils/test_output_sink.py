@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import gzip
+import os
+import sqlite3
+import tarfile
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    output_sink,
+)
+
+
+def read(path):
+    with open(path, 'rb') as output:
+        return output.read()
+
+
+def current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def test_file_sink(tmp_path):
+    sink = output_sink.open_sink('file')
+    path = str(tmp_path / 'r1_show_version.text')
+    assert sink.write(path, u'Hostname: r1\n') == path
+    sink.write(path, u'Model: mx\n', append=True)
+    assert read(path) == b'Hostname: r1\nModel: mx\n'
+
+
+def test_failed_chunks_remove_the_output(tmp_path):
+    sink = output_sink.open_sink('file')
+    path = str(tmp_path / 'r1.xml')
+
+    def chunks():
+        yield '<a>'
+        raise IOError('lost')
+
+    with pytest.raises(IOError):
+        sink.write_chunks(path, chunks())
+    assert not os.path.exists(path)
+
+
+def test_atomic_sink_renames_on_close(tmp_path):
+    sink = output_sink.open_sink('file', atomic=True)
+    path = str(tmp_path / 'r1.text')
+    sink.write(path, 'old')
+    sink.write(path, 'new')
+    sink.write(path, ' more', append=True)
+    assert not os.path.exists(path)
+    sink.close()
+    assert os.listdir(str(tmp_path)) == ['r1.text']
+    assert read(path) == b'new more'
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~current_umask()
+
+
+def test_gzip_sink_appends_members(tmp_path):
+    sink = output_sink.open_sink('gzip')
+    path = sink.write(str(tmp_path / 'r1.text'), 'one\n')
+    sink.write(str(tmp_path / 'r1.text'), 'two\n', append=True)
+    assert path.endswith('.text.gz')
+    with gzip.open(path) as output:
+        assert output.read() == b'one\ntwo\n'
+
+
+def test_archive_sinks_require_archive():
+    with pytest.raises(output_sink.OutputSinkError):
+        output_sink.open_sink('sqlite')
+
+
+def test_sqlite_sink(tmp_path):
+    archive = str(tmp_path / 'outputs.db')
+    for content in ('first', 'second'):
+        sink = output_sink.open_sink('sqlite', archive=archive)
+        location = sink.write('/tmp/r1.text', content)
+        sink.write('/tmp/r2.text', content)
+        sink.close()
+    assert location == archive + ':r1.text'
+    connection = sqlite3.connect(archive)
+    try:
+        rows = connection.execute('SELECT name, content FROM outputs '
+                                  'ORDER BY name').fetchall()
+    finally:
+        connection.close()
+    assert rows == [('r1.text', 'second'), ('r2.text', 'second')]
+
+
+def test_tar_sink(tmp_path):
+    archive = str(tmp_path / 'outputs.tar')
+    for content in ('first', 'second'):
+        sink = output_sink.open_sink('tar', archive=archive)
+        sink.write_chunks('/tmp/r1.text', [content, '\n'])
+        sink.close()
+    with tarfile.open(archive) as tar:
+        members = tar.getmembers()
+        assert [member.name for member in members] == ['r1.text', 'r1.text']
+        assert tar.extractfile(members[-1]).read() == b'second\n'
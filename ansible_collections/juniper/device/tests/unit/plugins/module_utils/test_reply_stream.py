@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    reply_stream,
+)
+
+XML_REPLY = '''<rpc-reply xmlns:junos="http://xml.juniper.net/junos/21.4R0/junos" message-id="urn:1">
+<software-information xmlns="http://xml.juniper.net/junos/21.4R0/junos-sw">
+<host-name>r1</host-name>
+<package-information>
+<name>junos</name>
+<comment>JUNOS Software Release [21.4R1]</comment>
+</package-information>
+<!-- built -->
+<empty/>
+<note junos:style="x">a &amp; b</note>
+</software-information>
+</rpc-reply>'''
+
+TEXT_REPLY = '''<rpc-reply xmlns:junos="http://xml.juniper.net/junos/21.4R0/junos">
+<output>
+Hostname: r1 &lt;lab&gt;
+Model: mx960
+</output>
+</rpc-reply>'''
+
+JSON_REPLY = '''<rpc-reply xmlns:junos="http://xml.juniper.net/junos/21.4R0/junos">
+{"software-information": [{"host-name": [{"data": "r1"}]}]}
+</rpc-reply>'''
+
+ERROR_REPLY = '''<rpc-reply>
+<rpc-error>
+<error-severity>%s</error-severity>
+<error-message>
+syntax error
+</error-message>
+</rpc-error>
+<output>done</output>
+</rpc-reply>'''
+
+
+def stream(reply, format, normalize=False):
+    # Small chunks split the tags and the text across parser feeds.
+    return ''.join(reply_stream.stream_reply(
+        reply_stream.iter_text(reply, 7), format, normalize=normalize))
+
+
+def test_xml_reply():
+    assert stream(XML_REPLY, 'xml') == (
+        '<software-information>\n'
+        '<host-name>r1</host-name>\n'
+        '<package-information>\n'
+        '<name>junos</name>\n'
+        '<comment>JUNOS Software Release [21.4R1]</comment>\n'
+        '</package-information>\n'
+        '<!-- built -->\n'
+        '<empty/>\n'
+        '<note style="x">a &amp; b</note>\n'
+        '</software-information>\n')
+
+
+def test_normalized_xml_reply():
+    assert stream(XML_REPLY, 'xml', normalize=True) == (
+        '<software-information>\n'
+        '  <host-name>r1</host-name>\n'
+        '  <package-information>\n'
+        '    <name>junos</name>\n'
+        '    <comment>JUNOS Software Release [21.4R1]</comment>\n'
+        '  </package-information>\n'
+        '  <!-- built -->\n'
+        '  <empty/>\n'
+        '  <note style="x">a &amp; b</note>\n'
+        '</software-information>\n')
+
+
+def test_text_reply():
+    assert stream(TEXT_REPLY, 'text') == '\nHostname: r1 <lab>\nModel: mx960\n'
+
+
+def test_json_reply():
+    assert json.loads(stream(JSON_REPLY, 'json')) == {
+        'software-information': [{'host-name': [{'data': 'r1'}]}]}
+
+
+def test_rpc_error():
+    with pytest.raises(reply_stream.ReplyStreamError, match='syntax error'):
+        stream(ERROR_REPLY % 'error', 'text')
+    assert stream(ERROR_REPLY % 'warning', 'text') == 'done'
+
+
+def test_malformed_reply():
+    with pytest.raises(reply_stream.ReplyStreamError):
+        stream(TEXT_REPLY[:-5], 'text')
+
+
+def test_get_configuration_rpc():
+    rpc = reply_stream.get_configuration_rpc(
+        {'format': 'text'}, 'interfaces/interface')
+    assert rpc.get('format') == 'text'
+    assert rpc.find('configuration/interfaces/interface') is not None
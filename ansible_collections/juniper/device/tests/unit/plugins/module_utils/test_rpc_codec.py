@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+
+import pytest
+from lxml import etree
+
+from ansible_collections.juniper.device.plugins.module_utils import rpc_codec
+
+
+RPC = ('<get-interface-information><terse/>'
+       '<interface-name>ge-0/0/0</interface-name>'
+       '</get-interface-information>')
+REPLY = ('<interface-information><physical-interface>'
+         '<name>ge-0/0/0</name><oper-status>up</oper-status>'
+         '</physical-interface></interface-information>')
+
+
+def test_rpc_round_trip():
+    rpc = etree.fromstring(RPC)
+    payload = json.loads(json.dumps(rpc_codec.encode_rpc(rpc)))
+    assert etree.tostring(rpc_codec.decode_rpc(payload)) == \
+        etree.tostring(rpc)
+
+
+def test_decode_rpc_accepts_xmltodict_form():
+    payload = {'get-software-information': {'brief': None}}
+    rpc = rpc_codec.decode_rpc(payload)
+    assert rpc.tag == 'get-software-information'
+    assert rpc.find('brief') is not None
+
+
+def test_xml_reply_round_trip():
+    resp = etree.fromstring(REPLY)
+    payload = json.loads(json.dumps(rpc_codec.encode_reply(resp, 'xml')))
+    assert isinstance(payload, str)
+    reply = rpc_codec.decode_reply(payload, 'xml')
+    assert etree.tostring(reply) == etree.tostring(resp)
+
+
+def test_json_and_ok_replies_pass_through():
+    resp = {'interface-information': [{'physical-interface': []}]}
+    assert rpc_codec.encode_reply(resp, 'json') is resp
+    assert rpc_codec.decode_reply(resp, 'json') is resp
+    assert rpc_codec.encode_reply(True, 'xml') is True
+    assert rpc_codec.decode_reply(True, 'xml') is True
+
+
+def test_small_reply_is_not_spilled():
+    assert rpc_codec.spill_reply(REPLY, len(REPLY)) == REPLY
+    assert rpc_codec.spill_reply(REPLY, 0) == REPLY
+
+
+def test_spilled_reply_round_trip():
+    payload = rpc_codec.spill_reply(REPLY, 16)
+    assert rpc_codec.is_reply_file(payload)
+    path = payload[rpc_codec.REPLY_FILE_KEY]
+    assert os.stat(path).st_mode & 0o077 == 0
+    reply = rpc_codec.decode_reply(payload, 'xml')
+    assert etree.tostring(reply) == etree.tostring(etree.fromstring(REPLY))
+    assert not os.path.exists(path)
+
+
+def test_reply_file_must_match_digest():
+    payload = rpc_codec.spill_reply(REPLY, 16)
+    path = payload[rpc_codec.REPLY_FILE_KEY]
+    with open(path, 'r+b') as reply_file:
+        reply_file.write(b'<x')
+    with pytest.raises(ValueError):
+        rpc_codec.decode_reply(payload, 'xml')
+    assert not os.path.exists(path)
+
+
+def test_iter_reply_file():
+    payload = rpc_codec.write_reply_file(['<a>', u'café', b'</a>'])
+    assert payload['size'] == 12
+    chunks = list(rpc_codec.iter_reply_file(payload, size=5))
+    assert b''.join(chunks) == u'<a>café</a>'.encode('utf-8')
+    assert len(chunks) == 3
+    assert not os.path.exists(payload[rpc_codec.REPLY_FILE_KEY])
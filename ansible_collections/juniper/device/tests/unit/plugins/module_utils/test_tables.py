@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+import yaml
+
+from ansible_collections.juniper.device.plugins.module_utils import tables
+
+factory_loader = pytest.importorskip('jnpr.junos.factory.factory_loader')
+
+TABLE_VIEW = '''
+LLDPTable:
+  rpc: get-lldp-neighbors-information
+  item: lldp-neighbor-information
+  key: lldp-local-interface
+  view: LLDPView
+LLDPView:
+  fields:
+    local_interface: lldp-local-interface
+    neighbor: lldp-remote-system-name
+'''
+
+REPLY = '''<lldp-neighbors-information>
+<lldp-neighbor-information>
+<lldp-local-interface>ge-0/0/0</lldp-local-interface>
+<lldp-remote-system-name>r2</lldp-remote-system-name>
+</lldp-neighbor-information>
+<lldp-neighbor-information>
+<lldp-local-interface>ge-0/0/1</lldp-local-interface>
+<lldp-remote-system-name>r3</lldp-remote-system-name>
+</lldp-neighbor-information>
+</lldp-neighbors-information>'''
+
+
+@pytest.fixture
+def lldp_table(tmp_path):
+    reply_path = tmp_path / 'lldp.xml'
+    reply_path.write_text(REPLY)
+    loader = factory_loader.FactoryLoader().load(yaml.safe_load(TABLE_VIEW))
+    table = loader['LLDPTable'](path=str(reply_path))
+    table.get()
+    return table
+
+
+def test_list_of_dicts(lldp_table):
+    assert tables.convert_items(lldp_table, 'list_of_dicts') == [
+        {'local_interface': 'ge-0/0/0', 'neighbor': 'r2'},
+        {'local_interface': 'ge-0/0/1', 'neighbor': 'r3'},
+    ]
+
+
+def test_juniper_items(lldp_table):
+    assert tables.convert_items(lldp_table, 'juniper_items') == [
+        ('ge-0/0/0', [('local_interface', 'ge-0/0/0'), ('neighbor', 'r2')]),
+        ('ge-0/0/1', [('local_interface', 'ge-0/0/1'), ('neighbor', 'r3')]),
+    ]
+
+
+NESTED_TABLE_VIEW = '''
+RouteSummaryTable:
+  rpc: get-route-summary-information
+  item: route-table
+  key: table-name
+  view: RouteSummaryView
+RouteSummaryView:
+  fields:
+    dests: { destination-count : int }
+    proto: _rspTable
+_rspTable:
+  item: protocols
+  key: protocol-name
+  view: _rspView
+_rspView:
+  fields:
+    count: { protocol-route-count: int }
+'''
+
+
+def test_load_tables_leaves_the_definitions_unchanged():
+    table_view = yaml.safe_load(NESTED_TABLE_VIEW)
+    original = yaml.safe_load(NESTED_TABLE_VIEW)
+    first = tables.load_tables(table_view)
+    assert table_view == original
+    second = tables.load_tables(table_view)
+    assert sorted(first) == sorted(second)
+    assert 'RouteSummaryTable' in second
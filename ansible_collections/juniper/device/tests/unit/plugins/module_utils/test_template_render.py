@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+import pytest
+
+from ansible_collections.juniper.device.plugins.module_utils import (
+    template_render,
+)
+
+pytest.importorskip('jinja2')
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    """Templates in the current directory, where PyEZ looks for them."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'interfaces.j2').write_text(
+        'interfaces {\n{% include "unit.j2" %}\n}\n')
+    (tmp_path / 'unit.j2').write_text('    {{ name }} { unit 0; }')
+    return tmp_path
+
+
+def test_format_by_extension():
+    assert template_render.format_by_extension('a.set') == 'set'
+    assert template_render.format_by_extension('a.conf') == 'text'
+    with pytest.raises(ValueError):
+        template_render.format_by_extension('a.j2')
+
+
+def test_render_without_cache(templates):
+    renderer = template_render.TemplateRenderer()
+    assert renderer.render('interfaces.j2', {'name': 'ge-0/0/0'}) == \
+        'interfaces {\n    ge-0/0/0 { unit 0; }\n}'
+    assert renderer.cached('interfaces.j2', {'name': 'ge-0/0/0'}) is None
+
+
+def test_rendered_cache(templates):
+    cache_dir = str(templates / 'cache')
+    template_render.TemplateRenderer(cache_dir).render('interfaces.j2',
+                                                       {'name': 'ge-0/0/0'})
+    renderer = template_render.TemplateRenderer(cache_dir)
+    assert renderer.cached('interfaces.j2', {'name': 'ge-0/0/0'}) == \
+        'interfaces {\n    ge-0/0/0 { unit 0; }\n}'
+    assert renderer.cached('interfaces.j2', {'name': 'ge-0/0/1'}) is None
+    assert os.listdir(os.path.join(cache_dir, 'bytecode'))
+    # Changing an included template invalidates the output.
+    (templates / 'unit.j2').write_text('    {{ name }} { unit 1; }')
+    assert renderer.cached('interfaces.j2', {'name': 'ge-0/0/0'}) is None
+    assert renderer.render('interfaces.j2', {'name': 'ge-0/0/0'}) == \
+        'interfaces {\n    ge-0/0/0 { unit 1; }\n}'
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_all(templates, workers):
+    cache_dir = str(templates / 'cache')
+    template_render.TemplateRenderer(cache_dir).render('interfaces.j2',
+                                                       {'name': 'ge-0/0/0'})
+    results = template_render.render_all(
+        cache_dir, 'interfaces.j2',
+        {'r1': {'name': 'ge-0/0/0'}, 'r2': {'name': 'ge-0/0/1'},
+         'r3': {}}, workers=workers)
+    assert results['r1'] == ('cached', None)
+    assert results['r2'] == ('rendered', None)
+    assert results['r3'] == ('rendered', None)
+    assert template_render.TemplateRenderer(cache_dir).cached(
+        'interfaces.j2', {'name': 'ge-0/0/1'}) is not None
+
+
+def test_render_all_failure(templates):
+    results = template_render.render_all(str(templates / 'cache'),
+                                         'missing.j2', {'r1': {}})
+    assert results['r1'] == ('failed', 'TemplateNotFound: missing.j2')
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2017-2020, Juniper Networks Inc. All rights reserved.
+#
+# License: Apache 2.0
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+#
+# * Neither the name of the Juniper Networks nor the
+#   names of its contributors may be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Juniper Networks, Inc. ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL Juniper Networks, Inc. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+from lxml import etree
+
+from ansible_collections.juniper.device.plugins.module_utils import xml_dict
+
+REPLY = '''<route-information xmlns="http://xml.juniper.net/junos/21.4R0/junos-routing"
+    xmlns:junos="http://xml.juniper.net/junos/*/junos">
+  <route-table>
+    <table-name>inet.0</table-name>
+    <rt junos:style="brief">
+      <rt-destination>10.0.0.0/8</rt-destination>
+      <rt-entry><protocol-name>Static</protocol-name></rt-entry>
+    </rt>
+    <rt>
+      <rt-destination>192.168.0.0/16</rt-destination>
+      <rt-entry><protocol-name>Direct</protocol-name></rt-entry>
+      <rt-entry><protocol-name>Local</protocol-name></rt-entry>
+    </rt>
+    <junos:comment>1 hidden</junos:comment>
+    <active-route-count>2<!-- counted -->
+    </active-route-count>
+    <empty/>
+  </route-table>
+</route-information>'''
+
+
+def test_etree_to_dict():
+    assert xml_dict.etree_to_dict(etree.fromstring(REPLY)) == {
+        'route-information': {'route-table': {
+            'table-name': 'inet.0',
+            'rt': [
+                {'rt-destination': '10.0.0.0/8',
+                 'rt-entry': {'protocol-name': 'Static'}},
+                {'rt-destination': '192.168.0.0/16',
+                 'rt-entry': [{'protocol-name': 'Direct'},
+                              {'protocol-name': 'Local'}]},
+            ],
+            'junos:comment': '1 hidden',
+            'active-route-count': '2',
+            'empty': '',
+        }}}
+
+
+def test_same_json_as_jxmlease():
+    jxmlease = pytest.importorskip('jxmlease')
+    root = etree.fromstring(REPLY)
+    assert json.dumps(xml_dict.etree_to_dict(root)) == \
+        json.dumps(jxmlease.parse_etree(root))
+
+
+def test_deep_tree():
+    root = element = etree.Element('level')
+    for depth in range(5000):
+        element = etree.SubElement(element, 'level')
+    element.text = 'bottom'
+    value = xml_dict.etree_to_dict(root)
+    for depth in range(5001):
+        value = value['level']
+    assert value == 'bottom'
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Measure the splitting of large configurations and the cost of chunk loads.
+
+split
+    The time config_chunks.split_configuration() takes to split a synthetic
+    configuration of one large prefix-list, in set format and in text format
+    with the merge action, and the number of chunks it makes.
+load
+    The time config_chunks.load_chunks() takes to load those chunks over a
+    simulated session: every call of send costs one round trip, then the
+    device processes each chunk at a fixed rate. This shows how the window
+    hides the round trips; it doesn't model a real device.
+
+Usage: config_chunks.py [--prefixes N] [--chunk-size BYTES] [--rtt MS]
+                        [--rate MB/S] [--windows N ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+
+from ansible_collections.juniper.device.plugins.module_utils import (  # noqa: E402
+    config_chunks)
+
+
+def build_set(count):
+    return ''.join('set policy-options prefix-list big 10.%d.%d.%d/32\n' %
+                   ((i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+                   for i in range(count))
+
+
+def build_text(count):
+    return ('policy-options {\n    prefix-list big {\n' +
+            ''.join('        10.%d.%d.%d/32;\n' %
+                    ((i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+                    for i in range(count)) +
+            '    }\n}\n')
+
+
+def simulated_send(chunks, rtt, rate):
+    def send(indexes):
+        time.sleep(rtt + sum(len(chunks[index]) for index in indexes) / rate)
+        return [None] * len(indexes)
+    return send
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prefixes', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=256 * 1024)
+    parser.add_argument('--rtt', type=float, default=50.0)
+    parser.add_argument('--rate', type=float, default=20.0)
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    configs = [('set', 'set', build_set(args.prefixes)),
+               ('text', 'merge', build_text(args.prefixes))]
+    print('%6s %10s %8s %8s' % ('format', 'bytes', 'chunks', 'split s'))
+    split = {}
+    for (format, action, content) in configs:
+        start = time.time()
+        chunks = config_chunks.split_configuration(content, format, action,
+                                                   args.chunk_size)
+        elapsed = time.time() - start
+        split[format] = chunks
+        print('%6s %10d %8d %8.2f' % (format, len(content), len(chunks),
+                                      elapsed))
+
+    print('\n%6s %8s %8s' % ('format', 'window', 'load s'))
+    for (format, action, content) in configs:
+        chunks = split[format]
+        for window in args.windows:
+            send = simulated_send(chunks, args.rtt / 1000.0,
+                                  args.rate * 1024 * 1024)
+            start = time.time()
+            config_chunks.load_chunks(chunks, send, window=window)
+            print('%6s %8d %8.2f' % (format, window, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Measure config_patch.minimal_patch() on a large synthetic configuration.
+
+A committed configuration of many interfaces and large prefix-lists is
+compared with a desired configuration which changes a few of them: an
+interface description, a prefix of one list, a deleted interface and an
+added one. The time to compute the patch and its size are reported
+against the size of the full configuration an override would load.
+
+Usage: config_patch.py [--interfaces N] [--lists N] [--prefixes N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+
+from ansible_collections.juniper.device.plugins.module_utils import (  # noqa: E402
+    config_patch)
+
+
+def build(interfaces, lists, prefixes, changed=False):
+    parts = ['version 21.4R1;\nsystem {\n    host-name r1;\n}\n'
+             'interfaces {\n']
+    for i in range(interfaces):
+        if changed and i == 1:
+            continue
+        description = 'link %d' % i
+        if changed and i == 0:
+            description = 'changed link'
+        parts.append('    ge-0/0/%d {\n        description "%s";\n'
+                     '        unit 0 {\n            family inet {\n'
+                     '                address 10.%d.%d.1/30;\n'
+                     '            }\n        }\n    }\n' %
+                     (i, description, (i >> 8) & 0xff, i & 0xff))
+    if changed:
+        parts.append('    ge-1/0/0 {\n        unit 0;\n    }\n')
+    parts.append('}\npolicy-options {\n')
+    for n in range(lists):
+        parts.append('    prefix-list list-%d {\n' % n)
+        for p in range(prefixes):
+            if changed and n == 0 and p == 0:
+                continue
+            parts.append('        172.%d.%d.0/24;\n' %
+                         (n & 0xff, p & 0xff) if p < 256 else
+                         '        192.%d.%d.%d/32;\n' %
+                         (n & 0xff, (p >> 8) & 0xff, p & 0xff))
+        parts.append('    }\n')
+    parts.append('}\n')
+    return ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interfaces', type=int, default=2000)
+    parser.add_argument('--lists', type=int, default=100)
+    parser.add_argument('--prefixes', type=int, default=2000)
+    args = parser.parse_args()
+
+    committed = build(args.interfaces, args.lists, args.prefixes)
+    desired = build(args.interfaces, args.lists, args.prefixes, changed=True)
+    start = time.time()
+    (patch, counts) = config_patch.minimal_patch(committed, desired)
+    elapsed = time.time() - start
+    print('%14s %12s %8s %s' % ('override bytes', 'patch bytes', 'patch s',
+                                'hierarchies'))
+    print('%14d %12d %8.2f %s' % (len(desired), len(patch), elapsed,
+                                  ', '.join('%s %d' % item for item in
+                                            sorted(counts.items()))))
+
+
+if __name__ == '__main__':
+    main()
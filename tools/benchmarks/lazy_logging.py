@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""Measure the logging cost per RPC of eager and lazy RPC rendering.
+
+The rpc module logs each RPC up to three times. The eager path pretty-prints
+the RPC for every call, the lazy path passes a LazyFormat which is only
+rendered when the record is emitted. The ping path renders the reply of a
+successful ping. Both are measured at the module's default WARNING level,
+where no record is emitted, and at DEBUG with a handler writing to
+os.devnull, where both paths render the RPC.
+
+Usage: lazy_logging.py [--rpc-children N] [--repeat N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+from ansible_collections.juniper.device.plugins.module_utils.logging_utils import LazyFormat  # noqa: E402
+
+
+class HostAdapter(logging.LoggerAdapter):
+    # The CustomAdapter of JuniperJunosModule._setup_logging().
+    def process(self, msg, kwargs):
+        return '[%s] %s' % (self.extra['host'], msg), kwargs
+
+
+def build_rpc(children):
+    rpc = etree.Element('get-route-information', format='xml')
+    etree.SubElement(rpc, 'table').text = 'inet.0'
+    for i in range(children):
+        etree.SubElement(rpc, 'destination').text = '10.0.%d.0/24' % (i % 250)
+    etree.SubElement(rpc, 'extensive')
+    return rpc
+
+
+def build_ping_reply():
+    reply = etree.Element('ping-results')
+    etree.SubElement(reply, 'target-host').text = '192.0.2.1'
+    for i in range(5):
+        probe = etree.SubElement(reply, 'probe-result')
+        etree.SubElement(probe, 'sequence-number').text = str(i)
+        etree.SubElement(probe, 'rtt').text = '1234'
+    summary = etree.SubElement(reply, 'probe-results-summary')
+    for (tag, text) in [('probes-sent', '5'), ('responses-received', '5'),
+                        ('packet-loss', '0'), ('rtt-minimum', '1000'),
+                        ('rtt-maximum', '1500'), ('rtt-average', '1234'),
+                        ('rtt-stddev', '100')]:
+        etree.SubElement(summary, tag).text = text
+    return reply
+
+
+def eager_rpc(logger, rpc):
+    logger.debug('Executing RPC "%s".', etree.tostring(rpc, pretty_print=True))
+    logger.debug('RPC "%s" executed successfully.',
+                 etree.tostring(rpc, pretty_print=True))
+
+
+def lazy_rpc(logger, rpc):
+    logger.debug('Executing RPC "%s".',
+                 LazyFormat(etree.tostring, rpc, pretty_print=True))
+    logger.debug('RPC "%s" executed successfully.',
+                 LazyFormat(etree.tostring, rpc, pretty_print=True))
+
+
+def eager_ping(reply):
+    resp_xml = etree.tostring(reply, pretty_print=True)
+    return reply.find('probe-results-summary') is not None and resp_xml
+
+
+def lazy_ping(reply):
+    resp_xml = LazyFormat(etree.tostring, reply, pretty_print=True)
+    return reply.find('probe-results-summary') is not None and resp_xml
+
+
+def measure(func, repeat):
+    number = 20000
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rpc-children', type=int, nargs='+',
+                        default=[0, 10, 100])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    base = logging.getLogger('jnpr.ansible_module.benchmark')
+    base.addHandler(logging.StreamHandler(open(os.devnull, 'w')))
+    base.propagate = False
+    logger = HostAdapter(base, {'host': 'router'})
+    reply = build_ping_reply()
+
+    print('%-8s %12s %12s %12s %8s' % ('level', 'case', 'eager us',
+                                       'lazy us', 'speedup'))
+    for level in ('WARNING', 'DEBUG'):
+        base.setLevel(level)
+        for children in args.rpc_children:
+            rpc = build_rpc(children)
+            eager = measure(lambda: eager_rpc(logger, rpc), args.repeat)
+            lazy = measure(lambda: lazy_rpc(logger, rpc), args.repeat)
+            print('%-8s %12s %12.2f %12.2f %7.2fx' % (
+                level, 'rpc/%d' % children, eager * 1e6, lazy * 1e6,
+                eager / lazy))
+        eager = measure(lambda: eager_ping(reply), args.repeat)
+        lazy = measure(lambda: lazy_ping(reply), args.repeat)
+        print('%-8s %12s %12.2f %12.2f %7.2fx' % (
+            level, 'ping', eager * 1e6, lazy * 1e6, eager / lazy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Compare the legacy xmltodict RPC wire path with the rpc_codec path.
+
+Both paths are measured without a device: the time spent in the persistent
+connection process waiting on the device is excluded, and the JSON-RPC socket
+hop is represented by a json.dumps()/json.loads() pair. The reply is a
+synthetic get-route-information reply of the requested size.
+
+Usage: rpc_codec.py [--routes N] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from lxml import etree
+import xmltodict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+from ansible_collections.juniper.device.plugins.module_utils import rpc_codec  # noqa: E402
+
+
+def build_reply(routes):
+    reply = etree.Element('route-information')
+    table = etree.SubElement(reply, 'route-table')
+    etree.SubElement(table, 'table-name').text = 'inet.0'
+    for i in range(routes):
+        rt = etree.SubElement(table, 'rt')
+        etree.SubElement(rt, 'rt-destination').text = \
+            '10.%d.%d.0/24' % ((i >> 8) & 0xff, i & 0xff)
+        entry = etree.SubElement(rt, 'rt-entry')
+        etree.SubElement(entry, 'active-tag').text = '*'
+        etree.SubElement(entry, 'protocol-name').text = 'BGP'
+        etree.SubElement(entry, 'preference').text = '170'
+        etree.SubElement(entry, 'age').text = '1w2d 03:04:05'
+        nh = etree.SubElement(entry, 'nh')
+        etree.SubElement(nh, 'to').text = '192.0.2.%d' % (i % 250 + 1)
+        etree.SubElement(nh, 'via').text = 'ge-0/0/%d.0' % (i % 48)
+    return reply
+
+
+def build_rpc():
+    rpc = etree.Element('get-route-information', format='xml')
+    etree.SubElement(rpc, 'table').text = 'inet.0'
+    etree.SubElement(rpc, 'extensive')
+    return rpc
+
+
+def socket_hop(payload):
+    return json.loads(json.dumps(payload))
+
+
+def legacy_path(rpc, reply):
+    # Module side.
+    wire = socket_hop(xmltodict.parse(etree.tostring(rpc)))
+    # Connection side.
+    parser = etree.XMLParser(ns_clean=True, recover=True, encoding='utf-8')
+    etree.fromstring(xmltodict.unparse(wire).encode('utf-8'), parser=parser)
+    wire = socket_hop(etree.tostring(reply).decode('utf-8'))
+    # Module side.
+    return etree.fromstring(wire)
+
+
+def codec_path(rpc, reply):
+    # Module side.
+    wire = socket_hop(rpc_codec.encode_rpc(rpc))
+    # Connection side.
+    rpc_codec.decode_rpc(wire)
+    wire = socket_hop(rpc_codec.encode_reply(reply, 'xml'))
+    # Module side.
+    return rpc_codec.decode_reply(wire, 'xml')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', type=int, nargs='+',
+                        default=[0, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rpc = build_rpc()
+    print('%10s %12s %12s %12s %8s' % ('routes', 'reply bytes', 'legacy ms',
+                                       'codec ms', 'speedup'))
+    for routes in args.routes:
+        reply = build_reply(routes)
+        size = len(etree.tostring(reply))
+        number = max(1, 20000 // (routes + 1))
+        legacy = min(timeit.repeat(lambda: legacy_path(rpc, reply),
+                                   number=number, repeat=args.repeat)) / number
+        codec = min(timeit.repeat(lambda: codec_path(rpc, reply),
+                                  number=number, repeat=args.repeat)) / number
+        print('%10d %12d %12.3f %12.3f %7.2fx' % (routes, size,
+                                                  legacy * 1000,
+                                                  codec * 1000,
+                                                  legacy / codec))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Compare the peak memory of saving a large reply with and without streaming.
+
+A synthetic get-route-information <rpc-reply> is held as text, the way
+ncclient delivers it, then saved to a file in a child process:
+
+tree
+    As the rpc module does without stream_output: parse the reply, apply
+    PyEZ's normalize transform, then etree.tostring(pretty_print=True) and
+    write the result.
+stream
+    As the rpc module does with stream_output: reply_stream.stream_reply()
+    writes the output a chunk at a time.
+
+The peak resident memory of each child is reported after subtracting the
+memory of a child which only imports the libraries and builds the reply
+text. Both outputs are checked to be identical.
+
+Usage: stream_reply.py [--routes N ...]
+"""
+
+import argparse
+import filecmp
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+
+NC_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+JUNOS_NS = 'http://xml.juniper.net/junos/21.4R0/junos'
+
+
+def build_reply(count):
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<rpc-reply xmlns="%s" xmlns:junos="%s" message-id="1">\n'
+             '<route-information xmlns="%s-routing">\n'
+             '<route-table>\n<table-name>inet.0</table-name>\n'
+             % (NC_NS, JUNOS_NS, JUNOS_NS)]
+    for i in range(count):
+        parts.append(
+            '<rt junos:style="brief">\n'
+            '<rt-destination>10.%d.%d.0/24</rt-destination>\n'
+            '<rt-entry>\n<active-tag>*</active-tag>\n'
+            '<protocol-name>BGP</protocol-name>\n'
+            '<preference>170</preference>\n'
+            '<age junos:seconds="788645">1w2d 03:04:05</age>\n'
+            '<nh>\n<to>192.0.2.1</to>\n<via>ge-0/0/%d.0</via>\n</nh>\n'
+            '</rt-entry>\n</rt>\n' % ((i >> 8) & 0xff, i & 0xff, i % 48))
+    parts.append('</route-table>\n</route-information>\n</rpc-reply>\n')
+    return ''.join(parts)
+
+
+def save_tree(raw, path):
+    from lxml import etree
+    from jnpr.junos import jxml
+    normalize = etree.XSLT(etree.XML(jxml.normalize_xslt))
+    reply = normalize(etree.fromstring(raw.encode('utf-8'))).getroot()
+    with open(path, 'wb') as output:
+        output.write(etree.tostring(reply[0], pretty_print=True))
+
+
+def save_stream(raw, path):
+    from ansible_collections.juniper.device.plugins.module_utils import (
+        reply_stream)
+    with open(path, 'wb') as output:
+        for chunk in reply_stream.stream_reply(reply_stream.iter_text(raw),
+                                               'xml', normalize=True):
+            output.write(chunk.encode('utf-8'))
+
+
+def child(mode, count, path):
+    # Every child imports the same libraries, so that the base child only
+    # lacks the memory used to save the reply.
+    from lxml import etree  # noqa: F401
+    from jnpr.junos import jxml  # noqa: F401
+    from ansible_collections.juniper.device.plugins.module_utils import (  # noqa: F401
+        reply_stream)
+    raw = build_reply(count)
+    start = time.time()
+    if mode == 'tree':
+        save_tree(raw, path)
+    elif mode == 'stream':
+        save_stream(raw, path)
+    elapsed = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('%d %d %f' % (len(raw), rss, elapsed))
+
+
+def run(mode, count, path):
+    output = subprocess.check_output([sys.executable, __file__, '--child',
+                                      mode, str(count), path])
+    (size, rss, elapsed) = output.split()
+    return (int(size), int(rss), float(elapsed))
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        child(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+        return
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', type=int, nargs='+',
+                        default=[2000, 10000])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print('%8s %11s %14s %14s %10s %10s' % ('routes', 'reply bytes',
+                                            'tree peak KiB',
+                                            'stream peak KiB',
+                                            'tree s', 'stream s'))
+    for count in args.routes:
+        paths = dict((mode, os.path.join(directory, mode))
+                     for mode in ('base', 'tree', 'stream'))
+        (size, base, _) = run('base', count, paths['base'])
+        (_, tree, tree_time) = run('tree', count, paths['tree'])
+        (_, stream, stream_time) = run('stream', count, paths['stream'])
+        if not filecmp.cmp(paths['tree'], paths['stream'], shallow=False):
+            raise AssertionError('tree and stream outputs differ for %d '
+                                 'routes' % count)
+        print('%8d %11d %14d %14d %10.2f %10.2f' % (
+            count, size, tree - base, stream - base, tree_time, stream_time))
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
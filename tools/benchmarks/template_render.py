@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""Compare the time to render one configuration template for many hosts.
+
+A synthetic template, which includes a macro file, is rendered with the
+variables of each host:
+
+pyez
+    As the config module did before the template cache: each host's module
+    process builds a new Jinja2 environment and compiles the templates.
+    Each render is made in a new environment, in this process.
+bytecode
+    As the config module does with template_cache_dir: each render is made
+    by a new TemplateRenderer, which loads the compiled templates from the
+    bytecode cache.
+pool
+    As the render_templates action does: template_render.render_all()
+    renders all the hosts into the rendered cache, in a pool of processes.
+cached
+    As the config tasks do after render_templates: a new TemplateRenderer
+    per host reads the rendered output from the cache.
+
+Usage: template_render.py [--hosts N] [--units N] [--workers N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+
+from ansible_collections.juniper.device.plugins.module_utils import (  # noqa: E402
+    template_render)
+
+MACROS = '''
+{% macro unit(ifd, u) -%}
+    unit {{ u.id }} {
+        description "{{ u.description | upper }}";
+        vlan-id {{ u.vlan }};
+        family inet { address {{ u.address }}/{{ u.length }}; }
+    }
+{%- endmacro %}
+'''
+
+TEMPLATE = '''{% import 'macros.j2' as m %}
+system { host-name {{ name }}; }
+interfaces {
+{% for ifd in interfaces %}
+    {{ ifd.name }} {
+        vlan-tagging;
+{% for u in ifd.units %}
+        {{ m.unit(ifd, u) }}
+{% endfor %}
+    }
+{% endfor %}
+}
+'''
+
+
+def build_vars(index, units):
+    return {'name': 'r%d' % index,
+            'interfaces': [{'name': 'ge-0/0/%d' % i,
+                            'units': [{'id': u, 'vlan': 100 + u,
+                                       'description': 'unit %d' % u,
+                                       'address': '10.%d.%d.1' % (i, u),
+                                       'length': 24}
+                                      for u in range(units)]}
+                           for i in range(4)]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=200)
+    parser.add_argument('--units', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with open('macros.j2', 'w') as macros:
+            macros.write(MACROS)
+        with open('host.conf', 'w') as template:
+            template.write(TEMPLATE * 4)
+        vars_by_host = dict(('r%d' % i, build_vars(i, args.units))
+                            for i in range(args.hosts))
+        cache_dir = os.path.join(directory, 'cache')
+        timings = []
+
+        start = time.time()
+        expected = dict((host, template_render.TemplateRenderer().render(
+            'host.conf', host_vars)) for (host, host_vars) in
+            vars_by_host.items())
+        timings.append(('pyez', time.time() - start))
+
+        template_render.TemplateRenderer(cache_dir).render('host.conf', {})
+        shutil.rmtree(os.path.join(cache_dir, 'rendered'))
+        start = time.time()
+        for (host, host_vars) in vars_by_host.items():
+            output = template_render.TemplateRenderer(cache_dir).render(
+                'host.conf', host_vars)
+            assert output == expected[host]
+        timings.append(('bytecode', time.time() - start))
+
+        shutil.rmtree(os.path.join(cache_dir, 'rendered'))
+        start = time.time()
+        statuses = template_render.render_all(cache_dir, 'host.conf',
+                                              vars_by_host, args.workers)
+        timings.append(('pool', time.time() - start))
+        assert all(status == 'rendered' for (status, _) in statuses.values())
+
+        start = time.time()
+        for (host, host_vars) in vars_by_host.items():
+            output = template_render.TemplateRenderer(cache_dir).render(
+                'host.conf', host_vars)
+            assert output == expected[host]
+        timings.append(('cached', time.time() - start))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    print('%d hosts, %d bytes per configuration, %d CPUs' %
+          (args.hosts, len(expected['r0']), os.cpu_count()))
+    for (name, elapsed) in timings:
+        print('%10s %8.3f s %8.2f ms/host' % (name, elapsed,
+                                              elapsed * 1000 / args.hosts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Compare the XML-to-dict engines on synthetic Junos replies.
+
+Each engine converts an lxml reply into the parsed_output of a module and
+the result is serialized with json.dumps(), as Ansible does with module
+results. jxmlease and the native engine start from the lxml tree; xmltodict
+needs the serialized reply, so its time includes etree.tostring(). The
+native result is checked against jxmlease before timing.
+
+The replies mimic get-route-information, get-interface-information
+extensive and get-configuration at the requested scale.
+
+Usage: xml_to_dict.py [--scale N ...] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from lxml import etree
+import jxmlease
+import xmltodict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+from ansible_collections.juniper.device.plugins.module_utils import xml_dict  # noqa: E402
+
+JUNOS_NS = 'http://xml.juniper.net/junos/1.0'
+
+
+def build_routes(count):
+    reply = etree.Element('route-information', nsmap={'junos': JUNOS_NS})
+    table = etree.SubElement(reply, 'route-table')
+    etree.SubElement(table, 'table-name').text = 'inet.0'
+    for i in range(count):
+        rt = etree.SubElement(table, 'rt', {'{%s}style' % JUNOS_NS: 'brief'})
+        etree.SubElement(rt, 'rt-destination').text = \
+            '10.%d.%d.0/24' % ((i >> 8) & 0xff, i & 0xff)
+        entry = etree.SubElement(rt, 'rt-entry')
+        etree.SubElement(entry, 'active-tag').text = '*'
+        etree.SubElement(entry, 'protocol-name').text = 'BGP'
+        etree.SubElement(entry, 'preference').text = '170'
+        etree.SubElement(entry, 'age', {'{%s}seconds' % JUNOS_NS: '788645'}
+                         ).text = '1w2d 03:04:05'
+        for hop in range(2):
+            nh = etree.SubElement(entry, 'nh')
+            etree.SubElement(nh, 'to').text = '192.0.2.%d' % (hop + 1)
+            etree.SubElement(nh, 'via').text = 'ge-0/0/%d.0' % (i % 48)
+    return reply
+
+
+def build_interfaces(count):
+    reply = etree.Element('interface-information')
+    for i in range(count):
+        phy = etree.SubElement(reply, 'physical-interface')
+        etree.SubElement(phy, 'name').text = '\nge-0/0/%d\n' % i
+        etree.SubElement(phy, 'admin-status').text = 'up'
+        etree.SubElement(phy, 'oper-status').text = 'up'
+        stats = etree.SubElement(phy, 'traffic-statistics')
+        for counter in ('input-bytes', 'output-bytes', 'input-packets',
+                        'output-packets', 'input-bps', 'output-bps'):
+            etree.SubElement(stats, counter).text = str(i * 1000003)
+        errors = etree.SubElement(phy, 'input-error-list')
+        for counter in ('input-errors', 'input-drops', 'framing-errors',
+                        'input-runts', 'input-discards', 'input-fifo-errors'):
+            etree.SubElement(errors, counter).text = '0'
+        for unit in range(4):
+            logical = etree.SubElement(phy, 'logical-interface')
+            etree.SubElement(logical, 'name').text = 'ge-0/0/%d.%d' % (i, unit)
+            family = etree.SubElement(logical, 'address-family')
+            etree.SubElement(family, 'address-family-name').text = 'inet'
+            address = etree.SubElement(family, 'interface-address')
+            etree.SubElement(address, 'ifa-local').text = \
+                '10.%d.%d.1' % (i & 0xff, unit)
+    return reply
+
+
+def build_configuration(count):
+    reply = etree.Element('configuration')
+    interfaces = etree.SubElement(reply, 'interfaces')
+    for i in range(count):
+        interface = etree.SubElement(interfaces, 'interface')
+        etree.SubElement(interface, 'name').text = 'ge-0/0/%d' % i
+        etree.SubElement(interface, 'description').text = 'port %d' % i
+        unit = etree.SubElement(interface, 'unit')
+        etree.SubElement(unit, 'name').text = '0'
+        inet = etree.SubElement(etree.SubElement(unit, 'family'), 'inet')
+        address = etree.SubElement(inet, 'address')
+        etree.SubElement(address, 'name').text = '10.%d.0.1/24' % (i & 0xff)
+    policy = etree.SubElement(reply, 'policy-options')
+    for i in range(count):
+        statement = etree.SubElement(policy, 'policy-statement')
+        etree.SubElement(statement, 'name').text = 'P%d' % i
+        term = etree.SubElement(statement, 'term')
+        etree.SubElement(term, 'name').text = 'T1'
+        etree.SubElement(etree.SubElement(term, 'then'), 'accept')
+    return reply
+
+
+def run_jxmlease(reply):
+    return json.dumps(jxmlease.parse_etree(reply))
+
+
+def run_xmltodict(reply):
+    return json.dumps(xmltodict.parse(etree.tostring(reply)))
+
+
+def run_native(reply):
+    return json.dumps(xml_dict.etree_to_dict(reply))
+
+
+ENGINES = [('jxmlease', run_jxmlease), ('xmltodict', run_xmltodict),
+           ('native', run_native)]
+
+REPLIES = [('routes', build_routes), ('interfaces', build_interfaces),
+           ('config', build_configuration)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, nargs='+',
+                        default=[100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('%-10s %7s %11s' % ('reply', 'scale', 'bytes') +
+          ''.join('%13s' % ('%s ms' % name) for (name, _) in ENGINES) +
+          '%10s' % 'speedup')
+    for (reply_name, build) in REPLIES:
+        for scale in args.scale:
+            reply = build(scale)
+            if run_native(reply) != run_jxmlease(reply):
+                raise AssertionError('native and jxmlease differ on %s/%d'
+                                     % (reply_name, scale))
+            size = len(etree.tostring(reply))
+            number = max(1, 2000 // scale)
+            times = [min(timeit.repeat(lambda: run(reply), number=number,
+                                       repeat=args.repeat)) / number
+                     for (_, run) in ENGINES]
+            print('%-10s %7d %11d' % (reply_name, scale, size) +
+                  ''.join('%13.2f' % (t * 1000) for t in times) +
+                  '%9.1fx' % (times[0] / times[-1]))
+
+
+if __name__ == '__main__':
+    main()